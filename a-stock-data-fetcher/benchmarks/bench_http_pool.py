@@ -0,0 +1,179 @@
+"""
+HTTP连接池基准测试
+在本机启动一个支持 keep-alive 和 gzip 的 HTTP 服务代替上游接口，
+分别以“每次请求新建连接”（requests 默认行为）和“共享连接池”两种方式发出同样的请求，
+对比耗时、延迟分位数、服务端收到的连接数和传输字节数
+
+本机回环网络几乎没有握手开销，可用 --connect-delay 为每个新连接模拟握手耗时（如公网上的TCP+TLS握手）
+
+用法:
+    python bench_http_pool.py --requests 2000 --threads 8 --output http_pool.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from http_pool import install_http_pool, uninstall_http_pool
+from metrics import MetricsRegistry
+
+
+def make_payload(rows: int) -> bytes:
+    """生成与K线接口返回格式类似的JSON数据"""
+    klines = [
+        f"2023-01-{i % 28 + 1:02d},10.{i % 100:02d},10.{(i + 7) % 100:02d},11.00,9.90,{100000 + i},1.2e8,2.1,0.5,0.05,1.3"
+        for i in range(rows)
+    ]
+    return json.dumps({"rc": 0, "data": {"code": "000001", "klines": klines}}).encode("utf-8")
+
+
+class StubServer:
+    """模拟上游接口的本地HTTP服务，统计连接数和发送字节数"""
+
+    def __init__(self, payload: bytes, connect_delay: float = 0.0):
+        """
+        参数:
+            payload: 每次请求返回的内容
+            connect_delay: 每个新连接的模拟握手耗时（秒）
+        """
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        stub = self
+        compressed = gzip.compress(payload)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，保持连接时需关闭Nagle算法，否则会与延迟确认叠加出约40毫秒的等待
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+                if connect_delay:
+                    time.sleep(connect_delay)
+
+            def do_GET(self):
+                use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+                body = compressed if use_gzip else payload
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if use_gzip:
+                    self.send_header("Content-Encoding", "gzip")
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/qt/stock/kline/get"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.connections = 0
+            self.bytes_sent = 0
+
+
+def run_case(server: StubServer, total: int, threads: int) -> Dict:
+    """以 requests.get 发出 total 个请求（与akshare的调用方式一致），返回统计结果"""
+    server.reset()
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        start = time.perf_counter()
+        response = requests.get(server.url, params={"secid": f"0.{i:06d}"}, timeout=10)
+        response.json()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(one, range(total)))
+    seconds = time.perf_counter() - start
+
+    samples = np.asarray(latencies) * 1000
+    return {
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(total / seconds, 1),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "server_connections": server.connections,
+        "bytes_received": server.bytes_sent,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="HTTP连接池基准测试")
+    parser.add_argument("--requests", type=int, default=2000, help="请求数量")
+    parser.add_argument("--threads", type=int, default=8, help="并发线程数")
+    parser.add_argument("--rows", type=int, default=250, help="每次返回的K线条数")
+    parser.add_argument("--connect-delay", type=float, default=0.02,
+                        help="每个新连接的模拟握手耗时（秒）")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    args = parser.parse_args(argv)
+
+    payload = make_payload(args.rows)
+    report = {"requests": args.requests, "threads": args.threads,
+              "payload_bytes": len(payload), "connect_delay": args.connect_delay}
+
+    with StubServer(payload, args.connect_delay) as server:
+        # requests 默认的 Accept-Encoding 已包含 gzip，这里只对比连接复用的效果
+        uninstall_http_pool()
+        report["per_request_connection"] = run_case(server, args.requests, args.threads)
+
+        registry = MetricsRegistry()
+        install_http_pool(pool_maxsize=args.threads, metrics=registry)
+        try:
+            pooled = run_case(server, args.requests, args.threads)
+        finally:
+            uninstall_http_pool()
+        pooled["client_reuse_rate"] = round(registry.connection_reuse_rate() or 0.0, 4)
+        report["pooled"] = pooled
+
+    base, pooled = report["per_request_connection"], report["pooled"]
+    report["speedup"] = round(base["seconds"] / pooled["seconds"], 2)
+    for name, result in (("每次新建连接", base), ("共享连接池", pooled)):
+        print(f"{name:<8} {result['seconds']:.3f} 秒，{result['requests_per_second']} 请求/秒，"
+              f"p50 {result['p50_ms']} ms，p99 {result['p99_ms']} ms，"
+              f"服务端连接 {result['server_connections']} 个，接收 {result['bytes_received']} 字节")
+    print(f"连接复用率: {pooled['client_reuse_rate']:.1%}，加速比: {report['speedup']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
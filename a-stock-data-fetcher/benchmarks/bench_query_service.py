@@ -0,0 +1,235 @@
+"""
+本地查询服务基准测试
+用合成数据构建本地存储，在子进程中启动查询服务，以多个保持连接的客户端并发发送
+搜索、个股信息、K线区间、板块成份股混合请求，输出每秒请求数和p50/p99延迟；
+另外用带延迟的回放数据源模拟上游，测量同时到达的相同请求被合并后的上游调用次数
+
+用法:
+    python bench_query_service.py --requests 20000 --concurrency 64 --output query_service.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_source import ReplayDataSource, save_fixture
+from local_store import LocalStore
+from metrics import MetricsRegistry
+from query_service import QueryService
+
+from fixtures import KLINE_END_DATE, KLINE_START_DATE, _NAME_WORDS, make_kline, make_spot_table, make_symbols
+
+# 混合请求中各类请求的权重
+REQUEST_MIX = (("search", 2), ("profile", 3), ("kline", 4), ("board", 1))
+
+
+def make_profile(symbol: str, name: str) -> pd.DataFrame:
+    """生成与 stock_individual_info_em 结构一致的个股信息"""
+    return pd.DataFrame({
+        "item": ["股票代码", "股票简称", "总股本", "流通股", "行业", "上市时间"],
+        "value": [symbol, name, 1e9, 8e8, "银行", 20000101],
+    })
+
+
+def build_store(root: str, count: int, seed: int = 0) -> List[str]:
+    """生成本地存储，返回股票代码列表"""
+    rng = np.random.default_rng(seed)
+    symbols = make_symbols(count)
+    store = LocalStore(root)
+    spot = make_spot_table(symbols, rng)
+    store.write("spot", "latest", spot)
+
+    dates = pd.bdate_range(KLINE_START_DATE, KLINE_END_DATE)
+    for symbol, name in zip(spot["代码"], spot["名称"]):
+        store.write("kline", symbol, make_kline(symbol, dates, rng))
+        store.write("profile", symbol, make_profile(symbol, name))
+
+    store.write("boards/industry", "_index", pd.DataFrame({"排名": range(1, len(_NAME_WORDS) + 1),
+                                                            "板块名称": _NAME_WORDS}))
+    for i, word in enumerate(_NAME_WORDS):
+        members = spot.iloc[i::len(_NAME_WORDS)][["代码", "名称", "最新价"]]
+        store.write("boards/industry", word, members)
+    return symbols
+
+
+def make_targets(symbols: List[str], total: int, seed: int = 0) -> List[str]:
+    """生成请求路径列表"""
+    rng = random.Random(seed)
+    kinds = [k for k, _ in REQUEST_MIX]
+    weights = [w for _, w in REQUEST_MIX]
+    years = ["2020", "2021", "2022", "2023"]
+    targets = []
+    for kind in rng.choices(kinds, weights, k=total):
+        if kind == "search":
+            targets.append(f"/search?q={rng.choice(_NAME_WORDS)}&limit=20")
+        elif kind == "profile":
+            targets.append(f"/profile/{rng.choice(symbols)}")
+        elif kind == "kline":
+            year = rng.choice(years)
+            targets.append(f"/kline/{rng.choice(symbols)}?start={year}0101&end={year}0630")
+        else:
+            targets.append(f"/boards/industry/{rng.choice(_NAME_WORDS)}")
+    return targets
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, target: str) -> int:
+    """在已建立的连接上发送一个GET请求，读取完整响应，返回状态码"""
+    path = quote(target, safe="/?=&").encode("ascii")
+    writer.write(b"GET " + path + b" HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def run_clients(port: int, targets: List[str], concurrency: int) -> Tuple[float, List[float], int]:
+    """以 concurrency 个保持连接的客户端发送全部请求，返回 (耗时, 延迟列表, 错误数)"""
+    queue = iter(targets)
+    latencies: List[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            for target in queue:
+                start = time.perf_counter()
+                status = await _request(reader, writer, target)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, errors
+
+
+def _serve_in_child(store_root: str, port_queue) -> None:
+    """子进程入口：启动只读本地数据的查询服务"""
+    async def serve() -> None:
+        service = QueryService(LocalStore(store_root), upstream=False, metrics=MetricsRegistry(enabled=False))
+        server = await service.start("127.0.0.1", 0)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def bench_throughput(store_root: str, targets: List[str], concurrency: int) -> Dict:
+    """测量本地命中时的吞吐量和延迟"""
+    ctx = multiprocessing.get_context("spawn")
+    port_queue = ctx.Queue()
+    process = ctx.Process(target=_serve_in_child, args=(store_root, port_queue), daemon=True)
+    process.start()
+    try:
+        port = port_queue.get(timeout=60)
+        # 预热：把文件读入服务的内存缓存
+        asyncio.run(run_clients(port, targets[:concurrency * 10], concurrency))
+        seconds, latencies, errors = asyncio.run(run_clients(port, targets, concurrency))
+    finally:
+        process.terminate()
+        process.join()
+
+    samples = np.asarray(latencies) * 1000
+    return {
+        "requests": len(targets),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(targets) / seconds, 1),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "errors": errors,
+    }
+
+
+async def _burst(service: QueryService, target: str, burst: int) -> Tuple[float, int]:
+    server = await service.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        seconds, _, errors = await run_clients(port, [target] * burst, burst)
+    return seconds, errors
+
+
+def bench_coalescing(work_dir: str, burst: int, latency: float) -> Dict:
+    """同时发送 burst 个本地缺失的相同请求，统计实际发出的上游调用次数"""
+    fixtures = os.path.join(work_dir, "upstream")
+    symbol = "999999"
+    save_fixture(fixtures, "stock_individual_info_em", {"symbol": symbol}, make_profile(symbol, "测试股票"))
+
+    registry = MetricsRegistry()
+    source = ReplayDataSource(root=fixtures, latency=latency, metrics=registry)
+    service = QueryService(LocalStore(os.path.join(work_dir, "cold_store")), source, metrics=registry)
+    try:
+        seconds, errors = asyncio.run(_burst(service, f"/profile/{symbol}", burst))
+    finally:
+        service.close()
+
+    return {
+        "burst": burst,
+        "upstream_latency": latency,
+        "seconds": round(seconds, 4),
+        "upstream_calls": int(registry.counter("upstream_calls_total",
+                                               endpoint="stock_individual_info_em", status="ok")),
+        "coalesced": int(registry.counter("upstream_coalesced_total", endpoint="profile")),
+        "errors": errors,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地查询服务基准测试")
+    parser.add_argument("--symbols", type=int, default=500, help="本地存储中的股票数量")
+    parser.add_argument("--requests", type=int, default=20000, help="请求数量")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发客户端连接数")
+    parser.add_argument("--burst", type=int, default=200, help="合并测试中同时发送的相同请求数")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="合并测试中模拟的上游延迟（秒）")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="stma_bench_query_") as work_dir:
+        store_root = os.path.join(work_dir, "store")
+        print(f"构建本地存储（{args.symbols} 只股票）...")
+        symbols = build_store(store_root, args.symbols)
+        targets = make_targets(symbols, args.requests)
+
+        throughput = bench_throughput(store_root, targets, args.concurrency)
+        print(f"本地命中: {throughput['requests_per_second']} 请求/秒，"
+              f"p50 {throughput['p50_ms']} ms，p99 {throughput['p99_ms']} ms，错误 {throughput['errors']}")
+
+        coalescing = bench_coalescing(work_dir, args.burst, args.upstream_latency)
+        print(f"请求合并: 同时 {coalescing['burst']} 个相同请求，上游调用 {coalescing['upstream_calls']} 次，"
+              f"合并 {coalescing['coalesced']} 次，耗时 {coalescing['seconds']:.3f} 秒")
+
+    report = {"symbols": args.symbols, "throughput": throughput, "coalescing": coalescing}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
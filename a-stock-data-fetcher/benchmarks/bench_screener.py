@@ -0,0 +1,101 @@
+"""
+选股引擎扩展性基准测试
+用全市场合成数据构建选股面板，分别以 1、2、4…个进程运行同一个选股表达式，
+输出耗时和相对单进程的加速比
+
+用法:
+    python bench_screener.py --output screener.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_source import ReplayDataSource
+from local_store import LocalStore
+from screener import build_panel, screen
+from stock_history import StockHistoryFetcher
+from stock_info import StockInfoFetcher
+
+from fixtures import KLINE_END_DATE, KLINE_START_DATE, load_or_generate_universe
+
+DEFAULT_FILTER = "close > ma60 and ma20 > ma60 and 0 < pe < 80 and rsi14 < 70"
+DEFAULT_SCORE = "ret60 / vol60 - drawdown120 / 10 + roe / 5"
+
+
+def prepare_panel(fixtures: str, count: int, work_dir: str) -> str:
+    """把录制数据写入本地存储并构建选股面板，返回面板目录"""
+    symbols = load_or_generate_universe(fixtures, count)
+    source = ReplayDataSource(root=fixtures)
+    store = LocalStore(os.path.join(work_dir, "store"))
+    store.write("spot", "latest", StockInfoFetcher(source).get_all_stock_list())
+    history = StockHistoryFetcher(source)
+    for symbol in symbols:
+        store.write("kline", symbol, history.get_daily_kline(symbol, KLINE_START_DATE, KLINE_END_DATE))
+    panel_dir = os.path.join(work_dir, "panel")
+    build_panel(store, panel_dir)
+    return panel_dir
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="选股引擎扩展性基准测试")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "stma_bench_fixtures"),
+                        help="录制数据目录，不存在时自动生成")
+    parser.add_argument("--symbols", type=int, default=5000, help="股票数量")
+    parser.add_argument("--workers", default=None,
+                        help="要测试的进程数，逗号分隔，默认 1,2,4… 直到CPU核数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个进程数重复次数，取最快一次")
+    parser.add_argument("--filter", dest="filter_expr", default=DEFAULT_FILTER, help="筛选表达式")
+    parser.add_argument("--score", dest="score_expr", default=DEFAULT_SCORE, help="打分表达式")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        cpus = os.cpu_count() or 1
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= cpus:
+            worker_counts.append(worker_counts[-1] * 2)
+        if worker_counts[-1] != cpus:
+            worker_counts.append(cpus)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="stma_bench_screener_") as work_dir:
+        print(f"构建选股面板（{args.symbols} 只股票）...")
+        panel_dir = prepare_panel(args.fixtures, args.symbols, work_dir)
+
+        for workers in worker_counts:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                selected = screen(panel_dir, args.filter_expr, args.score_expr, workers=workers)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            results.append({"workers": workers, "seconds": round(best, 4), "selected": len(selected)})
+
+    base = results[0]["seconds"]
+    for result in results:
+        result["speedup"] = round(base / result["seconds"], 2)
+        result["efficiency"] = round(result["speedup"] / (result["workers"] / results[0]["workers"]), 2)
+        print(f"进程数 {result['workers']:>3}: {result['seconds']:.3f} 秒，"
+              f"加速比 {result['speedup']}，并行效率 {result['efficiency']}")
+
+    report = {"symbols": args.symbols, "filter": args.filter_expr, "score": args.score_expr,
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
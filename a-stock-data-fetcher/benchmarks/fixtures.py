@@ -0,0 +1,221 @@
+"""
+基准测试数据生成模块
+生成覆盖全市场的合成录制数据，格式与回放数据源一致，
+保证基准测试可以离线、可重复地运行
+"""
+
+import json
+import os
+import sys
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_source import save_fixture
+
+# 基准测试统一使用的K线日期范围
+KLINE_START_DATE = "20200101"
+KLINE_END_DATE = "20231231"
+
+# 报表类接口
+STATEMENT_FUNCS = [
+    "stock_financial_abstract",
+    "stock_balance_sheet_by_report_em",
+    "stock_profit_sheet_by_report_em",
+    "stock_cash_flow_sheet_by_report_em",
+]
+
+# 报表中的科目数量（列数），与东方财富报表的量级相当
+STATEMENT_COLUMNS = 120
+
+# 报告期数量
+STATEMENT_PERIODS = 40
+
+# 记录已生成数据参数的文件
+MANIFEST_FILE = "universe.json"
+
+_NAME_WORDS = ["银行", "科技", "医药", "能源", "电子", "证券", "地产", "汽车", "食品", "化工"]
+
+
+def make_symbols(count: int) -> List[str]:
+    """
+    生成股票代码列表，按沪市、深市、京市的比例分配
+
+    参数:
+        count: 股票数量
+
+    返回:
+        6位股票代码列表
+    """
+    sh = count * 45 // 100
+    bj = count * 5 // 100
+    sz = count - sh - bj
+    symbols = [f"{600000 + i:06d}" for i in range(sh)]
+    symbols += [f"{1 + i:06d}" for i in range(sz)]
+    symbols += [f"{830000 + i:06d}" for i in range(bj)]
+    return symbols
+
+
+def make_spot_table(symbols: List[str], rng: np.random.Generator) -> pd.DataFrame:
+    """
+    生成与 stock_zh_a_spot_em 结构一致的实时行情表
+
+    参数:
+        symbols: 股票代码列表
+        rng: 随机数生成器
+
+    返回:
+        实时行情DataFrame
+    """
+    n = len(symbols)
+    price = rng.uniform(2, 200, n).round(2)
+    change = rng.normal(0, 2, n).round(2)
+    names = [f"{_NAME_WORDS[i % len(_NAME_WORDS)]}{i:04d}" for i in range(n)]
+    return pd.DataFrame({
+        "序号": np.arange(1, n + 1),
+        "代码": symbols,
+        "名称": names,
+        "最新价": price,
+        "涨跌幅": change,
+        "涨跌额": (price * change / 100).round(2),
+        "成交量": rng.integers(1_000, 5_000_000, n),
+        "成交额": rng.uniform(1e6, 5e9, n).round(2),
+        "振幅": rng.uniform(0, 10, n).round(2),
+        "最高": (price * 1.02).round(2),
+        "最低": (price * 0.98).round(2),
+        "今开": (price * 0.995).round(2),
+        "昨收": (price - price * change / 100).round(2),
+        "量比": rng.uniform(0.3, 3, n).round(2),
+        "换手率": rng.uniform(0, 15, n).round(2),
+        "市盈率-动态": rng.uniform(-50, 200, n).round(2),
+        "市净率": rng.uniform(0.3, 20, n).round(2),
+        "总市值": rng.uniform(1e9, 2e12, n).round(0),
+        "流通市值": rng.uniform(5e8, 1e12, n).round(0),
+    })
+
+
+def make_kline(
+    symbol: str,
+    dates: pd.DatetimeIndex,
+    rng: np.random.Generator
+) -> pd.DataFrame:
+    """
+    生成与 stock_zh_a_hist 结构一致的日K线数据（随机游走）
+
+    参数:
+        symbol: 股票代码
+        dates: 交易日序列
+        rng: 随机数生成器
+
+    返回:
+        日K线DataFrame
+    """
+    n = len(dates)
+    close = (rng.uniform(5, 100) * np.exp(np.cumsum(rng.normal(0, 0.02, n)))).round(2)
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    open_ = (prev_close * (1 + rng.normal(0, 0.005, n))).round(2)
+    high = (np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, n))).round(2)
+    low = (np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, n))).round(2)
+    volume = rng.integers(10_000, 2_000_000, n)
+    return pd.DataFrame({
+        "日期": dates.strftime("%Y-%m-%d"),
+        "股票代码": symbol,
+        "开盘": open_,
+        "收盘": close,
+        "最高": high,
+        "最低": low,
+        "成交量": volume,
+        "成交额": (volume * close * 100).round(2),
+        "振幅": ((high - low) / prev_close * 100).round(2),
+        "涨跌幅": ((close - prev_close) / prev_close * 100).round(2),
+        "涨跌额": (close - prev_close).round(2),
+        "换手率": rng.uniform(0, 10, n).round(2),
+    })
+
+
+def make_statement(symbol: str, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    生成报表类接口的数据，每行一个报告期、每列一个科目
+
+    参数:
+        symbol: 股票代码
+        rng: 随机数生成器
+
+    返回:
+        报表DataFrame
+    """
+    periods = pd.period_range(end="2023Q4", periods=STATEMENT_PERIODS, freq="Q")
+    data = {
+        "SECURITY_CODE": symbol,
+        "报告期": periods.strftime("%Y-%m-%d"),
+    }
+    values = rng.normal(1e8, 5e7, (STATEMENT_PERIODS, STATEMENT_COLUMNS))
+    for i in range(STATEMENT_COLUMNS):
+        data[f"ITEM_{i:03d}"] = values[:, i]
+    data["净资产收益率"] = rng.uniform(-10, 30, STATEMENT_PERIODS).round(2)
+    return pd.DataFrame(data)
+
+
+def generate_universe(root: str, count: int = 5000, seed: int = 0) -> List[str]:
+    """
+    生成全市场录制数据，写入回放数据源可读取的目录
+
+    参数:
+        root: 录制数据目录
+        count: 股票数量，默认约等于A股全市场
+        seed: 随机数种子
+
+    返回:
+        生成的股票代码列表
+    """
+    rng = np.random.default_rng(seed)
+    symbols = make_symbols(count)
+
+    save_fixture(root, "stock_zh_a_spot_em", {}, make_spot_table(symbols, rng))
+
+    dates = pd.bdate_range(KLINE_START_DATE, KLINE_END_DATE)
+    for symbol in symbols:
+        save_fixture(
+            root,
+            "stock_zh_a_hist",
+            {
+                "symbol": symbol,
+                "period": "daily",
+                "start_date": KLINE_START_DATE,
+                "end_date": KLINE_END_DATE,
+                "adjust": "qfq",
+            },
+            make_kline(symbol, dates, rng)
+        )
+        for func_name in STATEMENT_FUNCS:
+            save_fixture(root, func_name, {"symbol": symbol}, make_statement(symbol, rng))
+
+    with open(os.path.join(root, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"count": count, "seed": seed, "symbols": symbols}, f)
+
+    return symbols
+
+
+def load_or_generate_universe(root: str, count: int = 5000, seed: int = 0) -> List[str]:
+    """
+    读取已生成的录制数据；参数不一致或不存在时重新生成
+
+    参数:
+        root: 录制数据目录
+        count: 股票数量
+        seed: 随机数种子
+
+    返回:
+        股票代码列表
+    """
+    manifest_path = os.path.join(root, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("count") == count and manifest.get("seed") == seed:
+            return manifest["symbols"]
+    return generate_universe(root, count, seed)
@@ -0,0 +1,462 @@
+"""
+热点路径基准测试脚本
+基于回放数据源离线测量K线批量获取、股票搜索、财务报表获取和数据导出的性能，
+输出吞吐量、p50/p99延迟和峰值内存（RSS），结果保存为JSON便于跨提交对比
+
+用法:
+    python run_benchmarks.py --output results.json
+    python run_benchmarks.py --symbols 500 --compare baseline.json
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_source import ReplayDataSource, save_fixture
+from kline_archive import KlineArchive, KlineArchiveWriter
+from kline_validation import repair_kline
+from stock_financial import StockFinancialFetcher
+from stock_history import StockHistoryFetcher
+from stock_info import StockInfoFetcher
+from trading_calendar import TradingCalendar
+
+from fixtures import KLINE_END_DATE, KLINE_START_DATE, load_or_generate_universe
+
+# 搜索用例使用的关键字
+SEARCH_KEYWORDS = ["银行", "科技", "医药", "能源", "电子", "证券", "地产", "汽车", "0001", "不存在"]
+
+
+def _peak_rss_kb() -> int:
+    """当前进程的峰值常驻内存（KB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 下 ru_maxrss 的单位是字节
+    if sys.platform == "darwin":
+        peak //= 1024
+    return int(peak)
+
+
+def _summarize(latencies: List[float], total_seconds: float, items: int) -> Dict:
+    """
+    汇总一组调用延迟
+
+    参数:
+        latencies: 每次调用的耗时（秒）
+        total_seconds: 总耗时（秒）
+        items: 处理的条目数，用于计算吞吐量
+
+    返回:
+        包含吞吐量和延迟分位数的字典
+    """
+    arr = np.asarray(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "items": items,
+        "total_seconds": round(total_seconds, 4),
+        "throughput_per_second": round(items / total_seconds, 2) if total_seconds else None,
+        "p50_ms": round(float(np.percentile(arr, 50)), 3) if len(arr) else None,
+        "p99_ms": round(float(np.percentile(arr, 99)), 3) if len(arr) else None,
+        "max_ms": round(float(arr.max()), 3) if len(arr) else None,
+    }
+
+
+def _timed_loop(func: Callable, args_list: List) -> Dict:
+    """依次调用 func(*args) 并统计延迟"""
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - t0)
+    return _summarize(latencies, time.perf_counter() - start, len(args_list))
+
+
+def bench_kline_bulk(params: Dict) -> Dict:
+    """全市场日K线批量获取"""
+    fetcher = StockHistoryFetcher(data_source=_replay(params))
+    args = [(s, KLINE_START_DATE, KLINE_END_DATE) for s in params["symbols"]]
+    return _timed_loop(fetcher.get_daily_kline, args)
+
+
+def bench_kline_validate(params: Dict) -> Dict:
+    """全市场日K线批量获取并校验，统计校验耗时占获取耗时的比例"""
+    fetcher = StockHistoryFetcher(data_source=_replay(params))
+    latencies = []
+    validate_seconds = 0.0
+    start = time.perf_counter()
+    for symbol in params["symbols"]:
+        t0 = time.perf_counter()
+        df = fetcher.get_daily_kline(symbol, KLINE_START_DATE, KLINE_END_DATE)
+        t1 = time.perf_counter()
+        repair_kline(df, lambda s, e, symbol=symbol: fetcher.get_daily_kline(symbol, s, e))
+        t2 = time.perf_counter()
+        validate_seconds += t2 - t1
+        latencies.append(t2 - t0)
+    total = time.perf_counter() - start
+    result = _summarize(latencies, total, len(latencies))
+    result["validation_seconds"] = round(validate_seconds, 4)
+    result["validation_overhead_pct"] = round(validate_seconds / (total - validate_seconds) * 100, 2)
+    return result
+
+
+def bench_kline_validate_calendar(params: Dict) -> Dict:
+    """
+    带交易日历的K线校验：每10只股票中有1只缺少连续3个交易日（模拟短暂停牌，重新请求返回空），
+    连续模拟两次全量刷新，第二次传入第一次没有补齐的缺口，统计每次的重新请求次数和校验耗时占比；
+    顶层结果为第二次（稳定状态）的统计，第一次的统计在 first_run 中
+    """
+    fetcher = StockHistoryFetcher(data_source=_replay(params))
+    calendar_dir = tempfile.mkdtemp(prefix="stma_bench_calendar_")
+    try:
+        save_fixture(calendar_dir, "tool_trade_date_hist_sina", {},
+                     pd.DataFrame({"trade_date": pd.bdate_range(KLINE_START_DATE, KLINE_END_DATE)}))
+        calendar = TradingCalendar(ReplayDataSource(root=calendar_dir))
+        calendar.days
+    finally:
+        shutil.rmtree(calendar_dir, ignore_errors=True)
+
+    known_gaps: Dict[str, List] = {}
+    runs = []
+    for _ in range(2):
+        refetches = 0
+
+        def refetch(start: str, end: str, symbol: str) -> pd.DataFrame:
+            nonlocal refetches
+            refetches += 1
+            return fetcher.get_daily_kline(symbol, start, end)
+
+        latencies = []
+        validate_seconds = 0.0
+        start = time.perf_counter()
+        for i, symbol in enumerate(params["symbols"]):
+            t0 = time.perf_counter()
+            df = fetcher.get_daily_kline(symbol, KLINE_START_DATE, KLINE_END_DATE)
+            if i % 10 == 0:
+                df = df.drop(index=df.index[100 + i % 500:103 + i % 500])
+            t1 = time.perf_counter()
+            repaired = repair_kline(df, lambda s, e, symbol=symbol: refetch(s, e, symbol), calendar,
+                                    known_gaps=known_gaps.get(symbol))
+            if repaired.unfilled_gaps:
+                known_gaps.setdefault(symbol, []).extend(repaired.unfilled_gaps)
+            t2 = time.perf_counter()
+            validate_seconds += t2 - t1
+            latencies.append(t2 - t0)
+        total = time.perf_counter() - start
+        result = _summarize(latencies, total, len(latencies))
+        result["refetches"] = refetches
+        result["validation_seconds"] = round(validate_seconds, 4)
+        result["validation_overhead_pct"] = round(validate_seconds / (total - validate_seconds) * 100, 2)
+        runs.append(result)
+    runs[1]["first_run"] = runs[0]
+    return runs[1]
+
+
+def bench_search(params: Dict) -> Dict:
+    """按名称搜索股票（每次搜索都会重新获取全市场列表）"""
+    fetcher = StockInfoFetcher(data_source=_replay(params))
+    args = [(k,) for k in SEARCH_KEYWORDS * params["search_rounds"]]
+    return _timed_loop(fetcher.search_stock_by_name, args)
+
+
+def bench_statements(params: Dict) -> Dict:
+    """财务指标和三大报表获取"""
+    fetcher = StockFinancialFetcher(data_source=_replay(params))
+    methods = [
+        fetcher.get_financial_indicators,
+        fetcher.get_balance_sheet,
+        fetcher.get_income_statement,
+        fetcher.get_cash_flow,
+    ]
+    symbols = params["symbols"][:params["statement_symbols"]]
+    latencies = []
+    start = time.perf_counter()
+    for symbol in symbols:
+        for method in methods:
+            t0 = time.perf_counter()
+            method(symbol)
+            latencies.append(time.perf_counter() - t0)
+    return _summarize(latencies, time.perf_counter() - start, len(latencies))
+
+
+def _export_frames(params: Dict) -> List[pd.DataFrame]:
+    """读取导出用例使用的K线数据"""
+    fetcher = StockHistoryFetcher(data_source=_replay(params))
+    symbols = params["symbols"][:params["export_symbols"]]
+    return [fetcher.get_daily_kline(s, KLINE_START_DATE, KLINE_END_DATE) for s in symbols]
+
+
+def _bench_export(params: Dict, suffix: str, save: Callable) -> Dict:
+    """逐个股票导出文件，统计耗时和文件体积"""
+    frames = _export_frames(params)
+    out_dir = tempfile.mkdtemp(prefix="stma_bench_export_")
+    try:
+        args = [(df, os.path.join(out_dir, f"{i}{suffix}")) for i, df in enumerate(frames)]
+        result = _timed_loop(save, args)
+        result["bytes"] = sum(os.path.getsize(path) for _, path in args if os.path.exists(path))
+        return result
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def bench_export_csv(params: Dict) -> Dict:
+    """save_to_csv 导出"""
+    return _bench_export(params, ".csv", StockHistoryFetcher(_replay(params)).save_to_csv)
+
+
+def bench_export_excel(params: Dict) -> Dict:
+    """save_to_excel 导出"""
+    return _bench_export(params, ".xlsx", StockHistoryFetcher(_replay(params)).save_to_excel)
+
+
+def bench_export_parquet(params: Dict) -> Dict:
+    """列式格式（Parquet）导出，作为 CSV/Excel 的对照"""
+    return _bench_export(params, ".parquet", lambda df, path: df.to_parquet(path, index=False))
+
+
+def bench_export_feather(params: Dict) -> Dict:
+    """列式格式（Feather）导出，作为 CSV/Excel 的对照"""
+    return _bench_export(params, ".feather", lambda df, path: df.to_feather(path))
+
+
+def bench_kline_archive(params: Dict) -> Dict:
+    """
+    K线归档文件：打包导出用例的全部K线，与CSV比较体积，
+    并随机读取单只股票一个季度的K线，统计读取延迟和实际读取的字节数
+    """
+    frames = _export_frames(params)
+    symbols = params["symbols"][:params["export_symbols"]]
+    out_dir = tempfile.mkdtemp(prefix="stma_bench_archive_")
+    try:
+        path = os.path.join(out_dir, "kline.stka")
+        start = time.perf_counter()
+        with KlineArchiveWriter(path) as writer:
+            for symbol, df in zip(symbols, frames):
+                writer.write(symbol, df)
+        build_seconds = time.perf_counter() - start
+        csv_bytes = sum(len(df.to_csv(index=False).encode("utf-8")) for df in frames)
+
+        rng = np.random.default_rng(0)
+        quarters = pd.period_range(KLINE_START_DATE, KLINE_END_DATE, freq="Q")
+        args = []
+        for i in rng.integers(0, len(symbols), params["archive_reads"]):
+            quarter = quarters[rng.integers(0, len(quarters))]
+            args.append((symbols[i], quarter.start_time.strftime("%Y%m%d"), quarter.end_time.strftime("%Y%m%d")))
+        with KlineArchive(path) as archive:
+            result = _timed_loop(archive.read, args)
+            result["bytes_read_per_call"] = archive.bytes_read // len(args)
+
+        result["build_seconds"] = round(build_seconds, 4)
+        result["bytes"] = os.path.getsize(path)
+        result["csv_bytes"] = csv_bytes
+        result["compression_ratio"] = round(csv_bytes / result["bytes"], 2)
+        return result
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def _replay(params: Dict) -> ReplayDataSource:
+    """创建基准测试使用的回放数据源"""
+    return ReplayDataSource(
+        root=params["fixtures"],
+        latency=params["latency"],
+        seed=0
+    )
+
+
+# 用例名 -> (函数, 依赖的可选包)
+CASES = {
+    "kline_bulk": (bench_kline_bulk, None),
+    "kline_validate": (bench_kline_validate, None),
+    "kline_validate_calendar": (bench_kline_validate_calendar, None),
+    "search": (bench_search, None),
+    "statements": (bench_statements, None),
+    "export_csv": (bench_export_csv, None),
+    "export_excel": (bench_export_excel, "openpyxl"),
+    "export_parquet": (bench_export_parquet, "pyarrow"),
+    "export_feather": (bench_export_feather, "pyarrow"),
+    "kline_archive": (bench_kline_archive, None),
+}
+
+
+# 等待子进程结果时检查其是否仍在运行的间隔（秒）
+CHILD_POLL_INTERVAL = 1.0
+
+
+def _run_case_in_child(name: str, params: Dict, queue: multiprocessing.Queue) -> None:
+    """在子进程中运行单个用例，使峰值内存互不干扰"""
+    func = CASES[name][0]
+    try:
+        # 只保留严重错误日志，避免日志输出影响计时
+        logging.getLogger().setLevel(logging.CRITICAL)
+        result = func(params)
+        result["peak_rss_kb"] = _peak_rss_kb()
+        queue.put(result)
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_case(name: str, params: Dict, timeout: Optional[float] = None) -> Dict:
+    """
+    运行单个用例
+
+    参数:
+        name: 用例名
+        params: 基准测试参数
+        timeout: 用例的最长运行时间（秒），超时后终止子进程，默认不限
+
+    返回:
+        用例结果字典；子进程异常退出（如内存不足被杀死）或超时时返回包含 error 的字典
+    """
+    optional = CASES[name][1]
+    if optional is not None:
+        try:
+            __import__(optional)
+        except ImportError:
+            return {"skipped": f"未安装 {optional}"}
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_case_in_child, args=(name, params, queue))
+    process.start()
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    try:
+        while True:
+            try:
+                return queue.get(timeout=CHILD_POLL_INTERVAL)
+            except queue_module.Empty:
+                pass
+            if not process.is_alive():
+                # 子进程可能在退出前刚写入结果，再取一次
+                try:
+                    return queue.get(timeout=CHILD_POLL_INTERVAL)
+                except queue_module.Empty:
+                    return {"error": f"子进程异常退出，exitcode={process.exitcode}"}
+            if deadline is not None and time.monotonic() > deadline:
+                return {"error": f"运行超过 {timeout:g} 秒，已终止"}
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+
+def _git_commit() -> Optional[str]:
+    """当前代码所在的git提交，用于标记结果"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current: Dict, baseline: Dict) -> None:
+    """
+    打印当前结果与基线结果的对比
+
+    参数:
+        current: 本次结果
+        baseline: 基线结果（之前保存的JSON）
+    """
+    print(f"\n与基线 {baseline['meta'].get('commit')} 对比:")
+    print(f"{'用例':<16}{'吞吐量变化':>12}{'p50变化':>12}{'p99变化':>12}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or "throughput_per_second" not in result or "throughput_per_second" not in base:
+            continue
+        row = [name.ljust(16)]
+        for key in ("throughput_per_second", "p50_ms", "p99_ms"):
+            if base[key]:
+                row.append(f"{(result[key] - base[key]) / base[key] * 100:+11.1f}%")
+            else:
+                row.append(" " * 12)
+        print("".join(row))
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="STMA 热点路径基准测试")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "stma_bench_fixtures"),
+                        help="录制数据目录，不存在时自动生成")
+    parser.add_argument("--symbols", type=int, default=5000, help="股票数量（默认全市场规模）")
+    parser.add_argument("--seed", type=int, default=0, help="生成录制数据的随机数种子")
+    parser.add_argument("--latency", type=float, default=0.0, help="回放时模拟的上游延迟（秒）")
+    parser.add_argument("--search-rounds", type=int, default=5, help="搜索用例的轮数")
+    parser.add_argument("--statement-symbols", type=int, default=1000, help="报表用例的股票数量")
+    parser.add_argument("--export-symbols", type=int, default=200, help="导出用例的股票数量")
+    parser.add_argument("--archive-reads", type=int, default=2000, help="归档用例的随机读取次数")
+    parser.add_argument("--cases", default=",".join(CASES), help="要运行的用例，逗号分隔")
+    parser.add_argument("--case-timeout", type=float, default=3600.0,
+                        help="单个用例的最长运行时间（秒），超时后终止并记为错误")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    parser.add_argument("--compare", help="用于对比的基线结果JSON文件")
+    args = parser.parse_args(argv)
+
+    print(f"准备录制数据: {args.fixtures}（{args.symbols} 只股票）")
+    symbols = load_or_generate_universe(args.fixtures, args.symbols, args.seed)
+
+    params = {
+        "fixtures": args.fixtures,
+        "symbols": symbols,
+        "latency": args.latency,
+        "search_rounds": args.search_rounds,
+        "statement_symbols": args.statement_symbols,
+        "export_symbols": args.export_symbols,
+        "archive_reads": args.archive_reads,
+    }
+
+    results = {}
+    for name in args.cases.split(","):
+        name = name.strip()
+        if name not in CASES:
+            parser.error(f"未知用例: {name}")
+        print(f"运行用例 {name} ...")
+        results[name] = run_case(name, params, timeout=args.case_timeout)
+        print(f"  {json.dumps(results[name], ensure_ascii=False)}")
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "symbols": args.symbols,
+            "latency": args.latency,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_results(report, json.load(f))
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
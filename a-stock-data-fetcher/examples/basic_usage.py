@@ -3,6 +3,7 @@ A股数据获取示例脚本
 演示如何使用各个模块获取股票数据
 """
 
+import logging
 import sys
 import os
 
@@ -146,6 +147,9 @@ def example_get_all_stocks():
 
 def main():
     """主函数"""
+    # 获取器通过logging输出进度信息，这里打开INFO级别以便查看
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     print("A股市场数据获取工具 - 使用示例")
     print("=" * 60)
 
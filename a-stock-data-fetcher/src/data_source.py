@@ -0,0 +1,359 @@
+"""
+数据源后端模块
+将对上游数据接口（akshare）的调用抽象为可替换的后端，
+并提供录制/回放后端，用于离线基准测试和压力测试
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+try:
+    from .metrics import MetricsRegistry, get_metrics
+except ImportError:
+    from metrics import MetricsRegistry, get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DataSourceError(Exception):
+    """数据源调用失败（包括回放后端注入的错误）"""
+
+
+class FixtureNotFoundError(DataSourceError):
+    """回放目录中找不到对应请求的录制数据"""
+
+
+class TransientDataSourceError(DataSourceError):
+    """可以重试的临时错误，如回放后端注入的错误"""
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    判断调用失败是否为可以重试的临时错误
+
+    只有网络请求失败、连接错误、超时和回放后端注入的错误才值得重试；
+    缺少依赖、参数错误、接口不存在、缺少录制数据等重试也不会成功
+
+    参数:
+        error: 调用抛出的异常
+
+    返回:
+        是否可以重试
+    """
+    if isinstance(error, (TransientDataSourceError, ConnectionError, TimeoutError)):
+        return True
+    try:
+        # requests 由akshare使用，推迟到出错时再导入，不影响导入速度
+        import requests
+    except ImportError:
+        return False
+    return isinstance(error, requests.RequestException)
+
+
+def fixture_key(func_name: str, kwargs: Dict[str, Any]) -> str:
+    """
+    计算一次上游调用对应的录制文件键
+
+    参数:
+        func_name: 上游函数名，如'stock_zh_a_hist'
+        kwargs: 调用参数
+
+    返回:
+        由函数名和参数决定的稳定哈希字符串
+    """
+    payload = json.dumps(
+        {"func": func_name, "kwargs": kwargs},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def fixture_path(root: str, func_name: str, kwargs: Dict[str, Any]) -> str:
+    """
+    获取录制文件的完整路径，按函数名分目录存放
+
+    参数:
+        root: 录制数据根目录
+        func_name: 上游函数名
+        kwargs: 调用参数
+
+    返回:
+        录制文件路径
+    """
+    return os.path.join(root, func_name, fixture_key(func_name, kwargs) + ".pkl")
+
+
+class DataSource:
+    """数据源后端基类，所有获取器通过 fetch 调用上游接口"""
+
+    name = "base"
+
+    def __init__(
+        self,
+        max_retries: int = 0,
+        retry_delay: float = 0.5,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        """
+        参数:
+            max_retries: 调用失败后的最大重试次数
+            retry_delay: 重试前的等待时间（秒），按重试次数线性递增
+            metrics: 指标注册表，默认使用全局注册表
+        """
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.metrics = metrics
+
+    def fetch(self, func_name: str, **kwargs: Any) -> pd.DataFrame:
+        """
+        调用上游接口，临时错误（见 is_transient_error）按配置重试，并记录耗时、行数、字节数等指标
+
+        参数:
+            func_name: 上游函数名，与akshare中的函数名一致
+            **kwargs: 传给上游函数的参数
+
+        返回:
+            上游返回的DataFrame
+        """
+        metrics = self.metrics or get_metrics()
+        retries = 0
+        start = time.perf_counter()
+        while True:
+            try:
+                df = self._call(func_name, kwargs)
+                break
+            except Exception as e:
+                if retries >= self.max_retries or not is_transient_error(e):
+                    metrics.record_call(
+                        func_name, time.perf_counter() - start, retries=retries, error=e
+                    )
+                    raise
+                retries += 1
+                metrics.record_retry(func_name)
+                logger.warning("调用 %s 失败，第 %d 次重试: %s", func_name, retries, e)
+                if self.retry_delay:
+                    time.sleep(self.retry_delay * retries)
+
+        if metrics.enabled:
+            is_frame = isinstance(df, pd.DataFrame)
+            metrics.record_call(
+                func_name,
+                time.perf_counter() - start,
+                rows=len(df) if is_frame else 0,
+                nbytes=int(df.memory_usage(index=True).sum()) if is_frame else 0,
+                retries=retries
+            )
+        return df
+
+    def _call(self, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+        """由子类实现的实际调用逻辑"""
+        raise NotImplementedError
+
+
+class AkshareDataSource(DataSource):
+    """直接调用akshare的在线数据源"""
+
+    name = "akshare"
+
+    def __init__(self, http_pool: bool = False, pool_maxsize: Optional[int] = None, **options: Any):
+        """
+        参数:
+            http_pool: 是否让akshare的HTTP请求经过共享连接池，复用连接；
+                连接池替换的是整个进程的 requests.request，宿主程序自己的 requests 调用也会共用同一个会话
+                （cookie、请求头），因此默认关闭，由批量刷新、查询服务等独立进程开启
+            pool_maxsize: 每个主机保持的最大连接数，应不小于并发线程数，默认见 http_pool 模块
+            **options: 重试和指标相关参数，见 DataSource
+        """
+        super().__init__(**options)
+        self.http_pool = http_pool
+        self.pool_maxsize = pool_maxsize
+
+    def _install_http_pool(self) -> None:
+        try:
+            from .http_pool import get_http_pool, install_http_pool
+        except ImportError:
+            from http_pool import get_http_pool, install_http_pool
+
+        if get_http_pool() is None:
+            options = {"pool_maxsize": self.pool_maxsize} if self.pool_maxsize else {}
+            install_http_pool(**options)
+
+    def _call(self, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+        if self.http_pool:
+            self._install_http_pool()
+        # akshare 导入耗时数秒，推迟到第一次真正访问网络时再导入
+        import akshare as ak
+
+        func = getattr(ak, func_name, None)
+        if func is None:
+            raise DataSourceError(f"akshare 中不存在接口 {func_name}")
+        return func(**kwargs)
+
+
+class RecordingDataSource(DataSource):
+    """
+    录制数据源
+    将请求转发给上游数据源，并把每次返回的数据保存到磁盘，供回放使用
+    """
+
+    name = "record"
+
+    def __init__(self, root: str, upstream: Optional[DataSource] = None, **options: Any):
+        """
+        参数:
+            root: 录制数据保存目录
+            upstream: 被录制的上游数据源，默认为akshare
+            **options: 重试和指标相关参数，见 DataSource
+        """
+        super().__init__(**options)
+        self.root = root
+        self.upstream = upstream or AkshareDataSource()
+
+    def _call(self, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+        # 直接调用上游的 _call，重试和指标由本数据源统一处理，避免重复记录
+        df = self.upstream._call(func_name, kwargs)
+        save_fixture(self.root, func_name, kwargs, df)
+        return df
+
+
+class ReplayDataSource(DataSource):
+    """
+    回放数据源
+    从磁盘读取录制的数据，可配置模拟延迟和错误注入，不访问网络
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        root: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        **options: Any
+    ):
+        """
+        参数:
+            root: 录制数据目录
+            latency: 每次调用的固定延迟（秒）
+            jitter: 在固定延迟之上叠加的随机延迟上限（秒）
+            error_rate: 注入错误的概率，取值0~1
+            seed: 随机数种子，便于复现同一组延迟和错误
+            **options: 重试和指标相关参数，见 DataSource
+        """
+        super().__init__(**options)
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError("error_rate 必须在 0 到 1 之间")
+        self.root = root
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def _call(self, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0.0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise TransientDataSourceError(f"回放数据源注入错误: {func_name}")
+
+        return load_fixture(self.root, func_name, kwargs)
+
+
+def save_fixture(
+    root: str,
+    func_name: str,
+    kwargs: Dict[str, Any],
+    df: pd.DataFrame
+) -> str:
+    """
+    保存一次上游调用的返回数据
+
+    参数:
+        root: 录制数据根目录
+        func_name: 上游函数名
+        kwargs: 调用参数
+        df: 上游返回的DataFrame
+
+    返回:
+        保存的文件路径
+    """
+    path = fixture_path(root, func_name, kwargs)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_fixture(root: str, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+    """
+    读取一次上游调用的录制数据
+
+    参数:
+        root: 录制数据根目录
+        func_name: 上游函数名
+        kwargs: 调用参数
+
+    返回:
+        录制的DataFrame
+    """
+    path = fixture_path(root, func_name, kwargs)
+    if not os.path.exists(path):
+        raise FixtureNotFoundError(f"未找到录制数据: {func_name}({kwargs})")
+    return pd.read_pickle(path)
+
+
+def create_data_source(name: str = "akshare", **options: Any) -> DataSource:
+    """
+    按名称创建数据源
+
+    参数:
+        name: 数据源名称，'akshare'、'record' 或 'replay'
+        **options: 传给对应数据源构造函数的参数
+
+    返回:
+        数据源实例
+    """
+    if name == "akshare":
+        return AkshareDataSource(**options)
+    if name == "record":
+        return RecordingDataSource(**options)
+    if name == "replay":
+        return ReplayDataSource(**options)
+    raise ValueError(f"不支持的数据源: {name}")
+
+
+_default_data_source: Optional[DataSource] = None
+
+
+def get_default_data_source() -> DataSource:
+    """获取全局默认数据源，未设置时使用akshare"""
+    global _default_data_source
+    if _default_data_source is None:
+        _default_data_source = AkshareDataSource()
+    return _default_data_source
+
+
+def set_default_data_source(data_source: Optional[DataSource]) -> None:
+    """
+    设置全局默认数据源，之后新建的获取器都会使用它
+
+    参数:
+        data_source: 数据源实例，传None恢复为akshare
+    """
+    global _default_data_source
+    _default_data_source = data_source
@@ -0,0 +1,170 @@
+"""
+HTTP连接池模块
+为所有上游请求提供共享的 requests 会话：保持连接（keep-alive）、按主机限制连接数、
+启用压缩传输，并统计请求数、新建连接数和连接复用率
+
+akshare 内部直接调用 requests.get、requests.post 等函数，每次调用都会新建会话和连接；
+安装连接池后，这些调用都会改为经过共享会话发出。安装影响整个进程（包括宿主程序自己的 requests 调用，
+它们会共用同一个会话的cookie和请求头），只应在批量刷新、查询服务这类独立运行的进程中开启
+"""
+
+import logging
+import threading
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import requests
+import requests.api
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    from .metrics import MetricsRegistry, get_metrics
+except ImportError:
+    from metrics import MetricsRegistry, get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 缓存连接池的主机数量
+DEFAULT_POOL_CONNECTIONS = 16
+# 每个主机保持的最大空闲连接数，应不小于并发线程数
+DEFAULT_POOL_MAXSIZE = 32
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+def _counting_pool_class(base: type, adapter: "PooledHTTPAdapter") -> type:
+    """生成在新建连接时记录指标的连接池类"""
+
+    class CountingConnectionPool(base):
+        def _new_conn(self):
+            adapter.registry().record_http_connection(self.host)
+            return super()._new_conn()
+
+    CountingConnectionPool.__name__ = "Counting" + base.__name__
+    return CountingConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """记录请求数和新建连接数的 HTTPAdapter"""
+
+    def __init__(self, metrics: Optional[MetricsRegistry] = None, **kwargs: Any):
+        """
+        参数:
+            metrics: 指标注册表，默认使用全局注册表
+            **kwargs: 传给 HTTPAdapter 的参数，如 pool_connections、pool_maxsize
+        """
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def registry(self) -> MetricsRegistry:
+        """当前使用的指标注册表"""
+        return self.metrics or get_metrics()
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool_class(HTTPConnectionPool, self),
+            "https": _counting_pool_class(HTTPSConnectionPool, self),
+        }
+
+    def send(self, request, **kwargs: Any):
+        self.registry().record_http_request(urlsplit(request.url).hostname or "")
+        return super().send(request, **kwargs)
+
+
+class HTTPPool:
+    """共享的 requests 会话及其连接池"""
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        timeout: Optional[float] = None,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        """
+        参数:
+            pool_connections: 缓存连接池的主机数量
+            pool_maxsize: 每个主机保持的最大空闲连接数
+            timeout: 调用方未指定超时时间时使用的默认超时（秒），None表示不设置
+            metrics: 指标注册表，默认使用全局注册表
+        """
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = PooledHTTPAdapter(
+            metrics, pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """
+        通过共享会话发出请求，参数与 requests.request 相同
+
+        返回:
+            响应对象
+        """
+        if self.timeout is not None and kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return self.session.request(method, url, **kwargs)
+
+    def close(self) -> None:
+        """关闭会话及其所有连接"""
+        self.session.close()
+
+
+_lock = threading.Lock()
+_installed: Optional[HTTPPool] = None
+_original_request = None
+
+
+def get_http_pool() -> Optional[HTTPPool]:
+    """获取当前安装的连接池，未安装时返回None"""
+    return _installed
+
+
+def install_http_pool(pool: Optional[HTTPPool] = None, **options: Any) -> HTTPPool:
+    """
+    安装共享连接池，之后 requests.get、requests.post、requests.request 等调用都会经过它
+
+    参数:
+        pool: 要安装的连接池，None表示按 options 新建；已安装且未传入 pool 时直接返回当前连接池
+        **options: 新建连接池的参数，见 HTTPPool
+
+    返回:
+        已安装的连接池
+    """
+    global _installed, _original_request
+    with _lock:
+        if pool is None and _installed is not None:
+            return _installed
+        if _original_request is None:
+            _original_request = requests.api.request
+        previous = _installed
+        _installed = pool or HTTPPool(**options)
+
+        # requests.get 等函数在调用时查找 requests.api.request，替换它即可覆盖所有快捷函数
+        requests.api.request = _installed.request
+        requests.request = _installed.request
+        if previous is not None and previous is not _installed:
+            previous.close()
+        logger.info("已安装共享HTTP连接池")
+        return _installed
+
+
+def uninstall_http_pool() -> None:
+    """卸载共享连接池，恢复 requests 的默认行为"""
+    global _installed, _original_request
+    with _lock:
+        if _original_request is not None:
+            requests.api.request = _original_request
+            requests.request = _original_request
+            _original_request = None
+        if _installed is not None:
+            _installed.close()
+            _installed = None
@@ -0,0 +1,394 @@
+"""
+K线归档文件模块
+把全市场所有股票的长周期日K线打包成单个压缩文件，按股票和日期随机读取
+
+文件结构:
+    文件头    MAGIC（8字节）
+    数据块    每只股票的K线按 BLOCK_ROWS 行切分为若干块，每块独立压缩
+    索引      zlib压缩的JSON：列名，以及每只股票每个块的 (首日, 末日, 行数, 偏移, 长度)
+    文件尾    索引偏移（8字节）、索引长度（8字节）、MAGIC（8字节）
+
+块内编码（压缩前，每块按该块数据自身的类型选择各列的编码并记录在块头）:
+    日期      距1970-01-01的天数，差分
+    整数列    差分（成交量等），只用于整数类型且没有缺失值的列
+    浮点列    价格、金额、涨跌幅等都是有限位小数，按小数位数放大为整数后差分；
+              不满足时（含NaN、inf等）将 float64 的二进制位与上一行异或
+              （相邻值的符号、指数和高位尾数相同，异或后高位字节多为0）
+    差分结果用zigzag映射为无符号数，每列按字节重排（所有值的第1个字节、第2个字节……依次排列），
+    使相同位置的字节相邻，再整体用zlib压缩，编码均无损
+
+用法（在 a-stock-data-fetcher 目录下）:
+    python -m src.kline_archive --store data/store --output data/kline.stka
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .local_store import LocalStore
+except ImportError:
+    from local_store import LocalStore
+
+MAGIC = b"STKARC01"
+
+# 文件尾：索引偏移、索引长度、MAGIC
+TRAILER = struct.Struct("<QQ8s")
+
+# 块头：行数，之后每列一个字节记录该列在块内的编码方式
+BLOCK_HEADER = struct.Struct("<I")
+
+# 每个块的最大行数，约为4年的日K线；块越小随机读取越快，但压缩率越低
+BLOCK_ROWS = 1024
+
+DATE_COLUMN = "日期"
+
+# 股票代码列不写入数据块，由索引记录，读取时按股票代码还原
+SYMBOL_COLUMN = "股票代码"
+
+# 块内每列的编码方式：0~MAX_DECIMALS 表示按该小数位数放大为整数后差分，其余见下
+CODE_XOR = 255
+CODE_DELTA = 254
+MAX_DECIMALS = 6
+
+
+def _days(dates: pd.Series) -> np.ndarray:
+    """日期列转换为距1970-01-01的天数"""
+    return pd.to_datetime(dates).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _day(date: str) -> int:
+    """单个日期转换为距1970-01-01的天数"""
+    return (pd.Timestamp(date) - pd.Timestamp(0)).days
+
+
+def _date_int(days: int) -> int:
+    """天数转换为 yyyymmdd 整数"""
+    return int(str(np.datetime64(int(days), "D")).replace("-", ""))
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    """按字节重排：先排所有值的第1个字节，再排第2个字节，依此类推"""
+    return values.view(np.uint8).reshape(-1, values.itemsize).T.tobytes()
+
+
+def _unshuffle(buffer: bytes, rows: int, dtype: np.dtype) -> np.ndarray:
+    itemsize = np.dtype(dtype).itemsize
+    return np.frombuffer(buffer, np.uint8).reshape(itemsize, rows).T.copy().view(dtype).ravel()
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    """有符号整数映射为无符号整数（0,-1,1,-2… -> 0,1,2,3…），使小的负差值高位字节也为0"""
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+def _decimal_places(values: np.ndarray) -> Optional[int]:
+    """
+    判断浮点列是否都是最多 MAX_DECIMALS 位小数的十进制数
+
+    返回:
+        可以无损还原的最少小数位数，不满足时返回None
+    """
+    if not np.isfinite(values).all() or np.signbit(values[values == 0]).any():
+        return None
+    for places in range(MAX_DECIMALS + 1):
+        scale = 10.0 ** places
+        scaled = np.round(values * scale)
+        if np.abs(scaled).max(initial=0) < 2 ** 53 and (scaled / scale == values).all():
+            return places
+    return None
+
+
+def _is_int_column(column: pd.Series) -> bool:
+    """是否可以按整数差分无损编码：整数类型、没有缺失值且不超出int64范围"""
+    if not pd.api.types.is_integer_dtype(column) or column.hasnans:
+        return False
+    return not (pd.api.types.is_unsigned_integer_dtype(column) and len(column) and column.max() > 2 ** 63 - 1)
+
+
+def _numeric_columns(df: pd.DataFrame) -> List[str]:
+    """写入归档的列：除日期和股票代码外的数值列"""
+    return [
+        name for name in df.columns
+        if name not in (DATE_COLUMN, SYMBOL_COLUMN)
+        and pd.api.types.is_numeric_dtype(df[name]) and not pd.api.types.is_bool_dtype(df[name])
+    ]
+
+
+def _encode_block(days: np.ndarray, columns: List[str], frame: pd.DataFrame, level: int) -> bytes:
+    codes = []
+    streams = [_shuffle(_zigzag(np.diff(days, prepend=0)))]
+    for name in columns:
+        column = frame[name]
+        if _is_int_column(column):
+            values = column.to_numpy(np.int64)
+            streams.append(_shuffle(_zigzag(np.diff(values, prepend=0))))
+            codes.append(CODE_DELTA)
+        else:
+            values = column.to_numpy(np.float64, na_value=np.nan)
+            places = _decimal_places(values)
+            if places is None:
+                bits = np.ascontiguousarray(values).view(np.uint64)
+                streams.append(_shuffle(bits ^ np.concatenate(([np.uint64(0)], bits[:-1]))))
+                codes.append(CODE_XOR)
+            else:
+                scaled = np.round(values * 10.0 ** places).astype(np.int64)
+                streams.append(_shuffle(_zigzag(np.diff(scaled, prepend=0))))
+                codes.append(places)
+    header = BLOCK_HEADER.pack(len(days)) + bytes(codes)
+    return header + zlib.compress(b"".join(streams), level)
+
+
+def _decode_block(data: bytes, columns: List[str]) -> Dict[str, np.ndarray]:
+    (rows,) = BLOCK_HEADER.unpack_from(data)
+    codes = data[BLOCK_HEADER.size:BLOCK_HEADER.size + len(columns)]
+    raw = zlib.decompress(data[BLOCK_HEADER.size + len(columns):])
+    streams = [raw[i * rows * 8:(i + 1) * rows * 8] for i in range(len(columns) + 1)]
+
+    decoded = {DATE_COLUMN: np.cumsum(_unzigzag(_unshuffle(streams[0], rows, np.uint64)))}
+    for name, code, stream in zip(columns, codes, streams[1:]):
+        values = _unshuffle(stream, rows, np.uint64)
+        if code == CODE_XOR:
+            decoded[name] = np.bitwise_xor.accumulate(values).view(np.float64)
+        elif code == CODE_DELTA:
+            decoded[name] = np.cumsum(_unzigzag(values))
+        else:
+            decoded[name] = np.cumsum(_unzigzag(values)) / 10.0 ** code
+    return decoded
+
+
+class KlineArchiveWriter:
+    """K线归档文件写入器，关闭时写入索引，先写临时文件再替换"""
+
+    def __init__(self, path: str, block_rows: int = BLOCK_ROWS, level: int = 6):
+        """
+        参数:
+            path: 归档文件路径
+            block_rows: 每个块的最大行数
+            level: zlib压缩级别，1~9
+        """
+        self.path = path
+        self.block_rows = block_rows
+        self.level = level
+        self.columns: Optional[List[str]] = None
+        self.has_symbol_column = False
+        self.index: Dict[str, List[List[int]]] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(MAGIC)
+
+    def write(self, symbol: str, df: pd.DataFrame) -> int:
+        """
+        写入一只股票的K线，同一只股票多次写入时日期需要接着上一次递增
+
+        参数:
+            symbol: 股票代码
+            df: 日K线，数值列需要与第一次写入的数据相同（顺序可以不同），不一致时抛出ValueError；
+                每列按本次数据的类型编码，日期、股票代码以外的非数值列不写入
+
+        返回:
+            写入的行数
+        """
+        if df is None or df.empty:
+            return 0
+        columns = _numeric_columns(df)
+        if self.columns is None:
+            self.columns = columns
+            self.has_symbol_column = SYMBOL_COLUMN in df.columns
+        elif set(columns) != set(self.columns):
+            missing = sorted(set(self.columns) - set(columns))
+            extra = sorted(set(columns) - set(self.columns))
+            raise ValueError(f"{symbol} 的数值列与归档不一致，缺少 {missing}，多出 {extra}")
+
+        days = _days(df[DATE_COLUMN])
+        order = np.argsort(days, kind="stable")
+        if (order != np.arange(len(order))).any():
+            df, days = df.iloc[order], days[order]
+
+        blocks = self.index.setdefault(symbol, [])
+        for start in range(0, len(df), self.block_rows):
+            chunk_days = days[start:start + self.block_rows]
+            chunk = df.iloc[start:start + self.block_rows]
+            data = _encode_block(chunk_days, self.columns, chunk, self.level)
+            offset = self._file.tell()
+            self._file.write(data)
+            blocks.append([_date_int(chunk_days[0]), _date_int(chunk_days[-1]),
+                           len(chunk_days), offset, len(data)])
+        return len(df)
+
+    def close(self) -> None:
+        """写入索引和文件尾，完成归档文件"""
+        if self._file.closed:
+            return
+        index = zlib.compress(json.dumps(
+            {"columns": self.columns or [], "symbol_column": self.has_symbol_column, "symbols": self.index},
+            ensure_ascii=False
+        ).encode("utf-8"))
+        offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(TRAILER.pack(offset, len(index), MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self) -> "KlineArchiveWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp_path)
+
+
+class KlineArchive:
+    """K线归档文件读取器，打开时只读取索引，查询时只读取与日期区间重叠的块"""
+
+    def __init__(self, path: str):
+        """
+        参数:
+            path: 归档文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "rb")
+        # 累计从文件读取的数据块字节数
+        self.bytes_read = 0
+
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"不是K线归档文件: {path}")
+        self._file.seek(-TRAILER.size, os.SEEK_END)
+        offset, length, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"K线归档文件不完整: {path}")
+        self._file.seek(offset)
+        index = json.loads(zlib.decompress(self._file.read(length)))
+        self.columns: List[str] = index["columns"]
+        self.has_symbol_column = index.get("symbol_column", False)
+        self.index: Dict[str, List[List[int]]] = index["symbols"]
+
+    def symbols(self) -> List[str]:
+        """归档中的所有股票代码"""
+        return sorted(self.index)
+
+    def date_range(self, symbol: str) -> Optional[Tuple[int, int]]:
+        """
+        获取股票K线的日期范围
+
+        返回:
+            (首日, 末日)，yyyymmdd 整数；股票不在归档中时返回None
+        """
+        blocks = self.index.get(symbol)
+        if not blocks:
+            return None
+        return blocks[0][0], blocks[-1][1]
+
+    def read(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        读取一只股票的K线
+
+        参数:
+            symbol: 股票代码
+            start: 开始日期（含），如'20230101'，默认不限
+            end: 结束日期（含），默认不限
+
+        返回:
+            日K线，日期列为'YYYY-MM-DD'字符串；股票不在归档中或区间内没有数据时返回空DataFrame
+        """
+        start_day = _day(start) if start else None
+        end_day = _day(end) if end else None
+        start_int = _date_int(start_day) if start else None
+        end_int = _date_int(end_day) if end else None
+        blocks = [
+            b for b in self.index.get(symbol, [])
+            if (start_int is None or b[1] >= start_int) and (end_int is None or b[0] <= end_int)
+        ]
+        if not blocks:
+            return pd.DataFrame()
+
+        parts = []
+        for _, _, _, offset, length in blocks:
+            with self._lock:
+                self._file.seek(offset)
+                data = self._file.read(length)
+                self.bytes_read += length
+            parts.append(_decode_block(data, self.columns))
+
+        columns = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+        days = columns.pop(DATE_COLUMN)
+        lo = np.searchsorted(days, start_day) if start else 0
+        hi = np.searchsorted(days, end_day, side="right") if end else len(days)
+        data = {DATE_COLUMN: days[lo:hi].astype("datetime64[D]").astype(str)}
+        if self.has_symbol_column:
+            data[SYMBOL_COLUMN] = symbol
+        data.update({name: values[lo:hi] for name, values in columns.items()})
+        return pd.DataFrame(data)
+
+    def close(self) -> None:
+        """关闭文件"""
+        self._file.close()
+
+    def __enter__(self) -> "KlineArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def build_archive(
+    store: LocalStore,
+    path: str,
+    symbols: Optional[List[str]] = None,
+    block_rows: int = BLOCK_ROWS
+) -> Dict[str, int]:
+    """
+    把本地存储中的K线打包成归档文件
+
+    参数:
+        store: 本地存储（批量刷新写入的 kline 数据集）
+        path: 归档文件路径
+        symbols: 股票代码列表，默认为存储中的全部股票
+        block_rows: 每个块的最大行数
+
+    返回:
+        统计信息：股票数、行数、文件字节数
+    """
+    symbols = symbols if symbols is not None else store.keys("kline")
+    rows = 0
+    with KlineArchiveWriter(path, block_rows) as writer:
+        for symbol in symbols:
+            rows += writer.write(symbol, store.read("kline", symbol))
+        written = len(writer.index)
+    return {"symbols": written, "rows": rows, "bytes": os.path.getsize(path)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口，返回退出码"""
+    parser = argparse.ArgumentParser(description="把本地存储中的K线打包成归档文件")
+    parser.add_argument("--store", default="data/store", help="本地存储目录")
+    parser.add_argument("--output", default="data/kline.stka", help="归档文件路径")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="每个块的最大行数")
+    args = parser.parse_args(argv)
+
+    stats = build_archive(LocalStore(args.store), args.output, block_rows=args.block_rows)
+    print(f"已归档 {stats['symbols']} 只股票，{stats['rows']} 行，文件大小 {stats['bytes'] / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+K线数据校验与修复模块
+对一次获取到的整批K线按列做向量化检查，找出上游返回的异常数据：
+日期重复、价格非正、最高价低于最低价、开盘/收盘价超出最高最低价范围、成交量为0却有价格，
+以及区间内缺失的交易日。重复日期直接去重，其余问题只对所在的日期区间重新请求，
+重新请求后仍然异常的行从结果中移出，单独隔离保存。
+已经隔离过的日期和重新请求也没有补齐的缺口（通常是短暂停牌）由调用方保存，之后不再重新请求
+"""
+
+import datetime
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .metrics import MetricsRegistry, get_metrics
+    from .trading_calendar import TradingCalendar
+except ImportError:
+    from metrics import MetricsRegistry, get_metrics
+    from trading_calendar import TradingCalendar
+
+logger = logging.getLogger(__name__)
+
+# 每行的问题标志位
+DUPLICATE_DATE = 1
+NON_POSITIVE_PRICE = 2
+HIGH_BELOW_LOW = 4
+OUT_OF_RANGE = 8
+ZERO_VOLUME = 16
+
+ISSUE_NAMES = {
+    DUPLICATE_DATE: "日期重复",
+    NON_POSITIVE_PRICE: "价格非正",
+    HIGH_BELOW_LOW: "最高价低于最低价",
+    OUT_OF_RANGE: "开盘收盘价超出最高最低价",
+    ZERO_VOLUME: "成交量为0",
+}
+
+PRICE_COLUMNS = ("开盘", "收盘", "最高", "最低")
+
+# 价格比较的容差，避免两位小数舍入造成误判
+PRICE_TOLERANCE = 1e-6
+
+# 不超过该交易日数的缺口视为数据缺失并重新请求，更长的缺口通常是停牌
+MAX_GAP_DAYS = 5
+
+# 单次修复最多重新请求的区间数，超过时只请求日期最近的区间，其余留到之后处理
+MAX_REFETCH_RANGES = 5
+
+# 隔离数据中记录问题描述的列
+ISSUE_COLUMN = "问题"
+
+
+class ValidationResult(NamedTuple):
+    """一批K线的校验结果"""
+
+    # 每行的问题标志位，0表示正常
+    flags: np.ndarray
+    # 每行的日期（yyyymmdd 整数）
+    dates: np.ndarray
+    # 缺失的交易日区间 (首个缺失交易日, 最后一个缺失交易日, 缺失天数)
+    gaps: List[Tuple[int, int, int]]
+
+    @property
+    def ok(self) -> bool:
+        """是否没有任何问题"""
+        return not self.flags.any() and not self.gaps
+
+    def counts(self) -> Dict[str, int]:
+        """各类问题的行数，以及缺口数量"""
+        counts = {name: int(np.count_nonzero(self.flags & bit)) for bit, name in ISSUE_NAMES.items()}
+        counts["交易日缺失"] = len(self.gaps)
+        return {name: n for name, n in counts.items() if n}
+
+
+class RepairResult(NamedTuple):
+    """一批K线的修复结果"""
+
+    # 修复后的K线，按日期升序
+    frame: pd.DataFrame
+    # 无法修复、被移出的行，带问题描述列
+    quarantined: pd.DataFrame
+    # 统计信息
+    report: Dict[str, int]
+    # 重新请求后仍然没有任何数据的缺口 (首个缺失交易日, 最后一个缺失交易日)，下次修复时作为 known_gaps 传入
+    unfilled_gaps: List[Tuple[int, int]]
+
+
+def _date_ints(dates: pd.Series) -> np.ndarray:
+    """日期列转换为 yyyymmdd 整数数组"""
+    values = dates.to_numpy()
+    first = values[0] if len(values) else None
+    # 'yyyy-mm-dd' 字符串和日期类型可以直接由numpy转换，比 pd.to_datetime 快一个数量级；
+    # 其他格式（如'yyyymmdd'会被numpy当作年份）交给pandas解析
+    fast = values.dtype.kind == "M" or isinstance(first, datetime.date) or (
+        isinstance(first, str) and len(first) == 10 and first[4] == "-"
+    )
+    try:
+        if not fast:
+            raise ValueError
+        days = values.astype("datetime64[D]")
+    except (ValueError, TypeError):
+        days = pd.to_datetime(dates).to_numpy().astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]").astype(np.int64) + 1970
+    return (
+        years * 10000
+        + (months.astype(np.int64) % 12 + 1) * 100
+        + (days - months).astype(np.int64) + 1
+    )
+
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    if name not in df.columns:
+        return np.full(len(df), np.nan)
+    column = df[name]
+    if not pd.api.types.is_numeric_dtype(column):
+        column = pd.to_numeric(column, errors="coerce")
+    return column.to_numpy(np.float64)
+
+
+def validate_kline(df: pd.DataFrame, calendar: Optional[TradingCalendar] = None) -> ValidationResult:
+    """
+    校验一批日K线，所有检查都按整列的数组一次完成
+
+    参数:
+        df: get_daily_kline 返回的K线
+        calendar: 交易日历，提供时检查首尾日期之间缺失的交易日
+
+    返回:
+        ValidationResult
+    """
+    n = len(df)
+    if n == 0:
+        return ValidationResult(np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64), [])
+
+    dates = _date_ints(df["日期"])
+    open_, close, high, low = (_column(df, c) for c in PRICE_COLUMNS)
+    flags = np.zeros(n, dtype=np.uint8)
+
+    # 重复日期保留最后一条，前面的视为重复；日期严格递增时不可能重复，跳过查找
+    if not (np.diff(dates) > 0).all():
+        flags[pd.Series(dates).duplicated(keep="last").to_numpy()] |= DUPLICATE_DATE
+    # NaN 与任何数比较都为False，因此价格缺失也会被标记
+    positive = (open_ > 0) & (close > 0) & (high > 0) & (low > 0)
+    flags[~positive] |= NON_POSITIVE_PRICE
+    flags[high < low - PRICE_TOLERANCE] |= HIGH_BELOW_LOW
+    out_of_range = (
+        (np.maximum(open_, close) > high + PRICE_TOLERANCE)
+        | (np.minimum(open_, close) < low - PRICE_TOLERANCE)
+    )
+    flags[out_of_range] |= OUT_OF_RANGE
+    if "成交量" in df.columns:
+        flags[(_column(df, "成交量") <= 0) & positive] |= ZERO_VOLUME
+
+    gaps: List[Tuple[int, int, int]] = []
+    if calendar is not None:
+        days = calendar.trading_days(int(dates.min()), int(dates.max()))
+        missing = np.flatnonzero(~np.isin(days, dates))
+        if len(missing):
+            # 按交易日序号连续的缺失日合并为一个缺口
+            breaks = np.flatnonzero(np.diff(missing) != 1) + 1
+            for run in np.split(missing, breaks):
+                gaps.append((int(days[run[0]]), int(days[run[-1]]), len(run)))
+
+    return ValidationResult(flags, dates, gaps)
+
+
+def describe_flags(flags: np.ndarray) -> List[str]:
+    """将问题标志位转换为文字描述"""
+    return ["、".join(name for bit, name in ISSUE_NAMES.items() if f & bit) for f in flags]
+
+
+def _bad_ranges(dates: np.ndarray, bad: np.ndarray) -> List[Tuple[int, int]]:
+    """将相邻的异常行合并为日期区间"""
+    rows = np.flatnonzero(bad)
+    if len(rows) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+    return [(int(dates[run[0]]), int(dates[run[-1]])) for run in np.split(rows, breaks)]
+
+
+def repair_kline(
+    df: pd.DataFrame,
+    refetch: Callable[[str, str], pd.DataFrame],
+    calendar: Optional[TradingCalendar] = None,
+    max_gap_days: int = MAX_GAP_DAYS,
+    max_ranges: int = MAX_REFETCH_RANGES,
+    known_gaps: Optional[List[Tuple[int, int]]] = None,
+    known_bad_dates: Optional[pd.Series] = None,
+    metrics: Optional[MetricsRegistry] = None
+) -> RepairResult:
+    """
+    校验并修复一批日K线
+
+    重复日期保留最后一条；异常行和不超过 max_gap_days 的缺口按日期区间重新请求，
+    用重新请求到的正常数据替换；仍然异常的行移出结果并返回。
+    已知的缺口和已隔离过的日期不再重新请求，避免每次刷新都为同样的问题访问上游
+
+    参数:
+        df: get_daily_kline 返回的K线
+        refetch: 重新请求函数，参数为 'yyyymmdd' 格式的开始、结束日期；请求失败时应抛出异常，
+            返回空DataFrame表示区间内确实没有数据
+        calendar: 交易日历，提供时检查并补齐缺失的交易日
+        max_gap_days: 重新请求的缺口最大交易日数
+        max_ranges: 最多重新请求的区间数，超过时只请求日期最近的区间
+        known_gaps: 之前重新请求也没有补齐的缺口 (首日, 末日)，yyyymmdd 整数，落在其中的缺口不再请求
+        known_bad_dates: 之前已经隔离过的日期，这些日期上的异常行直接隔离，不再请求
+        metrics: 记录校验结果的指标注册表，默认使用全局注册表
+
+    返回:
+        RepairResult
+    """
+    result = validate_kline(df, calendar)
+    report = {"checked": len(df), "duplicates": 0, "invalid": 0, "gaps": len(result.gaps),
+              "known_gaps": 0, "refetched_ranges": 0, "failed_ranges": 0, "deferred_ranges": 0, "repaired": 0,
+              "quarantined": 0}
+    if result.ok:
+        return RepairResult(df, df.iloc[0:0], report, [])
+
+    # 去掉重复日期并按日期排序
+    keep = (result.flags & DUPLICATE_DATE) == 0
+    report["duplicates"] = int(np.count_nonzero(~keep))
+    order = np.argsort(result.dates[keep], kind="stable")
+    frame = df[keep].iloc[order]
+    flags = result.flags[keep][order]
+    dates = result.dates[keep][order]
+    bad = flags != 0
+    report["invalid"] = int(np.count_nonzero(bad))
+
+    refetch_bad = bad
+    if known_bad_dates is not None and len(known_bad_dates):
+        refetch_bad = bad & ~np.isin(dates, _date_ints(pd.Series(known_bad_dates)))
+    gaps = [(start, end) for start, end, length in result.gaps if length <= max_gap_days]
+    if known_gaps:
+        known = [g for g in gaps if any(ks <= g[0] and g[1] <= ke for ks, ke in known_gaps)]
+        report["known_gaps"] = len(known)
+        gaps = [g for g in gaps if g not in known]
+
+    # 区间数超过上限时不合并（合并后的区间可能覆盖整个历史），只请求最近的区间
+    ranges = sorted(_bad_ranges(dates, refetch_bad) + gaps)
+    report["deferred_ranges"] = max(len(ranges) - max_ranges, 0)
+    ranges = ranges[report["deferred_ranges"]:]
+
+    replacements = []
+    # 重新请求成功（包括确实没有数据）的区间，请求失败的区间下次仍会重新请求
+    answered = set()
+    for start, end in ranges:
+        report["refetched_ranges"] += 1
+        try:
+            fetched = refetch(f"{start:08d}", f"{end:08d}")
+        except Exception as e:
+            logger.warning("重新请求 %d~%d 的K线失败: %s", start, end, e)
+            report["failed_ranges"] += 1
+            continue
+        answered.add((start, end))
+        if fetched is None or fetched.empty:
+            continue
+        fetched_result = validate_kline(fetched)
+        within = (fetched_result.dates >= start) & (fetched_result.dates <= end)
+        replacements.append(fetched[(fetched_result.flags == 0) & within])
+
+    good = frame[~bad]
+    good_dates = dates[~bad]
+    if replacements:
+        replacement = pd.concat(replacements, ignore_index=True)
+        replacement_dates = _date_ints(replacement["日期"])
+        unique = ~pd.Series(replacement_dates).duplicated(keep="last").to_numpy()
+        replacement, replacement_dates = replacement[unique], replacement_dates[unique]
+        kept = ~np.isin(good_dates, replacement_dates)
+        good = pd.concat([good[kept], replacement], ignore_index=True)
+        good_dates = np.concatenate([good_dates[kept], replacement_dates])
+        order = np.argsort(good_dates, kind="stable")
+        good = good.iloc[order]
+        good_dates = good_dates[order]
+
+    # 重新请求成功、但仍然没有任何一天数据的缺口
+    unfilled_gaps = [
+        (start, end) for start, end in gaps
+        if (start, end) in answered and not ((good_dates >= start) & (good_dates <= end)).any()
+    ]
+
+    repaired = bad & np.isin(dates, good_dates)
+    report["repaired"] = int(np.count_nonzero(repaired))
+    quarantine_mask = bad & ~repaired
+    quarantined = frame[quarantine_mask].copy()
+    quarantined[ISSUE_COLUMN] = describe_flags(flags[quarantine_mask])
+    report["quarantined"] = len(quarantined)
+
+    metrics = metrics or get_metrics()
+    for outcome in ("duplicates", "repaired", "quarantined"):
+        if report[outcome]:
+            metrics.record_validation("kline", outcome, report[outcome])
+    return RepairResult(good.reset_index(drop=True), quarantined.reset_index(drop=True), report, unfilled_gaps)
@@ -0,0 +1,101 @@
+"""
+本地数据存储模块
+按数据集和键（股票代码、板块名称等）在本地目录中保存DataFrame，
+供批量刷新任务写入、其他模块离线读取
+"""
+
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+# 存储文件的扩展名
+FILE_SUFFIX = ".pkl"
+
+
+def _safe_key(key: str) -> str:
+    """将键转换为可以安全用作文件名的字符串"""
+    return key.replace(os.sep, "_").replace("/", "_")
+
+
+class LocalStore:
+    """本地DataFrame存储，目录结构为 <root>/<数据集>/<键>.pkl"""
+
+    def __init__(self, root: str):
+        """
+        参数:
+            root: 存储根目录，不存在时自动创建
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, dataset: str, key: str) -> str:
+        """
+        获取数据文件路径
+
+        参数:
+            dataset: 数据集名称，如'kline'，可以用'/'分隔多级目录
+            key: 键，如股票代码'600000'
+
+        返回:
+            文件路径
+        """
+        return os.path.join(self.root, *dataset.split("/"), _safe_key(key) + FILE_SUFFIX)
+
+    def write(self, dataset: str, key: str, df: pd.DataFrame) -> str:
+        """
+        写入数据，先写临时文件再替换，中途中断不会留下损坏的文件
+
+        参数:
+            dataset: 数据集名称
+            key: 键
+            df: 要保存的DataFrame
+
+        返回:
+            文件路径
+        """
+        path = self.path(dataset, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def read(self, dataset: str, key: str) -> Optional[pd.DataFrame]:
+        """
+        读取数据
+
+        参数:
+            dataset: 数据集名称
+            key: 键
+
+        返回:
+            DataFrame，不存在时返回None
+        """
+        path = self.path(dataset, key)
+        if not os.path.exists(path):
+            return None
+        return pd.read_pickle(path)
+
+    def exists(self, dataset: str, key: str) -> bool:
+        """判断数据是否存在"""
+        return os.path.exists(self.path(dataset, key))
+
+    def keys(self, dataset: str) -> List[str]:
+        """
+        列出数据集中的所有键
+
+        参数:
+            dataset: 数据集名称
+
+        返回:
+            排序后的键列表
+        """
+        directory = os.path.join(self.root, *dataset.split("/"))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            name[:-len(FILE_SUFFIX)]
+            for name in os.listdir(directory)
+            if name.endswith(FILE_SUFFIX)
+        )
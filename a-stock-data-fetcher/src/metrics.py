@@ -0,0 +1,360 @@
+"""
+运行指标模块
+记录每个上游接口的调用延迟分布、返回行数和字节数、重试次数、错误次数以及缓存命中率，
+支持导出为Prometheus文本格式，或通过回调函数实时获取每次调用的记录
+"""
+
+import bisect
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的默认分桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 导出指标名的统一前缀
+METRIC_PREFIX = "stma"
+
+
+def format_value(value: float) -> str:
+    """指标取值转换为文本，整数按整数输出，其他值保留全部有效数字（:g 只保留6位）"""
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class CallRecord(NamedTuple):
+    """一次上游调用的记录，传给回调函数"""
+
+    endpoint: str
+    seconds: float
+    rows: int
+    nbytes: int
+    retries: int
+    error: Optional[str]
+
+
+class Histogram:
+    """固定分桶的直方图"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        参数:
+            buckets: 升序排列的分桶上界
+        """
+        self.buckets = tuple(buckets)
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """记录一个观测值"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        按分桶估算分位数，返回所在桶的上界
+
+        参数:
+            q: 分位数，取值0~1
+
+        返回:
+            估算值，没有观测值时返回None；落在 +Inf 桶时返回最大的有限上界
+        """
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts[:-1]):
+            cumulative += c
+            if cumulative >= target:
+                return self.buckets[i]
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, enabled: bool = True):
+        """
+        参数:
+            buckets: 延迟直方图的分桶上界（秒）
+            enabled: 是否记录指标，关闭后所有记录方法直接返回
+        """
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._latency: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._listeners: List[Callable[[CallRecord], None]] = []
+
+    def _inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def record_call(
+        self,
+        endpoint: str,
+        seconds: float,
+        rows: int = 0,
+        nbytes: int = 0,
+        retries: int = 0,
+        error: Optional[BaseException] = None
+    ) -> None:
+        """
+        记录一次上游调用
+
+        参数:
+            endpoint: 上游接口名，如'stock_zh_a_hist'
+            seconds: 调用耗时（秒），包含重试
+            rows: 返回的行数
+            nbytes: 返回数据占用的字节数
+            retries: 本次调用的重试次数
+            error: 调用最终失败时的异常
+        """
+        if not self.enabled:
+            return
+        status = "error" if error is not None else "ok"
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self._inc("upstream_calls_total", endpoint=endpoint, status=status)
+            self._inc("upstream_rows_total", rows, endpoint=endpoint)
+            self._inc("upstream_bytes_total", nbytes, endpoint=endpoint)
+            listeners = list(self._listeners)
+
+        if listeners:
+            record = CallRecord(
+                endpoint, seconds, rows, nbytes, retries,
+                None if error is None else f"{type(error).__name__}: {error}"
+            )
+            for listener in listeners:
+                try:
+                    listener(record)
+                except Exception:
+                    logger.exception("指标回调函数执行出错")
+
+    def record_retry(self, endpoint: str) -> None:
+        """记录一次重试"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("upstream_retries_total", endpoint=endpoint)
+
+    def record_skip(self, endpoint: str, reason: str) -> None:
+        """
+        记录一次因不可能有新数据而跳过的上游调用
+
+        参数:
+            endpoint: 被跳过的上游接口名
+            reason: 跳过原因
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("upstream_skipped_total", endpoint=endpoint, reason=reason)
+
+    def record_validation(self, dataset: str, outcome: str, rows: int) -> None:
+        """
+        记录数据校验的处理结果
+
+        参数:
+            dataset: 数据集名称，如'kline'
+            outcome: 处理结果，'duplicates' 去重、'repaired' 重新请求后修复、'quarantined' 隔离
+            rows: 行数
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("validation_rows_total", rows, dataset=dataset, outcome=outcome)
+
+    def record_coalesced(self, endpoint: str) -> None:
+        """记录一次与进行中的相同请求合并、没有单独发出的上游调用"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("upstream_coalesced_total", endpoint=endpoint)
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        """
+        记录一次缓存查询
+
+        参数:
+            cache: 缓存名称
+            hit: 是否命中
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def record_http_request(self, host: str) -> None:
+        """记录一次经过共享连接池发出的HTTP请求"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("http_requests_total", host=host)
+
+    def record_http_connection(self, host: str) -> None:
+        """记录连接池新建的一个TCP连接"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("http_connections_opened_total", host=host)
+
+    def connection_reuse_rate(self) -> Optional[float]:
+        """
+        计算连接复用率，即没有新建连接的请求占比
+
+        返回:
+            复用率，没有请求记录时返回None
+        """
+        with self._lock:
+            requests = sum(v for (n, _), v in self._counters.items() if n == "http_requests_total")
+            opened = sum(
+                v for (n, _), v in self._counters.items() if n == "http_connections_opened_total"
+            )
+        return max(0.0, 1 - opened / requests) if requests else None
+
+    def add_listener(self, listener: Callable[[CallRecord], None]) -> None:
+        """
+        注册回调函数，每次上游调用结束后以 CallRecord 调用
+
+        参数:
+            listener: 回调函数
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[CallRecord], None]) -> None:
+        """移除回调函数"""
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def reset(self) -> None:
+        """清空所有已记录的指标"""
+        with self._lock:
+            self._latency.clear()
+            self._counters.clear()
+
+    def counter(self, name: str, **labels: str) -> float:
+        """
+        读取计数器的值
+
+        参数:
+            name: 计数器名，如'upstream_calls_total'
+            **labels: 标签，如 endpoint='stock_zh_a_hist'
+
+        返回:
+            计数值，不存在时为0
+        """
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def cache_hit_rate(self, cache: str) -> Optional[float]:
+        """
+        计算缓存命中率
+
+        参数:
+            cache: 缓存名称
+
+        返回:
+            命中率，没有查询记录时返回None
+        """
+        hits = self.counter("cache_requests_total", cache=cache, result="hit")
+        misses = self.counter("cache_requests_total", cache=cache, result="miss")
+        total = hits + misses
+        return hits / total if total else None
+
+    def snapshot(self) -> Dict:
+        """
+        获取当前所有指标的快照
+
+        返回:
+            字典，包含每个接口的延迟统计和所有计数器
+        """
+        with self._lock:
+            latency = {
+                endpoint: {
+                    "count": h.count,
+                    "sum": h.sum,
+                    "p50": h.quantile(0.5),
+                    "p99": h.quantile(0.99),
+                }
+                for endpoint, h in self._latency.items()
+            }
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+        return {"latency_seconds": latency, "counters": counters}
+
+    def to_prometheus(self) -> str:
+        """
+        导出为Prometheus文本格式
+
+        返回:
+            Prometheus exposition 格式的文本
+        """
+        lines = []
+        with self._lock:
+            name = f"{METRIC_PREFIX}_upstream_latency_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for endpoint, h in sorted(self._latency.items()):
+                cumulative = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {h.sum}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {h.count}')
+
+            typed = set()
+            for (counter_name, labels), value in sorted(self._counters.items()):
+                full_name = f"{METRIC_PREFIX}_{counter_name}"
+                if full_name not in typed:
+                    lines.append(f"# TYPE {full_name} counter")
+                    typed.add(full_name)
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{full_name}{{{label_text}}} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        将指标写入Prometheus文本文件（可供 node_exporter 的 textfile collector 读取）
+
+        参数:
+            path: 文件路径，先写临时文件再替换，避免读到写了一半的内容
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+_default_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """获取全局默认的指标注册表"""
+    return _default_registry
+
+
+def set_metrics(registry: MetricsRegistry) -> None:
+    """
+    替换全局默认的指标注册表
+
+    参数:
+        registry: 新的指标注册表
+    """
+    global _default_registry
+    _default_registry = registry
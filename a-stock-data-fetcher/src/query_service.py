@@ -0,0 +1,469 @@
+"""
+本地查询服务模块
+基于 asyncio 的轻量HTTP服务，从本地存储（批量刷新写入）提供股票搜索、个股信息、
+K线区间和板块成份股查询，供多个服务共用，避免各自直接访问上游；
+本地缺少数据时才访问上游，同一时刻相同的上游请求只发出一次，其余请求等待同一结果
+
+用法（在 a-stock-data-fetcher 目录下）:
+    python -m src.query_service --store data/store --port 8765
+
+接口（均为GET，返回JSON: {"rows": 行数, "data": [记录...]}）:
+    /search?q=银行&limit=20                    按名称或代码搜索股票
+    /profile/<代码>                            个股信息
+    /kline/<代码>?start=20230101&end=20231231   日K线区间
+    /boards/<板块类型>                         板块列表，类型为 industry、concept、region
+    /boards/<板块类型>/<板块名称>               板块成份股
+    /health                                    健康检查
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .data_source import DataSource, create_data_source
+    from .local_store import LocalStore
+    from .metrics import MetricsRegistry, get_metrics
+    from .stock_history import StockHistoryFetcher
+    from .stock_info import BOARD_TYPES, StockInfoFetcher
+    from .trading_calendar import to_date_int
+except ImportError:
+    from data_source import DataSource, create_data_source
+    from local_store import LocalStore
+    from metrics import MetricsRegistry, get_metrics
+    from stock_history import StockHistoryFetcher
+    from stock_info import BOARD_TYPES, StockInfoFetcher
+    from trading_calendar import to_date_int
+
+logger = logging.getLogger(__name__)
+
+# 内存中缓存的DataFrame数量上限
+DEFAULT_CACHE_SIZE = 2048
+
+# 搜索结果默认返回的行数
+DEFAULT_SEARCH_LIMIT = 20
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            500: "Internal Server Error"}
+
+
+class QueryError(Exception):
+    """查询失败，携带返回给客户端的HTTP状态码"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _kline_dates(df: pd.DataFrame) -> np.ndarray:
+    """K线的日期列转换为 yyyymmdd 整数数组，用于按区间二分查找"""
+    if df.empty or "日期" not in df.columns:
+        return np.empty(0, dtype=np.int64)
+    return pd.to_datetime(df["日期"]).dt.strftime("%Y%m%d").astype(np.int64).to_numpy()
+
+
+def _search_spot(spot: pd.DataFrame, keyword: str, limit: int) -> pd.DataFrame:
+    """在行情表中按名称包含关键字或代码以关键字开头查找"""
+    matched = spot["名称"].astype(str).str.contains(keyword, regex=False, na=False)
+    if "代码" in spot.columns:
+        matched |= spot["代码"].astype(str).str.startswith(keyword)
+    return spot[matched].head(limit)
+
+
+def _encode_records(df: pd.DataFrame) -> bytes:
+    """DataFrame序列化为响应体 {"rows": 行数, "data": [记录...]}"""
+    records = df.to_json(orient="records", force_ascii=False, date_format="iso")
+    return f'{{"rows": {len(df)}, "data": {records}}}'.encode("utf-8")
+
+
+class QueryService:
+    """本地数据查询服务"""
+
+    def __init__(
+        self,
+        store: LocalStore,
+        data_source: Optional[DataSource] = None,
+        upstream: bool = True,
+        upstream_workers: int = 8,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        """
+        参数:
+            store: 本地存储
+            data_source: 本地缺少数据时使用的数据源后端，默认使用全局默认数据源
+            upstream: 本地缺少数据时是否访问上游，False时直接返回404
+            upstream_workers: 执行上游请求的线程数
+            cache_size: 内存中缓存的DataFrame数量上限，按文件修改时间判断是否失效
+            metrics: 指标注册表，默认使用全局注册表
+        """
+        self.store = store
+        self.upstream = upstream
+        self.info = StockInfoFetcher(data_source)
+        self.history = StockHistoryFetcher(data_source)
+        self.cache_size = cache_size
+        self.metrics = metrics or get_metrics()
+        # (数据集, 键) -> (文件修改时间, DataFrame, 预处理结果)
+        self._frames: "OrderedDict[Tuple[str, str], Tuple[int, pd.DataFrame, Any]]" = OrderedDict()
+        # 进行中的上游请求，相同的键只发出一次
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-io")
+        self._upstream_executor = ThreadPoolExecutor(
+            max_workers=upstream_workers, thread_name_prefix="query-upstream"
+        )
+
+    async def _read(
+        self,
+        dataset: str,
+        key: str,
+        prepare: Optional[Callable[[pd.DataFrame], Any]] = None
+    ) -> Optional[Tuple[pd.DataFrame, Any]]:
+        """
+        读取本地数据，命中内存缓存且文件未更新时不读磁盘
+
+        参数:
+            dataset: 数据集名称
+            key: 键
+            prepare: 读取后对DataFrame做的预处理，结果与DataFrame一起缓存
+
+        返回:
+            (DataFrame, 预处理结果)，本地不存在时返回None
+        """
+        path = self.store.path(dataset, key)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cache_key = (dataset, key)
+        cached = self._frames.get(cache_key)
+        if cached is not None and cached[0] == mtime:
+            self._frames.move_to_end(cache_key)
+            return cached[1], cached[2]
+
+        def load() -> Tuple[pd.DataFrame, Any]:
+            df = pd.read_pickle(path)
+            return df, prepare(df) if prepare is not None else None
+
+        df, extra = await self._run_io(load)
+        self._frames[cache_key] = (mtime, df, extra)
+        self._frames.move_to_end(cache_key)
+        while len(self._frames) > self.cache_size:
+            self._frames.popitem(last=False)
+        return df, extra
+
+    async def _run_io(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        在IO线程池中执行读盘、解析、序列化等耗时与数据量成正比的操作，
+        避免大响应阻塞事件循环、拉高其他请求的尾延迟
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_executor, func, *args)
+
+    async def _coalesce(self, key: Hashable, func: Callable[..., pd.DataFrame], *args: Any) -> pd.DataFrame:
+        """
+        在线程池中执行上游请求；相同键的请求正在进行时，等待它的结果而不重复发出
+
+        参数:
+            key: 请求键，第一个元素为接口名
+            func: 阻塞的上游请求函数
+            *args: 传给 func 的参数
+
+        返回:
+            上游返回的DataFrame
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._upstream_executor, func, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.metrics.record_coalesced(key[0])
+            logger.debug("合并进行中的上游请求: %s", key)
+        # 某个等待方被取消时不影响其他等待方
+        return await asyncio.shield(future)
+
+    async def _load(
+        self,
+        dataset: str,
+        key: str,
+        fetch: Callable[[], pd.DataFrame],
+        prepare: Optional[Callable[[pd.DataFrame], Any]] = None
+    ) -> Tuple[pd.DataFrame, Any]:
+        """
+        优先读取本地数据，缺失时访问上游并写入本地存储
+
+        参数:
+            dataset: 数据集名称
+            key: 键
+            fetch: 阻塞的上游请求函数，失败时返回空DataFrame
+            prepare: 见 _read
+
+        返回:
+            (DataFrame, 预处理结果)
+        """
+        local = await self._read(dataset, key, prepare)
+        self.metrics.record_cache(f"query_{dataset.split('/')[0]}", local is not None)
+        if local is not None:
+            return local
+        if not self.upstream:
+            raise QueryError(404, f"本地没有数据: {dataset}/{key}")
+
+        def fetch_and_store() -> pd.DataFrame:
+            df = fetch()
+            if not df.empty:
+                self.store.write(dataset, key, df)
+            return df
+
+        df = await self._coalesce((dataset, key), fetch_and_store)
+        if df.empty:
+            raise QueryError(404, f"没有数据: {dataset}/{key}")
+        return df, await self._run_io(prepare, df) if prepare is not None else None
+
+    async def search(self, keyword: str, limit: int = DEFAULT_SEARCH_LIMIT) -> pd.DataFrame:
+        """
+        按名称或代码前缀搜索股票
+
+        参数:
+            keyword: 关键字，如'银行'或'6000'
+            limit: 最多返回的行数
+
+        返回:
+            匹配的行情表记录
+        """
+        if not keyword:
+            raise QueryError(400, "缺少搜索关键字 q")
+        spot, _ = await self._load("spot", "latest", self.info.get_all_stock_list)
+        return await self._run_io(_search_spot, spot, keyword, limit)
+
+    async def profile(self, symbol: str) -> pd.DataFrame:
+        """获取个股信息"""
+        df, _ = await self._load("profile", symbol, lambda: self.info.get_stock_individual_info(symbol))
+        return df
+
+    async def kline(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """
+        获取日K线区间
+
+        参数:
+            symbol: 股票代码
+            start: 开始日期（含），默认不限
+            end: 结束日期（含），默认不限
+
+        返回:
+            区间内的K线
+        """
+        try:
+            start_int = to_date_int(start) if start else None
+            end_int = to_date_int(end) if end else None
+        except ValueError:
+            raise QueryError(400, f"无法解析日期: {start}, {end}")
+
+        local = await self._read("kline", symbol, _kline_dates)
+        self.metrics.record_cache("query_kline", local is not None)
+        if local is not None:
+            df, dates = local
+        elif self.upstream:
+            # 上游返回的只是请求的区间，不写入本地存储，以免破坏批量刷新的增量更新；
+            # 日期统一为上游要求的 'yyyymmdd' 格式，不同写法的相同区间也能合并
+            upstream_start = f"{start_int:08d}" if start_int is not None else None
+            upstream_end = f"{end_int:08d}" if end_int is not None else None
+            df = await self._coalesce(
+                ("kline", symbol, upstream_start, upstream_end),
+                lambda: self.history.get_daily_kline(symbol, upstream_start, upstream_end)
+            )
+            dates = await self._run_io(_kline_dates, df)
+        else:
+            raise QueryError(404, f"本地没有数据: kline/{symbol}")
+        if df.empty:
+            raise QueryError(404, f"没有股票 {symbol} 的K线")
+
+        lo = np.searchsorted(dates, start_int, side="left") if start_int is not None else 0
+        hi = np.searchsorted(dates, end_int, side="right") if end_int is not None else len(dates)
+        return df.iloc[lo:hi]
+
+    async def boards(self, board_type: str) -> pd.DataFrame:
+        """获取板块列表"""
+        if board_type not in BOARD_TYPES:
+            raise QueryError(404, f"不支持的板块类型: {board_type}")
+        method = getattr(self.info, BOARD_TYPES[board_type][0])
+        df, _ = await self._load(f"boards/{board_type}", "_index", method)
+        return df
+
+    async def board_members(self, board_type: str, name: str) -> pd.DataFrame:
+        """获取板块成份股"""
+        if board_type not in BOARD_TYPES:
+            raise QueryError(404, f"不支持的板块类型: {board_type}")
+        method = getattr(self.info, BOARD_TYPES[board_type][1])
+        df, _ = await self._load(f"boards/{board_type}", name, lambda: method(name))
+        return df
+
+    async def dispatch(self, method: str, target: str) -> Tuple[int, bytes]:
+        """
+        处理一个HTTP请求
+
+        参数:
+            method: 请求方法
+            target: 请求路径和查询字符串
+
+        返回:
+            (状态码, JSON响应体)
+        """
+        if method != "GET":
+            return 405, json.dumps({"error": "只支持GET请求"}, ensure_ascii=False).encode("utf-8")
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            if parts == ["health"]:
+                return 200, b'{"status": "ok"}'
+            if parts == ["search"]:
+                limit = int(query.get("limit", DEFAULT_SEARCH_LIMIT))
+                df = await self.search(query.get("q", ""), limit)
+            elif len(parts) == 2 and parts[0] == "profile":
+                df = await self.profile(parts[1])
+            elif len(parts) == 2 and parts[0] == "kline":
+                df = await self.kline(parts[1], query.get("start"), query.get("end"))
+            elif len(parts) == 2 and parts[0] == "boards":
+                df = await self.boards(parts[1])
+            elif len(parts) == 3 and parts[0] == "boards":
+                df = await self.board_members(parts[1], parts[2])
+            else:
+                raise QueryError(404, f"未知接口: {url.path}")
+        except QueryError as e:
+            return e.status, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8")
+        except ValueError as e:
+            return 400, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8")
+        except Exception as e:
+            logger.exception("处理请求 %s 时出错", target)
+            return 500, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8")
+
+        return 200, await self._run_io(_encode_records, df)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个客户端连接，支持 HTTP/1.1 保持连接"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0) or 0):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                try:
+                    # 请求路径应为百分号编码，兼容直接发送UTF-8的客户端
+                    method, target, version = request_line.decode("utf-8", "replace").split()
+                except ValueError:
+                    status, body, version = 400, b'{"error": "bad request"}', "HTTP/1.0"
+                else:
+                    status, body = await self.dispatch(method, target)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                head = (
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                )
+                writer.write(head.encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        """
+        启动HTTP服务
+
+        参数:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+
+        返回:
+            asyncio 服务对象
+        """
+        server = await asyncio.start_server(self._handle_connection, host, port, backlog=1024)
+        for sock in server.sockets:
+            logger.info("查询服务已启动: http://%s:%d", *sock.getsockname()[:2])
+        return server
+
+    def close(self) -> None:
+        """关闭线程池"""
+        self._io_executor.shutdown(wait=False)
+        self._upstream_executor.shutdown(wait=False)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="本地数据查询服务")
+    parser.add_argument("--store", default="data/store", help="本地存储目录")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--source", choices=["akshare", "replay"], default="akshare",
+                        help="本地缺少数据时使用的数据源")
+    parser.add_argument("--replay-dir", help="source 为 replay 时的录制数据目录")
+    parser.add_argument("--no-upstream", action="store_true", help="只提供本地数据，不访问上游")
+    parser.add_argument("--upstream-workers", type=int, default=8, help="执行上游请求的线程数")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出INFO级别日志")
+    return parser
+
+
+async def _serve(service: QueryService, host: str, port: int) -> None:
+    server = await service.start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[list] = None) -> int:
+    """命令行入口，返回退出码"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    if args.source == "replay":
+        if not args.replay_dir:
+            parser.error("source 为 replay 时需要指定 --replay-dir")
+        data_source = create_data_source("replay", root=args.replay_dir)
+    else:
+        data_source = create_data_source("akshare", http_pool=True, pool_maxsize=args.upstream_workers)
+
+    service = QueryService(
+        LocalStore(args.store), data_source,
+        upstream=not args.no_upstream, upstream_workers=args.upstream_workers
+    )
+    try:
+        asyncio.run(_serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
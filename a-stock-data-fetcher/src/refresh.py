@@ -0,0 +1,565 @@
+"""
+全市场批量刷新命令行工具
+按股票范围和数据集并发获取数据并写入本地存储，支持断点续跑，结束后输出吞吐量汇总
+
+用法（在 a-stock-data-fetcher 目录下）:
+    python -m src.refresh --universe all --datasets kline,profiles --workers 8 --store data/store
+    python -m src.refresh --universe board --board-type industry --board 银行 --datasets kline,statements
+    python -m src.refresh --universe file --symbols-file symbols.txt --datasets kline
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+try:
+    from .data_source import DataSource, create_data_source
+    from .kline_validation import repair_kline
+    from .local_store import LocalStore
+    from .metrics import format_value, get_metrics
+    from .stock_financial import StockFinancialFetcher
+    from .stock_history import StockHistoryFetcher
+    from .stock_info import BOARD_TYPES, StockInfoFetcher
+    from .trading_calendar import SymbolStatusIndex, TradingCalendar
+except ImportError:
+    from data_source import DataSource, create_data_source
+    from kline_validation import repair_kline
+    from local_store import LocalStore
+    from metrics import format_value, get_metrics
+    from stock_financial import StockFinancialFetcher
+    from stock_history import StockHistoryFetcher
+    from stock_info import BOARD_TYPES, StockInfoFetcher
+    from trading_calendar import SymbolStatusIndex, TradingCalendar
+
+logger = logging.getLogger(__name__)
+
+# 支持的数据集
+DATASETS = ("kline", "statements", "profiles", "boards")
+
+# statements 数据集包含的报表：存储数据集名 -> 获取方法名
+STATEMENTS = {
+    "financial_indicators": "get_financial_indicators",
+    "balance_sheet": "get_balance_sheet",
+    "income_statement": "get_income_statement",
+    "cash_flow": "get_cash_flow",
+}
+
+# 断点文件所在的子目录
+CHECKPOINT_DIR = "_checkpoints"
+
+# 交易日历、股票状态索引等元数据所在的子目录
+META_DIR = "_meta"
+
+# 重新请求也没有补齐的K线缺口（通常是短暂停牌），每只股票一个文件，之后的校验不再重新请求这些缺口
+KLINE_GAPS_DATASET = f"{META_DIR}/kline_gaps"
+
+# 这些复权方式下历史价格不会随新的除权除息变化，可以只获取新增的K线
+INCREMENTAL_ADJUSTS = ("hfq", "")
+
+# 一个任务：(任务ID, 执行函数)，执行函数返回写入的行数，失败时抛出异常
+Task = Tuple[str, Callable[[], int]]
+
+
+class Checkpoint:
+    """
+    断点记录
+    每完成一个任务就追加一行到断点文件，中断后重新运行同一任务时跳过已完成的部分；
+    以'#'开头的行记录 key=value 形式的运行参数（如默认的结束日期），续跑时沿用
+    """
+
+    def __init__(self, path: str):
+        """
+        参数:
+            path: 断点文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: Set[str] = set()
+        self.meta: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith("#"):
+                        key, _, value = line[1:].partition("=")
+                        self.meta[key] = value
+                    elif line:
+                        self.done.add(line)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, task_id: str) -> bool:
+        """任务是否已经完成"""
+        return task_id in self.done
+
+    def mark_done(self, task_id: str) -> None:
+        """记录任务完成，立即写入磁盘"""
+        with self._lock:
+            self.done.add(task_id)
+            self._file.write(task_id + "\n")
+            self._file.flush()
+
+    def set_meta(self, key: str, value: str) -> None:
+        """记录一个运行参数，立即写入磁盘"""
+        with self._lock:
+            self.meta[key] = value
+            self._file.write(f"#{key}={value}\n")
+            self._file.flush()
+
+    def clear(self) -> None:
+        """清空断点和运行参数，重新开始"""
+        with self._lock:
+            self.done.clear()
+            self.meta.clear()
+            self._file.seek(0)
+            self._file.truncate()
+
+    def close(self) -> None:
+        """关闭断点文件"""
+        self._file.close()
+
+    def remove(self) -> None:
+        """关闭并删除断点文件，用于全部任务完成之后"""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class RefreshJob:
+    """批量刷新任务"""
+
+    def __init__(
+        self,
+        store: LocalStore,
+        data_source: DataSource,
+        datasets: List[str],
+        start_date: str = "20200101",
+        end_date: Optional[str] = None,
+        adjust: str = "qfq",
+        calendar: Optional[TradingCalendar] = None,
+        status_index: Optional[SymbolStatusIndex] = None,
+        validate: bool = True
+    ):
+        """
+        参数:
+            store: 本地存储
+            data_source: 数据源后端
+            datasets: 要刷新的数据集，取值见 DATASETS
+            start_date: K线开始日期
+            end_date: K线结束日期，默认今天
+            adjust: K线复权类型
+            calendar: 交易日历，用于跳过没有新交易日的K线请求
+            status_index: 股票状态索引，用于跳过停牌、退市、未上市股票的K线请求
+            validate: 是否校验获取到的K线，修复或隔离异常数据后再写入
+        """
+        unknown = set(datasets) - set(DATASETS)
+        if unknown:
+            raise ValueError(f"不支持的数据集: {', '.join(sorted(unknown))}")
+        self.store = store
+        self.datasets = datasets
+        self.start_date = start_date
+        self.end_date = end_date or _today()
+        self.adjust = adjust
+        self.status_index = status_index
+        self.validate = validate
+        self.history = StockHistoryFetcher(data_source, calendar, status_index)
+        self.financial = StockFinancialFetcher(data_source)
+        self.info = StockInfoFetcher(data_source)
+
+    def resolve_universe(
+        self,
+        universe: str,
+        board_type: Optional[str] = None,
+        board: Optional[str] = None,
+        symbols_file: Optional[str] = None
+    ) -> List[str]:
+        """
+        确定要刷新的股票范围
+
+        参数:
+            universe: 'all' 全市场，'board' 指定板块，'file' 从文件读取
+            board_type: universe为'board'时的板块类型，'industry'、'concept' 或 'region'
+            board: universe为'board'时的板块名称
+            symbols_file: universe为'file'时的文件路径，每行一个股票代码，'#'开头为注释
+
+        返回:
+            股票代码列表
+        """
+        if universe == "all":
+            df = self.info.get_all_stock_list()
+            if not df.empty:
+                self.store.write("spot", "latest", df)
+                if self.status_index is not None:
+                    self.status_index.update_from_spot(df)
+        elif universe == "board":
+            if board_type not in BOARD_TYPES or not board:
+                raise ValueError("universe 为 board 时需要指定 board_type 和 board")
+            df = getattr(self.info, BOARD_TYPES[board_type][1])(board)
+        elif universe == "file":
+            if not symbols_file:
+                raise ValueError("universe 为 file 时需要指定 symbols_file")
+            with open(symbols_file, encoding="utf-8") as f:
+                lines = [line.split("#", 1)[0].strip() for line in f]
+            return [line.split()[0] for line in lines if line]
+        else:
+            raise ValueError(f"不支持的股票范围: {universe}")
+
+        if df.empty or "代码" not in df.columns:
+            raise RuntimeError("无法获取股票范围")
+        return df["代码"].astype(str).tolist()
+
+    def _kline_task(self, symbol: str) -> int:
+        existing = self.store.read("kline", symbol)
+        start_date = self.start_date
+        if existing is not None and not existing.empty:
+            # 本地已有数据时，只有出现新的交易日才可能有新K线
+            last_date = pd.Timestamp(existing["日期"].iloc[-1])
+            new_start = (last_date + pd.Timedelta(days=1)).strftime("%Y%m%d")
+            if not self.history.can_have_data(symbol, new_start, self.end_date):
+                return 0
+            if self.adjust in INCREMENTAL_ADJUSTS:
+                start_date = new_start
+        elif not self.history.can_have_data(symbol, start_date, self.end_date):
+            return 0
+
+        # 获取失败时抛出异常，任务记为失败、续跑时重试；只有上游确实没有返回K线时才视为完成
+        df = self.history.get_daily_kline(symbol, start_date, self.end_date, self.adjust, raise_errors=True)
+        if df.empty:
+            if start_date != self.start_date:
+                # 增量获取没有新K线是正常情况（节假日、日历不可用、索引未记录的停牌），视为完成
+                logger.info("股票 %s 在 %s 之后没有新的K线", symbol, start_date)
+                return 0
+            raise RuntimeError("K线数据为空")
+        if self.validate:
+            df = self._validate_kline(symbol, df)
+        if start_date != self.start_date:
+            df = pd.concat([existing, df], ignore_index=True)
+            df = df.drop_duplicates("日期", keep="last").reset_index(drop=True)
+        self.store.write("kline", symbol, df)
+        return len(df) if existing is None else max(len(df) - len(existing), 0)
+
+    def _validate_kline(self, symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        校验新获取的K线，只对异常所在区间重新请求，无法修复的行写入 kline_quarantine 数据集，
+        没有补齐的缺口写入 KLINE_GAPS_DATASET；已隔离的日期和已记录的缺口之后不再重新请求
+        """
+        calendar = self.history.calendar
+        known_bad = self.store.read("kline_quarantine", symbol)
+        known_gaps = self.store.read(KLINE_GAPS_DATASET, symbol)
+        result = repair_kline(
+            df,
+            lambda start, end: self.history.get_daily_kline(symbol, start, end, self.adjust, raise_errors=True),
+            calendar if calendar is not None and calendar.available else None,
+            known_gaps=None if known_gaps is None else list(zip(known_gaps["开始"], known_gaps["结束"])),
+            known_bad_dates=None if known_bad is None else known_bad["日期"],
+            metrics=self.history.data_source.metrics
+        )
+        if len(result.quarantined):
+            quarantined = result.quarantined if known_bad is None else pd.concat(
+                [known_bad, result.quarantined], ignore_index=True
+            ).drop_duplicates("日期", keep="last")
+            self.store.write("kline_quarantine", symbol, quarantined)
+            logger.warning("股票 %s 有 %d 行K线无法修复，已隔离", symbol, len(result.quarantined))
+        if result.unfilled_gaps:
+            gaps = pd.DataFrame(result.unfilled_gaps, columns=["开始", "结束"])
+            if known_gaps is not None:
+                gaps = pd.concat([known_gaps, gaps], ignore_index=True).drop_duplicates()
+            self.store.write(KLINE_GAPS_DATASET, symbol, gaps)
+        if result.report["invalid"] or result.report["duplicates"] or result.report["gaps"]:
+            logger.info("股票 %s K线校验: %s", symbol, result.report)
+        if result.frame.empty:
+            raise RuntimeError("K线数据全部异常")
+        return result.frame
+
+    def _statements_task(self, symbol: str) -> int:
+        frames = {}
+        for dataset, method in STATEMENTS.items():
+            df = getattr(self.financial, method)(symbol)
+            if df.empty:
+                # 任何一张报表失败都不记录完成，续跑时整体重试
+                raise RuntimeError(f"{dataset} 数据为空")
+            frames[dataset] = df
+        for dataset, df in frames.items():
+            self.store.write(dataset, symbol, df)
+        return sum(len(df) for df in frames.values())
+
+    def _profile_task(self, symbol: str) -> int:
+        df = self.info.get_stock_individual_info(symbol)
+        if df.empty:
+            raise RuntimeError("个股信息为空")
+        self.store.write("profile", symbol, df)
+        if self.status_index is not None:
+            self.status_index.update_from_individual_info(symbol, df)
+        return len(df)
+
+    def _board_task(self, board_type: str, name: str) -> int:
+        df = getattr(self.info, BOARD_TYPES[board_type][1])(name)
+        if df.empty:
+            raise RuntimeError("板块成份股为空")
+        self.store.write(f"boards/{board_type}", name, df)
+        return len(df)
+
+    def build_tasks(self, symbols: List[str]) -> List[Task]:
+        """
+        生成任务列表
+
+        参数:
+            symbols: 股票代码列表
+
+        返回:
+            任务列表
+        """
+        tasks: List[Task] = []
+        per_symbol = [
+            ("kline", self._kline_task),
+            ("statements", self._statements_task),
+            ("profiles", self._profile_task),
+        ]
+        for dataset, func in per_symbol:
+            if dataset in self.datasets:
+                tasks += [(f"{dataset}:{s}", lambda f=func, s=s: f(s)) for s in symbols]
+
+        if "boards" in self.datasets:
+            for board_type, (list_method, _) in BOARD_TYPES.items():
+                boards = getattr(self.info, list_method)()
+                if boards.empty or "板块名称" not in boards.columns:
+                    logger.warning("无法获取%s板块列表", board_type)
+                    continue
+                self.store.write(f"boards/{board_type}", "_index", boards)
+                tasks += [
+                    (f"boards:{board_type}:{name}", lambda t=board_type, n=name: self._board_task(t, n))
+                    for name in boards["板块名称"].astype(str)
+                ]
+        return tasks
+
+    def run(self, tasks: List[Task], checkpoint: Checkpoint, workers: int = 8) -> Dict:
+        """
+        并发执行任务，跳过断点中已完成的任务
+
+        参数:
+            tasks: 任务列表
+            checkpoint: 断点记录
+            workers: 并发线程数
+
+        返回:
+            汇总信息字典
+        """
+        pending = [(task_id, func) for task_id, func in tasks if not checkpoint.is_done(task_id)]
+        summary = {
+            "total": len(tasks),
+            "skipped": len(tasks) - len(pending),
+            "done": 0,
+            "failed": 0,
+            "rows": 0,
+            "interrupted": False,
+        }
+        failed: List[str] = []
+        start = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = {executor.submit(func): task_id for task_id, func in pending}
+        try:
+            for i, future in enumerate(as_completed(futures), 1):
+                task_id = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    logger.error("任务 %s 出错: %s", task_id, e)
+                    summary["failed"] += 1
+                    failed.append(task_id)
+                else:
+                    checkpoint.mark_done(task_id)
+                    summary["done"] += 1
+                    summary["rows"] += rows
+                if i % 100 == 0:
+                    logger.info("进度 %d/%d，%.1f 任务/秒", i, len(pending), i / (time.perf_counter() - start))
+        except KeyboardInterrupt:
+            summary["interrupted"] = True
+            for future in futures:
+                future.cancel()
+        finally:
+            executor.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - start
+        summary["elapsed_seconds"] = round(elapsed, 2)
+        summary["tasks_per_second"] = round(summary["done"] / elapsed, 2) if elapsed else None
+        summary["rows_per_second"] = round(summary["rows"] / elapsed, 2) if elapsed else None
+        summary["failed_tasks"] = failed
+        return summary
+
+
+def _today() -> str:
+    return pd.Timestamp.now().strftime("%Y%m%d")
+
+
+def job_id(args: argparse.Namespace) -> str:
+    """
+    根据任务参数生成断点ID，参数相同的运行共享同一个断点
+    任务ID本身带有数据集名称，因此数据集不参与计算，增减数据集后已完成的部分仍会跳过；
+    未指定结束日期时以None参与计算，跨过零点续跑仍使用同一个断点，结束日期从断点中读取
+    """
+    payload = json.dumps({
+        "universe": args.universe,
+        "board_type": args.board_type,
+        "board": args.board,
+        "symbols_file": args.symbols_file,
+        "start_date": args.start_date,
+        "end_date": args.end_date,
+        "adjust": args.adjust,
+    }, sort_keys=True, ensure_ascii=False)
+    return "refresh-" + hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def print_summary(summary: Dict) -> None:
+    """打印吞吐量汇总"""
+    metrics = get_metrics()
+    calls = sum(
+        c["value"] for c in metrics.snapshot()["counters"] if c["name"] == "upstream_calls_total"
+    )
+    retries = sum(
+        c["value"] for c in metrics.snapshot()["counters"] if c["name"] == "upstream_retries_total"
+    )
+    print("=" * 60)
+    print("刷新完成" if not summary["interrupted"] else "刷新已中断，下次运行将从断点继续")
+    print(f"任务总数: {summary['total']}，断点跳过: {summary['skipped']}，"
+          f"本次完成: {summary['done']}，失败: {summary['failed']}")
+    print(f"写入行数: {summary['rows']}，耗时: {summary['elapsed_seconds']} 秒")
+    print(f"吞吐量: {summary['tasks_per_second']} 任务/秒，{summary['rows_per_second']} 行/秒")
+    skipped_calls = sum(
+        c["value"] for c in metrics.snapshot()["counters"] if c["name"] == "upstream_skipped_total"
+    )
+    print(f"上游调用: {format_value(calls)} 次，重试: {format_value(retries)} 次，"
+          f"无新数据跳过: {format_value(skipped_calls)} 次")
+    validation = {
+        c["labels"]["outcome"]: c["value"]
+        for c in metrics.snapshot()["counters"] if c["name"] == "validation_rows_total"
+    }
+    if validation:
+        print(f"K线校验: 去重 {format_value(validation.get('duplicates', 0))} 行，"
+              f"修复 {format_value(validation.get('repaired', 0))} 行，"
+              f"隔离 {format_value(validation.get('quarantined', 0))} 行")
+    reuse_rate = metrics.connection_reuse_rate()
+    if reuse_rate is not None:
+        print(f"HTTP连接复用率: {reuse_rate:.1%}")
+    if summary["failed_tasks"]:
+        preview = ", ".join(summary["failed_tasks"][:10])
+        more = "..." if len(summary["failed_tasks"]) > 10 else ""
+        print(f"失败任务: {preview}{more}")
+    print("=" * 60)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="A股全市场批量刷新")
+    parser.add_argument("--universe", choices=["all", "board", "file"], default="all",
+                        help="股票范围：全市场、指定板块或文件")
+    parser.add_argument("--board-type", choices=sorted(BOARD_TYPES), default="industry",
+                        help="universe 为 board 时的板块类型")
+    parser.add_argument("--board", help="universe 为 board 时的板块名称，如'银行'")
+    parser.add_argument("--symbols-file", help="universe 为 file 时的股票代码文件")
+    parser.add_argument("--datasets", default="kline",
+                        help=f"要刷新的数据集，逗号分隔，可选 {','.join(DATASETS)}")
+    parser.add_argument("--workers", type=int, default=8, help="并发线程数")
+    parser.add_argument("--store", default="data/store", help="本地存储目录")
+    parser.add_argument("--start-date", default="20200101", help="K线开始日期")
+    parser.add_argument("--end-date", help="K线结束日期，默认今天")
+    parser.add_argument("--adjust", choices=["qfq", "hfq", ""], default="qfq", help="K线复权类型")
+    parser.add_argument("--source", choices=["akshare", "replay"], default="akshare", help="数据源")
+    parser.add_argument("--replay-dir", help="source 为 replay 时的录制数据目录")
+    parser.add_argument("--max-retries", type=int, default=2, help="上游调用失败后的重试次数")
+    parser.add_argument("--restart", action="store_true", help="忽略断点，从头开始")
+    parser.add_argument("--no-calendar", action="store_true",
+                        help="不使用交易日历和股票状态索引，总是请求上游")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="不校验K线，直接写入上游返回的数据")
+    parser.add_argument("--metrics-file", help="结束后将运行指标写入该Prometheus文本文件")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出详细日志")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口，返回退出码"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    datasets = [d.strip() for d in args.datasets.split(",") if d.strip()]
+    if args.source == "replay":
+        if not args.replay_dir:
+            parser.error("source 为 replay 时需要指定 --replay-dir")
+        data_source = create_data_source("replay", root=args.replay_dir, max_retries=args.max_retries)
+    else:
+        data_source = create_data_source(
+            "akshare", max_retries=args.max_retries, http_pool=True, pool_maxsize=max(args.workers, 1)
+        )
+
+    store = LocalStore(args.store)
+    calendar, status_index = None, None
+    if not args.no_calendar:
+        calendar = TradingCalendar(data_source, os.path.join(args.store, META_DIR, "trade_calendar.json"))
+        if not calendar.available:
+            calendar = None
+        status_index = SymbolStatusIndex(os.path.join(args.store, META_DIR, "symbol_status.json"))
+
+    checkpoint = Checkpoint(os.path.join(args.store, CHECKPOINT_DIR, job_id(args) + ".log"))
+    if args.restart:
+        checkpoint.clear()
+    end_date = args.end_date or checkpoint.meta.get("end_date")
+    if end_date is None:
+        end_date = _today()
+        checkpoint.set_meta("end_date", end_date)
+    if checkpoint.done:
+        print(f"从断点继续，已完成 {len(checkpoint.done)} 个任务，结束日期 {end_date}")
+
+    try:
+        job = RefreshJob(store, data_source, datasets, args.start_date, end_date, args.adjust,
+                         calendar, status_index, validate=not args.no_validate)
+    except ValueError as e:
+        checkpoint.close()
+        parser.error(str(e))
+
+    try:
+        symbols = [] if datasets == ["boards"] else job.resolve_universe(
+            args.universe, args.board_type, args.board, args.symbols_file
+        )
+        tasks = job.build_tasks(symbols)
+        print(f"股票数量: {len(symbols)}，任务数量: {len(tasks)}，并发: {args.workers}")
+        summary = job.run(tasks, checkpoint, args.workers)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"刷新失败: {e}", file=sys.stderr)
+        return 2
+    finally:
+        checkpoint.close()
+        if status_index is not None:
+            status_index.save()
+
+    if not summary["interrupted"] and not summary["failed"]:
+        # 全部完成后删除断点，下次运行（如第二天的定时任务）从头开始
+        checkpoint.remove()
+
+    print_summary(summary)
+    if args.metrics_file:
+        get_metrics().write_prometheus(args.metrics_file)
+
+    if summary["interrupted"]:
+        return 130
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,578 @@
+"""
+全市场选股模块
+将本地存储中的K线和基本面数据整理为按列存放的内存映射面板，
+在多进程中并行计算指标并按声明式的筛选/打分表达式选股
+
+面板目录结构:
+    <panel>/symbols.json          股票代码列表
+    <panel>/kline/offsets.npy     每只股票在K线列中的起止位置（长度为股票数+1）
+    <panel>/kline/<字段>.npy      所有股票的K线按股票顺序首尾相接，字段见 KLINE_FIELDS
+    <panel>/fundamentals/<字段>.npy  每只股票一个值，字段见 FUNDAMENTAL_FIELDS 和 STATEMENT_FIELDS
+
+用法（在 a-stock-data-fetcher 目录下）:
+    python -m src.screener --store data/store --panel data/panel --build \\
+        --filter "close > ma60 and roe > 10" --score "ret20 - vol20" --top 50
+"""
+
+import argparse
+import ast
+import json
+import logging
+import math
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .local_store import LocalStore
+except ImportError:
+    from local_store import LocalStore
+
+logger = logging.getLogger(__name__)
+
+# K线字段：面板字段名 -> stock_zh_a_hist 返回的列名
+KLINE_FIELDS = {
+    "open": "开盘",
+    "close": "收盘",
+    "high": "最高",
+    "low": "最低",
+    "volume": "成交量",
+    "amount": "成交额",
+    "turnover_rate": "换手率",
+}
+
+# 基本面字段：面板字段名 -> stock_zh_a_spot_em 返回的列名
+FUNDAMENTAL_FIELDS = {
+    "pe": "市盈率-动态",
+    "pb": "市净率",
+    "total_mv": "总市值",
+    "float_mv": "流通市值",
+    "turnover": "换手率",
+}
+
+# 报表类基本面字段：面板字段名 -> 批量刷新写入的 financial_indicators 数据集
+# （stock_financial_abstract）中的指标名，取最近一个报告期的值
+STATEMENT_FIELDS = {
+    "roe": "净资产收益率",
+}
+
+# 带窗口参数的指标，如 ma20、ret60、rsi14
+_WINDOW_FEATURE = re.compile(r"^(ma|ret|vol|high|low|avgvol|avgamount|rsi|drawdown)(\d+)$")
+
+# 表达式中允许调用的函数：函数名 -> (实现, 参数个数)
+_FUNCTIONS = {
+    "abs": (np.abs, 1),
+    "log": (np.log, 1),
+    "sqrt": (np.sqrt, 1),
+    "min": (np.minimum, 2),
+    "max": (np.maximum, 2),
+}
+
+_BIN_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+    ast.Mod: np.mod,
+}
+
+_COMPARE_OPS = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+
+def _date_to_int(dates: pd.Series) -> np.ndarray:
+    """将日期列转换为 yyyymmdd 形式的整数"""
+    return pd.to_datetime(dates).dt.strftime("%Y%m%d").astype(np.int32).to_numpy()
+
+
+def build_panel(
+    store: LocalStore,
+    panel_dir: str,
+    symbols: Optional[Sequence[str]] = None,
+    lookback: Optional[int] = None
+) -> List[str]:
+    """
+    从本地存储构建选股面板
+
+    参数:
+        store: 本地存储，读取其中的 'kline'、'financial_indicators' 数据集和 'spot/latest' 行情表
+        panel_dir: 面板输出目录
+        symbols: 股票代码列表，默认为存储中所有有K线的股票
+        lookback: 每只股票只保留最近的多少根K线，默认全部保留
+
+    返回:
+        写入面板的股票代码列表
+    """
+    symbols = list(symbols) if symbols is not None else store.keys("kline")
+    columns: Dict[str, List[np.ndarray]] = {name: [] for name in KLINE_FIELDS}
+    dates: List[np.ndarray] = []
+    lengths: List[int] = []
+    kept: List[str] = []
+
+    for symbol in symbols:
+        df = store.read("kline", symbol)
+        if df is None or df.empty:
+            continue
+        if lookback is not None:
+            df = df.tail(lookback)
+        kept.append(symbol)
+        lengths.append(len(df))
+        dates.append(_date_to_int(df["日期"]))
+        for name, column in KLINE_FIELDS.items():
+            if column in df.columns:
+                values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = np.full(len(df), np.nan)
+            columns[name].append(values)
+
+    kline_dir = os.path.join(panel_dir, "kline")
+    os.makedirs(kline_dir, exist_ok=True)
+    offsets = np.zeros(len(kept) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    np.save(os.path.join(kline_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(kline_dir, "date.npy"),
+            np.concatenate(dates) if dates else np.empty(0, dtype=np.int32))
+    for name, parts in columns.items():
+        np.save(os.path.join(kline_dir, f"{name}.npy"),
+                np.concatenate(parts) if parts else np.empty(0))
+
+    _build_fundamentals(store, panel_dir, kept)
+
+    with open(os.path.join(panel_dir, "symbols.json"), "w", encoding="utf-8") as f:
+        json.dump(kept, f)
+
+    logger.info("选股面板已构建: %d 只股票，%d 根K线", len(kept), int(offsets[-1]))
+    return kept
+
+
+def _latest_indicator(df: pd.DataFrame, name: str) -> float:
+    """
+    从财务指标表中取某个指标最近一个报告期的值
+
+    支持两种格式：每行一个报告期、每列一个指标（带'报告期'列），
+    以及每行一个指标、每列一个报告期（带'指标'列，报告期列名为 yyyymmdd）
+    """
+    if "报告期" in df.columns and name in df.columns:
+        values = df.set_index("报告期")[name]
+    elif "指标" in df.columns:
+        rows = df[df["指标"].astype(str).str.startswith(name)]
+        if rows.empty:
+            return math.nan
+        periods = [c for c in df.columns if re.fullmatch(r"\d{8}", str(c))]
+        values = rows.iloc[0][periods]
+    else:
+        return math.nan
+    values = pd.to_numeric(values.astype(str).str.rstrip("%"), errors="coerce").dropna()
+    if values.empty:
+        return math.nan
+    return float(values.sort_index().iloc[-1])
+
+
+def _build_fundamentals(store: LocalStore, panel_dir: str, symbols: List[str]) -> None:
+    """从最新行情表和本地财务指标中提取基本面字段，按面板中的股票顺序对齐"""
+    fundamentals_dir = os.path.join(panel_dir, "fundamentals")
+    os.makedirs(fundamentals_dir, exist_ok=True)
+
+    spot = store.read("spot", "latest")
+    if spot is not None and "代码" in spot.columns:
+        spot = spot.drop_duplicates("代码").set_index(spot["代码"].astype(str))
+        spot = spot.reindex(symbols)
+    else:
+        logger.warning("本地存储中没有行情表，基本面字段将为空")
+        spot = pd.DataFrame(index=symbols)
+
+    for name, column in FUNDAMENTAL_FIELDS.items():
+        if column in spot.columns:
+            values = pd.to_numeric(spot[column], errors="coerce").to_numpy(dtype=np.float64)
+        else:
+            values = np.full(len(symbols), np.nan)
+        np.save(os.path.join(fundamentals_dir, f"{name}.npy"), values)
+
+    statements = {name: np.full(len(symbols), np.nan) for name in STATEMENT_FIELDS}
+    for i, symbol in enumerate(symbols):
+        df = store.read("financial_indicators", symbol)
+        if df is None or df.empty:
+            continue
+        for name, indicator in STATEMENT_FIELDS.items():
+            statements[name][i] = _latest_indicator(df, indicator)
+    for name, values in statements.items():
+        np.save(os.path.join(fundamentals_dir, f"{name}.npy"), values)
+
+
+class Panel:
+    """以内存映射方式打开的选股面板，多个进程可共享同一份页缓存"""
+
+    def __init__(self, panel_dir: str):
+        """
+        参数:
+            panel_dir: 面板目录
+        """
+        self.panel_dir = panel_dir
+        with open(os.path.join(panel_dir, "symbols.json"), encoding="utf-8") as f:
+            self.symbols: List[str] = json.load(f)
+        kline_dir = os.path.join(panel_dir, "kline")
+        self.offsets = np.load(os.path.join(kline_dir, "offsets.npy"))
+        self.kline = {
+            name: np.load(os.path.join(kline_dir, f"{name}.npy"), mmap_mode="r")
+            for name in list(KLINE_FIELDS) + ["date"]
+        }
+        fundamentals_dir = os.path.join(panel_dir, "fundamentals")
+        self.fundamentals = {
+            name: np.load(os.path.join(fundamentals_dir, f"{name}.npy"), mmap_mode="r")
+            for name in list(FUNDAMENTAL_FIELDS) + list(STATEMENT_FIELDS)
+            if os.path.exists(os.path.join(fundamentals_dir, f"{name}.npy"))
+        }
+
+    def series(self, field: str, index: int) -> np.ndarray:
+        """获取第 index 只股票某个K线字段的完整序列（内存映射视图，不复制）"""
+        return self.kline[field][self.offsets[index]:self.offsets[index + 1]]
+
+
+def _window_feature(kind: str, window: int, close: np.ndarray, volume: np.ndarray,
+                    amount: np.ndarray) -> float:
+    """计算单只股票的窗口类指标，数据不足时返回NaN"""
+    if kind in ("ma", "high", "low", "avgvol", "avgamount", "drawdown"):
+        if len(close) < window:
+            return math.nan
+        tail = close[-window:]
+        if kind == "ma":
+            return float(tail.mean())
+        if kind == "high":
+            return float(tail.max())
+        if kind == "low":
+            return float(tail.min())
+        if kind == "avgvol":
+            return float(volume[-window:].mean())
+        if kind == "avgamount":
+            return float(amount[-window:].mean())
+        # 窗口内的最大回撤（百分比，取正值）
+        peak = np.maximum.accumulate(tail)
+        return float(((peak - tail) / peak).max() * 100)
+
+    # 以下指标需要 window+1 个收盘价
+    if len(close) <= window:
+        return math.nan
+    tail = close[-(window + 1):]
+    if kind == "ret":
+        return float((tail[-1] / tail[0] - 1) * 100)
+    diff = np.diff(tail)
+    if kind == "vol":
+        return float(np.std(np.diff(np.log(tail)), ddof=1) * math.sqrt(252) * 100)
+    # rsi
+    gain = diff[diff > 0].sum()
+    loss = -diff[diff < 0].sum()
+    if gain + loss == 0:
+        return 50.0
+    return float(gain / (gain + loss) * 100)
+
+
+def compute_features(panel: Panel, start: int, end: int, names: Set[str]) -> Dict[str, np.ndarray]:
+    """
+    计算一段股票（[start, end)）的指标
+
+    参数:
+        panel: 选股面板
+        start: 起始股票序号
+        end: 结束股票序号（不含）
+        names: 需要的指标名
+
+    返回:
+        指标名 -> 长度为 end-start 的数组
+    """
+    count = end - start
+    features: Dict[str, np.ndarray] = {}
+    window_features: List[Tuple[str, str, int]] = []
+
+    for name in names:
+        if name == "roe":
+            # 优先使用财务指标中最近报告期的净资产收益率，本地没有财务指标的股票近似为 PB / PE
+            pe = np.asarray(panel.fundamentals["pe"][start:end], dtype=np.float64)
+            pb = np.asarray(panel.fundamentals["pb"][start:end], dtype=np.float64)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                estimate = np.where(pe > 0, pb / pe * 100, np.nan)
+            if "roe" in panel.fundamentals:
+                reported = np.asarray(panel.fundamentals["roe"][start:end], dtype=np.float64)
+                estimate = np.where(np.isnan(reported), estimate, reported)
+            features[name] = estimate
+        elif name in panel.fundamentals:
+            features[name] = np.asarray(panel.fundamentals[name][start:end], dtype=np.float64)
+        elif name in KLINE_FIELDS:
+            # 最新一根K线的字段值
+            last = panel.offsets[start + 1:end + 1] - 1
+            has_data = panel.offsets[start + 1:end + 1] > panel.offsets[start:end]
+            values = np.asarray(panel.kline[name][np.maximum(last, 0)], dtype=np.float64)
+            features[name] = np.where(has_data, values, np.nan)
+        else:
+            match = _WINDOW_FEATURE.match(name)
+            if match is None:
+                raise ValueError(f"未知指标: {name}")
+            window_features.append((name, match.group(1), int(match.group(2))))
+            features[name] = np.empty(count)
+
+    if window_features:
+        for i in range(count):
+            close = panel.series("close", start + i)
+            volume = panel.series("volume", start + i)
+            amount = panel.series("amount", start + i)
+            for name, kind, window in window_features:
+                features[name][i] = _window_feature(kind, window, close, volume, amount)
+
+    return features
+
+
+def _is_known_feature(name: str) -> bool:
+    return (
+        name in KLINE_FIELDS
+        or name in FUNDAMENTAL_FIELDS
+        or name in STATEMENT_FIELDS
+        or _WINDOW_FEATURE.match(name) is not None
+    )
+
+
+def parse_expression(expression: str) -> Tuple[ast.Expression, Set[str]]:
+    """
+    解析并校验筛选/打分表达式
+
+    表达式使用Python语法，支持算术运算、比较（可链式）、and/or/not，
+    以及函数 abs、log、sqrt、min、max；变量为指标名，如 close、ma20、ret60、pe、roe
+
+    参数:
+        expression: 表达式字符串，如 "close > ma60 and 0 < pe < 30"
+
+    返回:
+        (语法树, 用到的指标名集合)
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"表达式语法错误: {expression}") from e
+
+    names: Set[str] = set()
+    # 作为函数被调用的名字节点，函数名不能当作指标单独使用
+    callees: Set[int] = set()
+    allowed = (
+        ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+        ast.BinOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+        *_BIN_OPS, *_COMPARE_OPS,
+    )
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed):
+            raise ValueError(f"表达式中不支持的语法: {type(node).__name__}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+                raise ValueError(f"表达式中不支持的函数调用: {ast.unparse(node)}")
+            arity = _FUNCTIONS[node.func.id][1]
+            if len(node.args) != arity:
+                raise ValueError(f"函数 {node.func.id} 需要 {arity} 个参数: {ast.unparse(node)}")
+            callees.add(id(node.func))
+        elif isinstance(node, ast.Name) and id(node) not in callees:
+            if node.id in _FUNCTIONS or not _is_known_feature(node.id):
+                raise ValueError(f"未知指标: {node.id}")
+            names.add(node.id)
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"表达式中只允许数值常量: {node.value!r}")
+    return tree, names
+
+
+def evaluate(tree: ast.Expression, features: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    对一组股票的指标数组求值表达式
+
+    参数:
+        tree: parse_expression 返回的语法树
+        features: 指标名 -> 数组
+
+    返回:
+        结果数组（筛选表达式为布尔数组，打分表达式为数值数组）
+    """
+    def visit(node: ast.AST):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            return features[node.id]
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = visit(node.values[0])
+            for value in node.values[1:]:
+                result = combine(result, visit(value))
+            return result
+        if isinstance(node, ast.UnaryOp):
+            operand = visit(node.operand)
+            if isinstance(node.op, ast.Not):
+                return np.logical_not(operand)
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BinOp):
+            return _BIN_OPS[type(node.op)](visit(node.left), visit(node.right))
+        if isinstance(node, ast.Compare):
+            left = visit(node.left)
+            result = None
+            for op, comparator in zip(node.ops, node.comparators):
+                right = visit(comparator)
+                current = _COMPARE_OPS[type(op)](left, right)
+                result = current if result is None else np.logical_and(result, current)
+                left = right
+            return result
+        if isinstance(node, ast.Call):
+            return _FUNCTIONS[node.func.id][0](*[visit(arg) for arg in node.args])
+        raise ValueError(f"表达式中不支持的语法: {type(node).__name__}")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return visit(tree)
+
+
+# 每个工作进程缓存已打开的面板，避免每个分片都重新打开
+_worker_panels: Dict[str, Panel] = {}
+
+
+def _screen_partition(
+    panel_dir: str,
+    start: int,
+    end: int,
+    filter_expr: Optional[str],
+    score_expr: Optional[str],
+    columns: Sequence[str]
+) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    在工作进程中处理一个分片，只返回通过筛选的少量结果
+
+    返回:
+        (通过筛选的股票序号, 得分, 输出列)
+    """
+    panel = _worker_panels.get(panel_dir)
+    if panel is None:
+        panel = _worker_panels[panel_dir] = Panel(panel_dir)
+
+    filter_tree, filter_names = parse_expression(filter_expr) if filter_expr else (None, set())
+    score_tree, score_names = parse_expression(score_expr) if score_expr else (None, set())
+    features = compute_features(panel, start, end, filter_names | score_names | set(columns))
+
+    count = end - start
+    mask = np.ones(count, dtype=bool)
+    if filter_tree is not None:
+        mask = np.broadcast_to(np.asarray(evaluate(filter_tree, features), dtype=bool), (count,))
+    if score_tree is not None:
+        score = np.broadcast_to(np.asarray(evaluate(score_tree, features), dtype=np.float64), (count,))
+    else:
+        score = np.full(count, np.nan)
+
+    selected = np.flatnonzero(mask)
+    return (
+        selected + start,
+        score[selected],
+        {name: features[name][selected] for name in columns},
+    )
+
+
+def screen(
+    panel_dir: str,
+    filter_expr: Optional[str] = None,
+    score_expr: Optional[str] = None,
+    columns: Sequence[str] = (),
+    top: Optional[int] = None,
+    workers: Optional[int] = None,
+    partitions_per_worker: int = 4
+) -> pd.DataFrame:
+    """
+    全市场选股
+
+    参数:
+        panel_dir: build_panel 生成的面板目录
+        filter_expr: 筛选表达式，为空表示不筛选，如 "close > ma60 and roe > 10"
+        score_expr: 打分表达式，为空表示不排序，如 "ret20 - vol20"
+        columns: 结果中额外输出的指标
+        top: 只返回得分最高的前N只
+        workers: 进程数，默认为CPU核数；为1时在当前进程中计算
+        partitions_per_worker: 每个进程分到的分片数，分片越多负载越均衡
+
+    返回:
+        DataFrame，包含代码、得分以及 columns 中的指标，按得分降序
+    """
+    # 在主进程中先校验表达式，避免把错误推迟到工作进程
+    for expression in (filter_expr, score_expr):
+        if expression:
+            parse_expression(expression)
+    for name in columns:
+        if not _is_known_feature(name):
+            raise ValueError(f"未知指标: {name}")
+
+    with open(os.path.join(panel_dir, "symbols.json"), encoding="utf-8") as f:
+        symbols = json.load(f)
+    workers = workers or os.cpu_count() or 1
+    partitions = max(1, min(len(symbols), workers * partitions_per_worker))
+    bounds = np.linspace(0, len(symbols), partitions + 1).astype(int)
+    jobs = [
+        (panel_dir, int(bounds[i]), int(bounds[i + 1]), filter_expr, score_expr, list(columns))
+        for i in range(partitions)
+        if bounds[i + 1] > bounds[i]
+    ]
+
+    if workers == 1:
+        results = [_screen_partition(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_screen_partition, *zip(*jobs)))
+
+    indices = np.concatenate([r[0] for r in results]) if results else np.empty(0, dtype=int)
+    data = {
+        "代码": [symbols[i] for i in indices],
+        "得分": np.concatenate([r[1] for r in results]) if results else np.empty(0),
+    }
+    for name in columns:
+        data[name] = np.concatenate([r[2][name] for r in results]) if results else np.empty(0)
+    df = pd.DataFrame(data)
+
+    if score_expr:
+        df = df.sort_values("得分", ascending=False, na_position="last", kind="stable")
+    if top is not None:
+        df = df.head(top)
+    return df.reset_index(drop=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="A股全市场选股")
+    parser.add_argument("--panel", required=True, help="选股面板目录")
+    parser.add_argument("--store", help="本地存储目录，配合 --build 使用")
+    parser.add_argument("--build", action="store_true", help="先从本地存储重新构建面板")
+    parser.add_argument("--lookback", type=int, help="构建面板时每只股票保留的K线数量")
+    parser.add_argument("--filter", dest="filter_expr", help="筛选表达式")
+    parser.add_argument("--score", dest="score_expr", help="打分表达式")
+    parser.add_argument("--columns", default="", help="额外输出的指标，逗号分隔")
+    parser.add_argument("--top", type=int, help="只输出得分最高的前N只")
+    parser.add_argument("--workers", type=int, help="进程数，默认为CPU核数")
+    parser.add_argument("--output", help="结果保存为CSV文件")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        if not args.store:
+            parser.error("--build 需要指定 --store")
+        build_panel(LocalStore(args.store), args.panel, lookback=args.lookback)
+
+    columns = [c.strip() for c in args.columns.split(",") if c.strip()]
+    try:
+        result = screen(args.panel, args.filter_expr, args.score_expr, columns, args.top, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(result.to_string(index=False))
+    if args.output:
+        result.to_csv(args.output, index=False, encoding="utf-8-sig")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+行情表快照归档模块
+对全市场行情表、行业板块表、概念板块表等整表数据做日内多次归档：
+保存一份基准快照，之后按行内容哈希找出发生变化的行，只保存新增的行、
+变化行中取值有变化的列以及被删除的主键，可以快速还原任意时刻的整表，用于回放一个交易日
+
+归档目录结构:
+    <root>/<表名>/manifest.json         归档记录（时间、类型、文件、行数、删除的主键）
+    <root>/<表名>/<序号>_base.pkl.gz    基准快照
+    <root>/<表名>/<序号>_delta.pkl.gz   增量（新增的行、变化行中有变化的列）
+    <root>/<表名>/latest.pkl.gz         最新状态的整表和行哈希，定时任务每次新建归档对象时
+                                        直接读取它，不必从基准快照开始叠加全部增量
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 归档的表：表名 -> (StockInfoFetcher 的方法名, 主键列, 不参与归档的列)
+# 排名类的列每次都会整体变化，归档时去掉，否则每一行都会被判定为变化
+SNAPSHOT_TABLES = {
+    "spot": ("get_all_stock_list", "代码", ("序号",)),
+    "industry": ("get_stock_industry_info", "板块名称", ("排名",)),
+    "concept": ("get_stock_concept_info", "板块名称", ("排名",)),
+}
+
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "latest.pkl.gz"
+
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    """按行计算内容哈希，索引为主键"""
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+class SnapshotArchive:
+    """单张表的快照归档"""
+
+    def __init__(
+        self,
+        root: str,
+        name: str,
+        key: str = "代码",
+        drop_columns: Sequence[str] = (),
+        base_every: int = 50
+    ):
+        """
+        参数:
+            root: 归档根目录
+            name: 表名，作为子目录名
+            key: 主键列，用于匹配前后两次快照中的同一行
+            drop_columns: 不参与归档的列
+            base_every: 每隔多少个增量保存一次完整的基准快照，限制还原时需要叠加的增量数量
+        """
+        self.directory = os.path.join(root, name)
+        self.key = key
+        self.drop_columns = tuple(drop_columns)
+        self.base_every = base_every
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.entries: List[Dict] = json.load(f)["entries"]
+        else:
+            self.entries = []
+
+        # 最近一次还原的结果：(记录序号, 按主键索引的整表)，顺序回放时可以在此基础上继续叠加
+        self._cached: Optional[Tuple[int, pd.DataFrame]] = None
+        # 最新状态的行哈希，追加时用于找出变化的行
+        self._latest_hashes: Optional[pd.Series] = None
+
+    def _save_manifest(self) -> None:
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "entries": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _write(self, obj, filename: str) -> None:
+        path = os.path.join(self.directory, filename)
+        tmp_path = path + ".tmp"
+        pd.to_pickle(obj, tmp_path, compression="gzip")
+        os.replace(tmp_path, path)
+
+    def _read(self, filename: str):
+        return pd.read_pickle(os.path.join(self.directory, filename), compression="gzip")
+
+    def _load_latest(self) -> None:
+        """从 LATEST_FILE 恢复最新状态；文件缺失或与归档记录不一致时忽略，之后从基准快照叠加还原"""
+        last = len(self.entries) - 1
+        if last < 0 or (self._cached is not None and self._cached[0] == last):
+            return
+        try:
+            latest = self._read(LATEST_FILE)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning("读取最新状态文件失败，将从基准快照还原: %s", e)
+            return
+        if latest["seq"] == last:
+            self._cached = (last, latest["state"])
+            self._latest_hashes = latest["hashes"]
+
+    def _normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """去掉不参与归档的列，以主键为索引"""
+        df = df.drop(columns=[c for c in self.drop_columns if c in df.columns])
+        if self.key not in df.columns:
+            raise ValueError(f"表中缺少主键列: {self.key}")
+        df = df.drop_duplicates(self.key, keep="last").set_index(self.key)
+        return df.sort_index()
+
+    def timestamps(self) -> List[pd.Timestamp]:
+        """所有归档记录的时间"""
+        return [pd.Timestamp(entry["ts"]) for entry in self.entries]
+
+    def append(self, df: pd.DataFrame, ts: Optional[pd.Timestamp] = None) -> Optional[Dict]:
+        """
+        归档一次快照
+
+        参数:
+            df: 当前获取到的整表
+            ts: 快照时间，默认当前时间，必须晚于上一次归档
+
+        返回:
+            新增的归档记录；与上一次相比没有任何变化时不写入，返回None
+        """
+        ts = pd.Timestamp(ts) if ts is not None else pd.Timestamp.now()
+        with self._lock:
+            if self.entries and ts <= pd.Timestamp(self.entries[-1]["ts"]):
+                raise ValueError(f"快照时间 {ts} 不晚于上一次归档 {self.entries[-1]['ts']}")
+
+            current = self._normalize(df)
+            hashes = _row_hashes(current)
+            seq = len(self.entries)
+
+            self._load_latest()
+            previous = self._latest_state() if self.entries else None
+            since_base = 0
+            for entry in reversed(self.entries):
+                if entry["kind"] == "base":
+                    break
+                since_base += 1
+
+            if (
+                previous is None
+                or list(previous.columns) != list(current.columns)
+                or since_base + 1 >= self.base_every
+            ):
+                filename = f"{seq:06d}_base.pkl.gz"
+                self._write(current, filename)
+                entry = {"ts": ts.isoformat(), "kind": "base", "file": filename,
+                         "inserts": len(current), "updates": 0, "deletes": []}
+            else:
+                previous_hashes = self._latest_hashes
+                if previous_hashes is None:
+                    previous_hashes = _row_hashes(previous)
+                is_new = ~current.index.isin(previous.index)
+                existing = current.index[~is_new]
+                changed = np.zeros(len(current), dtype=bool)
+                changed[~is_new] = (
+                    previous_hashes.loc[existing].to_numpy() != hashes.loc[existing].to_numpy()
+                )
+                deleted = previous.index.difference(current.index)
+                if not changed.any() and not is_new.any() and len(deleted) == 0:
+                    logger.debug("快照 %s 没有变化，跳过", ts)
+                    return None
+
+                # 变化的行只保存取值有变化的列
+                updated = current[changed]
+                before = previous.loc[updated.index]
+                columns = [
+                    c for c in current.columns
+                    if (~((updated[c] == before[c]) | (updated[c].isna() & before[c].isna()))).any()
+                ]
+                delta = {"inserts": current[is_new], "updates": updated[columns]}
+                filename = f"{seq:06d}_delta.pkl.gz"
+                self._write(delta, filename)
+                entry = {"ts": ts.isoformat(), "kind": "delta", "file": filename,
+                         "inserts": int(is_new.sum()), "updates": int(changed.sum()),
+                         "deletes": deleted.tolist()}
+
+            # 先写最新状态再写归档记录，中途中断时两者序号不一致，下次会忽略最新状态文件
+            self._write({"seq": seq, "state": current, "hashes": hashes}, LATEST_FILE)
+            self.entries.append(entry)
+            self._save_manifest()
+            self._cached = (seq, current)
+            self._latest_hashes = hashes
+            logger.info("已归档 %s: %s，新增 %d 行，变化 %d 行，删除 %d 行",
+                        ts, entry["kind"], entry["inserts"], entry["updates"], len(entry["deletes"]))
+            return entry
+
+    def _latest_state(self) -> pd.DataFrame:
+        return self._state_at(len(self.entries) - 1)
+
+    def _state_at(self, index: int) -> pd.DataFrame:
+        """还原第 index 条记录之后的整表（以主键为索引）"""
+        base_index = index
+        while self.entries[base_index]["kind"] != "base":
+            base_index -= 1
+
+        # 缓存的状态和目标处于同一基准快照之后、且不晚于目标时，从缓存继续叠加
+        if self._cached is not None and base_index <= self._cached[0] <= index:
+            start, state = self._cached
+        else:
+            start, state = base_index, self._read(self.entries[base_index]["file"])
+
+        for i in range(start + 1, index + 1):
+            entry = self.entries[i]
+            delta = self._read(entry["file"])
+            state = state.drop(index=pd.Index(entry["deletes"], dtype=state.index.dtype), errors="ignore")
+            updates = delta["updates"]
+            if len(updates) and len(updates.columns):
+                state.loc[updates.index, updates.columns] = updates
+            if len(delta["inserts"]):
+                state = pd.concat([state, delta["inserts"]]).sort_index()
+
+        self._cached = (index, state)
+        return state
+
+    def as_of(self, ts: pd.Timestamp) -> pd.DataFrame:
+        """
+        还原某一时刻的整表
+
+        参数:
+            ts: 时刻
+
+        返回:
+            该时刻（含）之前最后一次归档对应的整表，主键为第一列；早于第一次归档时返回空表
+        """
+        ts = pd.Timestamp(ts)
+        stamps = np.array([pd.Timestamp(e["ts"]).value for e in self.entries], dtype=np.int64)
+        index = int(np.searchsorted(stamps, ts.value, side="right")) - 1
+        if index < 0:
+            return pd.DataFrame()
+        with self._lock:
+            state = self._state_at(index)
+        return state.reset_index()
+
+    def replay(
+        self,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None
+    ) -> Iterator[Tuple[pd.Timestamp, pd.DataFrame]]:
+        """
+        按时间顺序回放归档，每一步只叠加一个增量
+
+        参数:
+            start: 开始时间（含），默认从第一次归档开始
+            end: 结束时间（含），默认到最后一次归档
+
+        返回:
+            依次产出 (快照时间, 整表)
+        """
+        for index, entry in enumerate(self.entries):
+            ts = pd.Timestamp(entry["ts"])
+            if start is not None and ts < pd.Timestamp(start):
+                continue
+            if end is not None and ts > pd.Timestamp(end):
+                break
+            with self._lock:
+                state = self._state_at(index)
+            yield ts, state.reset_index()
+
+
+def capture_snapshots(
+    info_fetcher,
+    root: str,
+    tables: Optional[Sequence[str]] = None,
+    ts: Optional[pd.Timestamp] = None
+) -> Dict[str, Optional[Dict]]:
+    """
+    获取并归档一组整表，可以放在定时任务中日内多次调用
+
+    参数:
+        info_fetcher: StockInfoFetcher 实例
+        root: 归档根目录
+        tables: 要归档的表名，取值见 SNAPSHOT_TABLES，默认全部
+        ts: 快照时间，默认当前时间
+
+    返回:
+        表名 -> 新增的归档记录（获取失败或没有变化时为None）
+    """
+    ts = pd.Timestamp(ts) if ts is not None else pd.Timestamp.now()
+    results = {}
+    for name in tables or SNAPSHOT_TABLES:
+        method, key, drop_columns = SNAPSHOT_TABLES[name]
+        df = getattr(info_fetcher, method)()
+        if df.empty:
+            logger.warning("获取 %s 表失败，本次不归档", name)
+            results[name] = None
+            continue
+        archive = SnapshotArchive(root, name, key=key, drop_columns=drop_columns)
+        results[name] = archive.append(df, ts)
+    return results
@@ -3,17 +3,30 @@
 使用akshare库获取股票的财务报表、财务指标等数据
 """
 
-import akshare as ak
+import logging
+
 import pandas as pd
 from typing import Optional, Literal
 
+try:
+    from .data_source import DataSource, get_default_data_source
+except ImportError:
+    from data_source import DataSource, get_default_data_source
+
+logger = logging.getLogger(__name__)
+
 
 class StockFinancialFetcher:
     """股票财务数据获取器"""
 
-    def __init__(self):
-        """初始化财务数据获取器"""
-        pass
+    def __init__(self, data_source: Optional[DataSource] = None):
+        """
+        初始化财务数据获取器
+
+        参数:
+            data_source: 数据源后端，默认使用全局默认数据源（akshare）
+        """
+        self.data_source = data_source or get_default_data_source()
 
     def get_financial_indicators(self, symbol: str) -> pd.DataFrame:
         """
@@ -27,13 +40,13 @@ class StockFinancialFetcher:
         """
         try:
             # 获取财务指标数据
-            df = ak.stock_financial_abstract(symbol=symbol)
+            df = self.data_source.fetch("stock_financial_abstract", symbol=symbol)
 
-            print(f"成功获取股票 {symbol} 的财务指标，共 {len(df)} 条记录")
+            logger.info("成功获取股票 %s 的财务指标，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 财务指标时出错: {e}")
+            logger.error("获取股票 %s 财务指标时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def get_balance_sheet(self, symbol: str) -> pd.DataFrame:
@@ -48,13 +61,13 @@ class StockFinancialFetcher:
         """
         try:
             # 获取资产负债表
-            df = ak.stock_balance_sheet_by_report_em(symbol=symbol)
+            df = self.data_source.fetch("stock_balance_sheet_by_report_em", symbol=symbol)
 
-            print(f"成功获取股票 {symbol} 的资产负债表，共 {len(df)} 条记录")
+            logger.info("成功获取股票 %s 的资产负债表，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 资产负债表时出错: {e}")
+            logger.error("获取股票 %s 资产负债表时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def get_income_statement(self, symbol: str) -> pd.DataFrame:
@@ -69,13 +82,13 @@ class StockFinancialFetcher:
         """
         try:
             # 获取利润表
-            df = ak.stock_profit_sheet_by_report_em(symbol=symbol)
+            df = self.data_source.fetch("stock_profit_sheet_by_report_em", symbol=symbol)
 
-            print(f"成功获取股票 {symbol} 的利润表，共 {len(df)} 条记录")
+            logger.info("成功获取股票 %s 的利润表，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 利润表时出错: {e}")
+            logger.error("获取股票 %s 利润表时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def get_cash_flow(self, symbol: str) -> pd.DataFrame:
@@ -90,13 +103,13 @@ class StockFinancialFetcher:
         """
         try:
             # 获取现金流量表
-            df = ak.stock_cash_flow_sheet_by_report_em(symbol=symbol)
+            df = self.data_source.fetch("stock_cash_flow_sheet_by_report_em", symbol=symbol)
 
-            print(f"成功获取股票 {symbol} 的现金流量表，共 {len(df)} 条记录")
+            logger.info("成功获取股票 %s 的现金流量表，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 现金流量表时出错: {e}")
+            logger.error("获取股票 %s 现金流量表时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def get_roe_data(self, symbol: str) -> pd.DataFrame:
@@ -111,19 +124,19 @@ class StockFinancialFetcher:
         """
         try:
             # 获取股票的财务指标
-            df = ak.stock_financial_abstract(symbol=symbol)
+            df = self.data_source.fetch("stock_financial_abstract", symbol=symbol)
 
             # 筛选ROE相关数据
             if '净资产收益率' in df.columns:
                 roe_df = df[['报告期', '净资产收益率']]
-                print(f"成功获取股票 {symbol} 的ROE数据，共 {len(roe_df)} 条记录")
+                logger.info("成功获取股票 %s 的ROE数据，共 %d 条记录", symbol, len(roe_df))
                 return roe_df
             else:
-                print(f"未找到股票 {symbol} 的ROE数据")
+                logger.warning("未找到股票 %s 的ROE数据", symbol)
                 return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} ROE数据时出错: {e}")
+            logger.error("获取股票 %s ROE数据时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def get_pe_pb_data(self, symbol: str) -> pd.DataFrame:
@@ -138,14 +151,14 @@ class StockFinancialFetcher:
         """
         try:
             # 获取个股的历史市盈率和市净率
-            df = ak.stock_a_lg_indicator(symbol=symbol)
+            df = self.data_source.fetch("stock_a_lg_indicator", symbol=symbol)
 
             if not df.empty:
-                print(f"成功获取股票 {symbol} 的PE/PB数据，共 {len(df)} 条记录")
+                logger.info("成功获取股票 %s 的PE/PB数据，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} PE/PB数据时出错: {e}")
+            logger.error("获取股票 %s PE/PB数据时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def save_to_csv(self, df: pd.DataFrame, filename: str) -> None:
@@ -158,9 +171,9 @@ class StockFinancialFetcher:
         """
         if not df.empty:
             df.to_csv(filename, index=False, encoding='utf-8-sig')
-            print(f"数据已保存到 {filename}")
+            logger.info("数据已保存到 %s", filename)
         else:
-            print("数据为空，未保存")
+            logger.warning("数据为空，未保存")
 
     def save_to_excel(self, df: pd.DataFrame, filename: str) -> None:
         """
@@ -172,6 +185,6 @@ class StockFinancialFetcher:
         """
         if not df.empty:
             df.to_excel(filename, index=False, engine='openpyxl')
-            print(f"数据已保存到 {filename}")
+            logger.info("数据已保存到 %s", filename)
         else:
-            print("数据为空，未保存")
+            logger.warning("数据为空，未保存")
@@ -3,24 +3,76 @@
 使用akshare库获取股票的日K线、周K线、月K线等历史数据
 """
 
-import akshare as ak
+import logging
+
 import pandas as pd
 from typing import Optional, Literal
 
+try:
+    from .data_source import DataSource, get_default_data_source
+    from .metrics import get_metrics
+    from .trading_calendar import SymbolStatusIndex, TradingCalendar
+except ImportError:
+    from data_source import DataSource, get_default_data_source
+    from metrics import get_metrics
+    from trading_calendar import SymbolStatusIndex, TradingCalendar
+
+logger = logging.getLogger(__name__)
+
 
 class StockHistoryFetcher:
     """股票历史交易数据获取器"""
 
-    def __init__(self):
-        """初始化历史数据获取器"""
-        pass
+    def __init__(
+        self,
+        data_source: Optional[DataSource] = None,
+        calendar: Optional[TradingCalendar] = None,
+        status_index: Optional[SymbolStatusIndex] = None
+    ):
+        """
+        初始化历史数据获取器
+
+        参数:
+            data_source: 数据源后端，默认使用全局默认数据源（akshare）
+            calendar: 交易日历，提供时跳过区间内没有交易日的请求
+            status_index: 股票状态索引，提供时跳过未上市、已退市或停牌期间的请求
+        """
+        self.data_source = data_source or get_default_data_source()
+        self.calendar = calendar
+        self.status_index = status_index
+
+    def can_have_data(self, symbol: str, start_date: str, end_date: str) -> bool:
+        """
+        判断区间内是否可能有K线，不可能有时无需请求上游
+
+        参数:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+
+        返回:
+            可能有数据时返回True；交易日历无法加载时不据此跳过，宁可多请求也不漏数据
+        """
+        reason = None
+        if (self.calendar is not None and self.calendar.available
+                and not self.calendar.has_trading_days(start_date, end_date)):
+            reason = "区间内没有交易日"
+        elif self.status_index is not None:
+            reason = self.status_index.skip_reason(symbol, start_date, end_date)
+
+        if reason is None:
+            return True
+        (self.data_source.metrics or get_metrics()).record_skip("stock_zh_a_hist", reason)
+        logger.info("跳过股票 %s 在 %s~%s 的K线请求: %s", symbol, start_date, end_date, reason)
+        return False
 
     def get_daily_kline(
         self,
         symbol: str,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        adjust: Literal["qfq", "hfq", ""] = "qfq"
+        adjust: Literal["qfq", "hfq", ""] = "qfq",
+        raise_errors: bool = False
     ) -> pd.DataFrame:
         """
         获取股票日K线数据
@@ -30,25 +82,35 @@ class StockHistoryFetcher:
             start_date: 开始日期，格式'20200101'
             end_date: 结束日期，格式'20231231'
             adjust: 复权类型，'qfq'前复权，'hfq'后复权，''不复权
+            raise_errors: 获取失败时是否抛出异常；默认返回空DataFrame，
+                此时调用方无法区分获取失败和区间内确实没有K线
 
         返回:
             DataFrame包含日期、开盘价、收盘价、最高价、最低价、成交量、成交额等
         """
+        start_date = start_date or "20200101"
+        end_date = end_date or pd.Timestamp.now().strftime("%Y%m%d")
+        if not self.can_have_data(symbol, start_date, end_date):
+            return pd.DataFrame()
+
         try:
             # 使用akshare获取股票历史行情数据
-            df = ak.stock_zh_a_hist(
+            df = self.data_source.fetch(
+                "stock_zh_a_hist",
                 symbol=symbol,
                 period="daily",
-                start_date=start_date or "20200101",
-                end_date=end_date or pd.Timestamp.now().strftime("%Y%m%d"),
+                start_date=start_date,
+                end_date=end_date,
                 adjust=adjust
             )
 
-            print(f"成功获取股票 {symbol} 的日K线数据，共 {len(df)} 条记录")
+            logger.info("成功获取股票 %s 的日K线数据，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 日K线数据时出错: {e}")
+            logger.error("获取股票 %s 日K线数据时出错: %s", symbol, e)
+            if raise_errors:
+                raise
             return pd.DataFrame()
 
     def get_weekly_kline(
@@ -70,20 +132,26 @@ class StockHistoryFetcher:
         返回:
             DataFrame包含周K线数据
         """
+        start_date = start_date or "20200101"
+        end_date = end_date or pd.Timestamp.now().strftime("%Y%m%d")
+        if not self.can_have_data(symbol, start_date, end_date):
+            return pd.DataFrame()
+
         try:
-            df = ak.stock_zh_a_hist(
+            df = self.data_source.fetch(
+                "stock_zh_a_hist",
                 symbol=symbol,
                 period="weekly",
-                start_date=start_date or "20200101",
-                end_date=end_date or pd.Timestamp.now().strftime("%Y%m%d"),
+                start_date=start_date,
+                end_date=end_date,
                 adjust=adjust
             )
 
-            print(f"成功获取股票 {symbol} 的周K线数据，共 {len(df)} 条记录")
+            logger.info("成功获取股票 %s 的周K线数据，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 周K线数据时出错: {e}")
+            logger.error("获取股票 %s 周K线数据时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def get_monthly_kline(
@@ -105,20 +173,26 @@ class StockHistoryFetcher:
         返回:
             DataFrame包含月K线数据
         """
+        start_date = start_date or "20200101"
+        end_date = end_date or pd.Timestamp.now().strftime("%Y%m%d")
+        if not self.can_have_data(symbol, start_date, end_date):
+            return pd.DataFrame()
+
         try:
-            df = ak.stock_zh_a_hist(
+            df = self.data_source.fetch(
+                "stock_zh_a_hist",
                 symbol=symbol,
                 period="monthly",
-                start_date=start_date or "20200101",
-                end_date=end_date or pd.Timestamp.now().strftime("%Y%m%d"),
+                start_date=start_date,
+                end_date=end_date,
                 adjust=adjust
             )
 
-            print(f"成功获取股票 {symbol} 的月K线数据，共 {len(df)} 条记录")
+            logger.info("成功获取股票 %s 的月K线数据，共 %d 条记录", symbol, len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 月K线数据时出错: {e}")
+            logger.error("获取股票 %s 月K线数据时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def save_to_csv(self, df: pd.DataFrame, filename: str) -> None:
@@ -131,9 +205,9 @@ class StockHistoryFetcher:
         """
         if not df.empty:
             df.to_csv(filename, index=False, encoding='utf-8-sig')
-            print(f"数据已保存到 {filename}")
+            logger.info("数据已保存到 %s", filename)
         else:
-            print("数据为空，未保存")
+            logger.warning("数据为空，未保存")
 
     def save_to_excel(self, df: pd.DataFrame, filename: str) -> None:
         """
@@ -145,6 +219,6 @@ class StockHistoryFetcher:
         """
         if not df.empty:
             df.to_excel(filename, index=False, engine='openpyxl')
-            print(f"数据已保存到 {filename}")
+            logger.info("数据已保存到 %s", filename)
         else:
-            print("数据为空，未保存")
+            logger.warning("数据为空，未保存")
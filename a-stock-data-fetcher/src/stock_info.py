@@ -3,17 +3,37 @@
 使用akshare库获取股票的基本信息、行业分类、上市信息等
 """
 
-import akshare as ak
+import logging
+
 import pandas as pd
 from typing import Optional
 
+try:
+    from .data_source import DataSource, get_default_data_source
+except ImportError:
+    from data_source import DataSource, get_default_data_source
+
+logger = logging.getLogger(__name__)
+
+# 板块类型 -> (获取板块列表的方法名, 获取板块成份股的方法名)，均为 StockInfoFetcher 的方法
+BOARD_TYPES = {
+    "industry": ("get_stock_industry_info", "get_stocks_by_industry"),
+    "concept": ("get_stock_concept_info", "get_stocks_by_concept"),
+    "region": ("get_stock_region_info", "get_stocks_by_region"),
+}
+
 
 class StockInfoFetcher:
     """股票基本信息获取器"""
 
-    def __init__(self):
-        """初始化信息获取器"""
-        pass
+    def __init__(self, data_source: Optional[DataSource] = None):
+        """
+        初始化信息获取器
+
+        参数:
+            data_source: 数据源后端，默认使用全局默认数据源（akshare）
+        """
+        self.data_source = data_source or get_default_data_source()
 
     def get_all_stock_list(self) -> pd.DataFrame:
         """
@@ -24,13 +44,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取沪深京A股实时行情数据（包含基本信息）
-            df = ak.stock_zh_a_spot_em()
+            df = self.data_source.fetch("stock_zh_a_spot_em")
 
-            print(f"成功获取A股股票列表，共 {len(df)} 只股票")
+            logger.info("成功获取A股股票列表，共 %d 只股票", len(df))
             return df
 
         except Exception as e:
-            print(f"获取股票列表时出错: {e}")
+            logger.error("获取股票列表时出错: %s", e)
             return pd.DataFrame()
 
     def get_stock_individual_info(self, symbol: str) -> pd.DataFrame:
@@ -45,13 +65,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取个股信息
-            df = ak.stock_individual_info_em(symbol=symbol)
+            df = self.data_source.fetch("stock_individual_info_em", symbol=symbol)
 
-            print(f"成功获取股票 {symbol} 的详细信息")
+            logger.info("成功获取股票 %s 的详细信息", symbol)
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 详细信息时出错: {e}")
+            logger.error("获取股票 %s 详细信息时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def get_stock_industry_info(self) -> pd.DataFrame:
@@ -63,13 +83,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取行业板块成份股
-            df = ak.stock_board_industry_name_em()
+            df = self.data_source.fetch("stock_board_industry_name_em")
 
-            print(f"成功获取行业分类信息，共 {len(df)} 个行业")
+            logger.info("成功获取行业分类信息，共 %d 个行业", len(df))
             return df
 
         except Exception as e:
-            print(f"获取行业分类信息时出错: {e}")
+            logger.error("获取行业分类信息时出错: %s", e)
             return pd.DataFrame()
 
     def get_stocks_by_industry(self, industry_name: str) -> pd.DataFrame:
@@ -84,13 +104,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取指定行业板块的成份股
-            df = ak.stock_board_industry_cons_em(symbol=industry_name)
+            df = self.data_source.fetch("stock_board_industry_cons_em", symbol=industry_name)
 
-            print(f"成功获取 {industry_name} 行业的股票，共 {len(df)} 只")
+            logger.info("成功获取 %s 行业的股票，共 %d 只", industry_name, len(df))
             return df
 
         except Exception as e:
-            print(f"获取 {industry_name} 行业股票时出错: {e}")
+            logger.error("获取 %s 行业股票时出错: %s", industry_name, e)
             return pd.DataFrame()
 
     def get_stock_concept_info(self) -> pd.DataFrame:
@@ -102,13 +122,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取概念板块数据
-            df = ak.stock_board_concept_name_em()
+            df = self.data_source.fetch("stock_board_concept_name_em")
 
-            print(f"成功获取概念板块信息，共 {len(df)} 个概念")
+            logger.info("成功获取概念板块信息，共 %d 个概念", len(df))
             return df
 
         except Exception as e:
-            print(f"获取概念板块信息时出错: {e}")
+            logger.error("获取概念板块信息时出错: %s", e)
             return pd.DataFrame()
 
     def get_stocks_by_concept(self, concept_name: str) -> pd.DataFrame:
@@ -123,13 +143,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取指定概念板块的成份股
-            df = ak.stock_board_concept_cons_em(symbol=concept_name)
+            df = self.data_source.fetch("stock_board_concept_cons_em", symbol=concept_name)
 
-            print(f"成功获取 {concept_name} 概念的股票，共 {len(df)} 只")
+            logger.info("成功获取 %s 概念的股票，共 %d 只", concept_name, len(df))
             return df
 
         except Exception as e:
-            print(f"获取 {concept_name} 概念股票时出错: {e}")
+            logger.error("获取 %s 概念股票时出错: %s", concept_name, e)
             return pd.DataFrame()
 
     def get_stock_region_info(self) -> pd.DataFrame:
@@ -141,13 +161,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取地域板块数据
-            df = ak.stock_board_district_name_em()
+            df = self.data_source.fetch("stock_board_district_name_em")
 
-            print(f"成功获取地域板块信息，共 {len(df)} 个地区")
+            logger.info("成功获取地域板块信息，共 %d 个地区", len(df))
             return df
 
         except Exception as e:
-            print(f"获取地域板块信息时出错: {e}")
+            logger.error("获取地域板块信息时出错: %s", e)
             return pd.DataFrame()
 
     def get_stocks_by_region(self, region_name: str) -> pd.DataFrame:
@@ -162,13 +182,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取指定地域板块的成份股
-            df = ak.stock_board_district_cons_em(symbol=region_name)
+            df = self.data_source.fetch("stock_board_district_cons_em", symbol=region_name)
 
-            print(f"成功获取 {region_name} 地区的股票，共 {len(df)} 只")
+            logger.info("成功获取 %s 地区的股票，共 %d 只", region_name, len(df))
             return df
 
         except Exception as e:
-            print(f"获取 {region_name} 地区股票时出错: {e}")
+            logger.error("获取 %s 地区股票时出错: %s", region_name, e)
             return pd.DataFrame()
 
     def get_stock_holder_info(self, symbol: str) -> pd.DataFrame:
@@ -183,13 +203,13 @@ class StockInfoFetcher:
         """
         try:
             # 获取股东信息
-            df = ak.stock_gdfx_top_10_em(symbol=symbol)
+            df = self.data_source.fetch("stock_gdfx_top_10_em", symbol=symbol)
 
-            print(f"成功获取股票 {symbol} 的股东信息")
+            logger.info("成功获取股票 %s 的股东信息", symbol)
             return df
 
         except Exception as e:
-            print(f"获取股票 {symbol} 股东信息时出错: {e}")
+            logger.error("获取股票 %s 股东信息时出错: %s", symbol, e)
             return pd.DataFrame()
 
     def search_stock_by_name(self, keyword: str) -> pd.DataFrame:
@@ -209,14 +229,14 @@ class StockInfoFetcher:
             if not all_stocks.empty and '名称' in all_stocks.columns:
                 # 根据名称筛选
                 matched = all_stocks[all_stocks['名称'].str.contains(keyword, na=False)]
-                print(f"找到 {len(matched)} 只包含 '{keyword}' 的股票")
+                logger.info("找到 %d 只包含 '%s' 的股票", len(matched), keyword)
                 return matched
             else:
-                print("无法搜索股票")
+                logger.warning("无法搜索股票")
                 return pd.DataFrame()
 
         except Exception as e:
-            print(f"搜索股票时出错: {e}")
+            logger.error("搜索股票时出错: %s", e)
             return pd.DataFrame()
 
     def save_to_csv(self, df: pd.DataFrame, filename: str) -> None:
@@ -229,9 +249,9 @@ class StockInfoFetcher:
         """
         if not df.empty:
             df.to_csv(filename, index=False, encoding='utf-8-sig')
-            print(f"数据已保存到 {filename}")
+            logger.info("数据已保存到 %s", filename)
         else:
-            print("数据为空，未保存")
+            logger.warning("数据为空，未保存")
 
     def save_to_excel(self, df: pd.DataFrame, filename: str) -> None:
         """
@@ -243,6 +263,6 @@ class StockInfoFetcher:
         """
         if not df.empty:
             df.to_excel(filename, index=False, engine='openpyxl')
-            print(f"数据已保存到 {filename}")
+            logger.info("数据已保存到 %s", filename)
         else:
-            print("数据为空，未保存")
+            logger.warning("数据为空，未保存")
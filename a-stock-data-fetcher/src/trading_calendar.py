@@ -0,0 +1,344 @@
+"""
+交易日历和股票状态模块
+缓存沪深交易所的交易日历，并维护每只股票的上市、停牌、退市状态，
+用于在请求不可能返回新数据时（周末、节假日、停牌、未上市或已退市）跳过上游调用
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .data_source import DataSource, get_default_data_source
+except ImportError:
+    from data_source import DataSource, get_default_data_source
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[str, int, pd.Timestamp]
+
+# 行情表中被判定为停牌的股票占比超过该值时，认为行情表不可信（如开盘前），不更新停牌状态
+MAX_SUSPENDED_RATIO = 0.5
+
+
+def to_date_int(date: DateLike) -> int:
+    """
+    将日期转换为 yyyymmdd 形式的整数
+
+    参数:
+        date: '20230101'、'2023-01-01'、20230101 或 Timestamp
+
+    返回:
+        整数日期，如 20230101
+    """
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    if isinstance(date, str) and len(date) == 8 and date.isdigit():
+        return int(date)
+    return int(pd.Timestamp(date).strftime("%Y%m%d"))
+
+
+def _date_int_to_str(date: int) -> str:
+    return f"{date:08d}"
+
+
+class TradingCalendar:
+    """
+    沪深交易所交易日历
+    数据来自 tool_trade_date_hist_sina，缓存到本地文件，超过有效期后自动刷新
+    """
+
+    def __init__(
+        self,
+        data_source: Optional[DataSource] = None,
+        cache_path: Optional[str] = None,
+        max_age_days: float = 7
+    ):
+        """
+        参数:
+            data_source: 数据源后端，默认使用全局默认数据源
+            cache_path: 缓存文件路径，None表示只缓存在内存中
+            max_age_days: 缓存有效期（天）
+        """
+        self.data_source = data_source or get_default_data_source()
+        self.cache_path = cache_path
+        self.max_age_days = max_age_days
+        self._days: Optional[np.ndarray] = None
+        # 第一次加载失败的原因，之后不再自动重试，直到显式调用 refresh
+        self._load_error: Optional[Exception] = None
+
+    @property
+    def days(self) -> np.ndarray:
+        """
+        升序排列的交易日（yyyymmdd 整数数组），第一次访问时加载
+
+        加载失败时抛出异常并记住失败，之后的访问直接抛出RuntimeError，不再重复请求上游
+        """
+        if self._days is None:
+            if self._load_error is not None:
+                raise RuntimeError(f"交易日历不可用: {self._load_error}")
+            try:
+                self._days = self._load()
+            except Exception as e:
+                self._load_error = e
+                logger.warning("交易日历加载失败，本次运行不再使用交易日历: %s", e)
+                raise
+        return self._days
+
+    @property
+    def available(self) -> bool:
+        """交易日历是否可用，第一次访问时加载，加载失败时返回False"""
+        try:
+            self.days
+        except Exception:
+            return False
+        return True
+
+    def _load(self) -> np.ndarray:
+        if self.cache_path and os.path.exists(self.cache_path):
+            age_days = (time.time() - os.path.getmtime(self.cache_path)) / 86400
+            if age_days <= self.max_age_days:
+                with open(self.cache_path, encoding="utf-8") as f:
+                    return np.asarray(json.load(f), dtype=np.int64)
+        return self.refresh()
+
+    def refresh(self) -> np.ndarray:
+        """
+        从上游重新获取交易日历并写入缓存
+
+        返回:
+            交易日数组
+        """
+        df = self.data_source.fetch("tool_trade_date_hist_sina")
+        days = np.unique(pd.to_datetime(df["trade_date"]).dt.strftime("%Y%m%d").astype(np.int64))
+        if self.cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(days.tolist(), f)
+            os.replace(tmp_path, self.cache_path)
+        self._days = days
+        self._load_error = None
+        logger.info("交易日历已更新，共 %d 个交易日", len(days))
+        return days
+
+    def covers(self, date: DateLike) -> bool:
+        """日历是否覆盖该日期（日历之外的日期无法判断是否为交易日）"""
+        days = self.days
+        return len(days) > 0 and days[0] <= to_date_int(date) <= days[-1]
+
+    def is_trading_day(self, date: DateLike) -> bool:
+        """
+        判断是否为交易日
+
+        参数:
+            date: 日期
+
+        返回:
+            是否为交易日；超出日历范围时返回True，宁可多请求也不漏数据
+        """
+        value = to_date_int(date)
+        if not self.covers(value):
+            return True
+        days = self.days
+        i = np.searchsorted(days, value)
+        return i < len(days) and days[i] == value
+
+    def last_trading_day(self, on_or_before: DateLike) -> Optional[str]:
+        """
+        获取不晚于指定日期的最后一个交易日
+
+        参数:
+            on_or_before: 日期
+
+        返回:
+            'yyyymmdd' 字符串，早于日历起点时返回None
+        """
+        days = self.days
+        i = np.searchsorted(days, to_date_int(on_or_before), side="right")
+        return _date_int_to_str(int(days[i - 1])) if i > 0 else None
+
+    def trading_days(self, start: DateLike, end: DateLike) -> np.ndarray:
+        """
+        获取区间内的所有交易日
+
+        参数:
+            start: 开始日期（含）
+            end: 结束日期（含）
+
+        返回:
+            交易日数组（yyyymmdd 整数）
+        """
+        days = self.days
+        lo = np.searchsorted(days, to_date_int(start), side="left")
+        hi = np.searchsorted(days, to_date_int(end), side="right")
+        return days[lo:hi]
+
+    def has_trading_days(self, start: DateLike, end: DateLike) -> bool:
+        """
+        区间内是否有交易日
+
+        参数:
+            start: 开始日期（含）
+            end: 结束日期（含）
+
+        返回:
+            有交易日或区间超出日历范围时返回True
+        """
+        start_int, end_int = to_date_int(start), to_date_int(end)
+        if start_int > end_int:
+            return False
+        days = self.days
+        if len(days) == 0 or end_int > days[-1] or start_int < days[0]:
+            return True
+        return len(self.trading_days(start_int, end_int)) > 0
+
+
+class SymbolStatusIndex:
+    """
+    股票状态索引
+    记录每只股票的上市日期、停牌起始日期和退市日期，数据来自行情表和个股信息，保存为JSON文件
+
+    停牌和退市状态只在根据行情表更新时才会变化，因此同时记录最后一次用行情表更新的日期，
+    查询区间晚于该日期时（如只刷新部分股票、没有获取行情表的运行）不据此跳过
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        参数:
+            path: 索引文件路径，存在时自动加载；None表示只保存在内存中
+        """
+        self.path = path
+        self.records: Dict[str, Dict[str, Optional[int]]] = {}
+        # 最后一次根据行情表更新停牌和退市状态的日期
+        self.spot_date: Optional[int] = None
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            # 旧格式直接保存各股票的记录，没有更新日期，其中的停牌和退市状态视为未知
+            if isinstance(data.get("symbols"), dict):
+                self.records = data["symbols"]
+                self.spot_date = data.get("spot_date")
+            else:
+                self.records = data
+
+    def _record(self, symbol: str) -> Dict[str, Optional[int]]:
+        return self.records.setdefault(
+            symbol, {"listing_date": None, "suspended_since": None, "delisted_date": None}
+        )
+
+    def update_from_spot(self, spot: pd.DataFrame, as_of: Optional[DateLike] = None) -> None:
+        """
+        根据全市场行情表更新停牌和退市状态
+
+        最新价为空或为0的股票视为停牌；之前出现过、但不在本次行情表中的股票视为退市
+
+        参数:
+            spot: get_all_stock_list 返回的行情表
+            as_of: 行情表对应的日期，默认今天
+        """
+        if spot is None or spot.empty or "代码" not in spot.columns:
+            logger.warning("行情表为空，跳过股票状态更新")
+            return
+        today = to_date_int(as_of if as_of is not None else pd.Timestamp.now())
+        codes = spot["代码"].astype(str).to_numpy()
+        if "最新价" in spot.columns:
+            price = pd.to_numeric(spot["最新价"], errors="coerce").to_numpy()
+            suspended = np.isnan(price) | (price == 0)
+        else:
+            suspended = np.zeros(len(codes), dtype=bool)
+
+        update_suspension = suspended.mean() <= MAX_SUSPENDED_RATIO
+        if not update_suspension:
+            logger.warning("行情表中停牌股票占比 %.0f%%，可能尚未开盘，不更新停牌状态", suspended.mean() * 100)
+
+        if update_suspension:
+            self.spot_date = today
+        present = set(codes)
+        for code, is_suspended in zip(codes, suspended):
+            record = self._record(code)
+            record["delisted_date"] = None
+            if update_suspension:
+                if is_suspended:
+                    record["suspended_since"] = record["suspended_since"] or today
+                else:
+                    record["suspended_since"] = None
+
+        for code, record in self.records.items():
+            if code not in present and record["delisted_date"] is None:
+                record["delisted_date"] = today
+
+    def update_from_individual_info(self, symbol: str, info: pd.DataFrame) -> None:
+        """
+        根据个股信息更新上市日期
+
+        参数:
+            symbol: 股票代码
+            info: get_stock_individual_info 返回的信息表（item/value 两列）
+        """
+        if info is None or info.empty or "item" not in info.columns:
+            return
+        listing = info.loc[info["item"] == "上市时间", "value"]
+        if listing.empty:
+            return
+        try:
+            self._record(symbol)["listing_date"] = to_date_int(str(listing.iloc[0]))
+        except ValueError:
+            logger.debug("无法解析股票 %s 的上市时间: %s", symbol, listing.iloc[0])
+
+    def build(self, info_fetcher, symbols: Optional[Iterable[str]] = None) -> None:
+        """
+        通过信息获取器刷新索引：获取行情表，并为缺少上市日期的股票获取个股信息
+
+        参数:
+            info_fetcher: StockInfoFetcher 实例
+            symbols: 需要补充上市日期的股票，默认为行情表中的全部股票
+        """
+        spot = info_fetcher.get_all_stock_list()
+        self.update_from_spot(spot)
+        if symbols is None:
+            symbols = spot["代码"].astype(str) if "代码" in spot.columns else []
+        for symbol in symbols:
+            if self._record(symbol)["listing_date"] is None:
+                self.update_from_individual_info(symbol, info_fetcher.get_stock_individual_info(symbol))
+
+    def save(self) -> None:
+        """保存索引文件"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"spot_date": self.spot_date, "symbols": self.records}, f)
+        os.replace(tmp_path, self.path)
+
+    def skip_reason(self, symbol: str, start: DateLike, end: DateLike) -> Optional[str]:
+        """
+        判断区间内该股票是否不可能有K线
+
+        参数:
+            symbol: 股票代码
+            start: 开始日期
+            end: 结束日期
+
+        返回:
+            不可能有数据时返回原因，否则返回None；停牌和退市状态早于区间结束日期时视为未知
+        """
+        record = self.records.get(symbol)
+        if record is None:
+            return None
+        start_int, end_int = to_date_int(start), to_date_int(end)
+        if record["listing_date"] is not None and record["listing_date"] > end_int:
+            return "尚未上市"
+        if self.spot_date is None or self.spot_date < end_int:
+            return None
+        if record["delisted_date"] is not None and record["delisted_date"] <= start_int:
+            return "已退市"
+        if record["suspended_since"] is not None and record["suspended_since"] <= start_int:
+            return "停牌中"
+        return None
@@ -0,0 +1,9 @@
+"""
+测试公共配置
+"""
+
+import os
+import sys
+
+# 添加src目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -0,0 +1,64 @@
+"""
+数据源后端测试
+"""
+
+import pandas as pd
+import pytest
+import requests
+
+from data_source import (
+    DataSource, DataSourceError, FixtureNotFoundError, ReplayDataSource, TransientDataSourceError,
+)
+from metrics import MetricsRegistry
+
+
+class FailingDataSource(DataSource):
+    """前 failures 次调用抛出指定异常，之后返回一行数据"""
+
+    def __init__(self, error, failures=1, **options):
+        super().__init__(retry_delay=0, metrics=MetricsRegistry(), **options)
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+
+    def _call(self, func_name, kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return pd.DataFrame({"a": [1]})
+
+
+@pytest.mark.parametrize("error", [
+    TransientDataSourceError("注入错误"),
+    ConnectionResetError("reset"),
+    TimeoutError("timeout"),
+    requests.ConnectionError("refused"),
+    requests.Timeout("read timeout"),
+])
+def test_transient_errors_are_retried(error):
+    source = FailingDataSource(error, failures=2, max_retries=2)
+    assert len(source.fetch("stock_zh_a_hist")) == 1
+    assert source.calls == 3
+    assert source.metrics.counter("upstream_retries_total", endpoint="stock_zh_a_hist") == 2
+
+
+@pytest.mark.parametrize("error", [
+    ImportError("No module named 'akshare'"),
+    TypeError("unexpected keyword argument"),
+    DataSourceError("akshare 中不存在接口 foo"),
+    FixtureNotFoundError("未找到录制数据"),
+])
+def test_permanent_errors_are_not_retried(error):
+    source = FailingDataSource(error, max_retries=3)
+    with pytest.raises(type(error)):
+        source.fetch("stock_zh_a_hist")
+    assert source.calls == 1
+    assert source.metrics.counter("upstream_calls_total", endpoint="stock_zh_a_hist", status="error") == 1
+
+
+def test_replay_injected_errors_are_retried(tmp_path):
+    source = ReplayDataSource(root=str(tmp_path), error_rate=1.0, max_retries=2, retry_delay=0,
+                              metrics=MetricsRegistry())
+    with pytest.raises(TransientDataSourceError):
+        source.fetch("stock_zh_a_hist", symbol="600000")
+    assert source.metrics.counter("upstream_retries_total", endpoint="stock_zh_a_hist") == 2
@@ -0,0 +1,109 @@
+"""
+共享HTTP连接池测试，使用本机的模拟上游服务
+"""
+
+import gzip
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+import requests
+import requests.api
+
+from data_source import AkshareDataSource
+from http_pool import get_http_pool, install_http_pool, uninstall_http_pool
+from metrics import MetricsRegistry
+
+PAYLOAD = b'{"rc": 0, "data": {"klines": ["2023-01-03,10.00,10.10,10.20,9.90,1000"]}}'
+
+
+class StubServer:
+    """模拟上游接口的本地HTTP服务，统计TCP连接数"""
+
+    def __init__(self):
+        self.connections = 0
+        self.encodings = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                stub.connections += 1
+
+            def do_GET(self):
+                stub.encodings.append(self.headers.get("Accept-Encoding", ""))
+                body = gzip.compress(PAYLOAD)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/qt/stock/kline/get"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def server():
+    with StubServer() as stub:
+        yield stub
+    uninstall_http_pool()
+
+
+def test_installed_pool_reuses_connections(server):
+    original = requests.api.request
+    registry = MetricsRegistry()
+    install_http_pool(pool_maxsize=4, metrics=registry)
+    for i in range(20):
+        response = requests.get(server.url, params={"secid": f"0.{i:06d}"}, timeout=10)
+        assert response.json()["rc"] == 0
+
+    assert server.connections == 1
+    assert all("gzip" in e for e in server.encodings)
+    assert registry.counter("http_requests_total", host="127.0.0.1") == 20
+    assert registry.counter("http_connections_opened_total", host="127.0.0.1") == 1
+    assert registry.connection_reuse_rate() == pytest.approx(0.95)
+
+    uninstall_http_pool()
+    assert requests.api.request is original
+    requests.get(server.url, timeout=10)
+    assert server.connections == 2
+
+
+def test_akshare_source_pool_is_opt_in(server, monkeypatch):
+    """akshare的请求只有在 http_pool=True 时才经过共享连接池"""
+    def stock_zh_a_hist(symbol):
+        return pd.DataFrame(requests.get(server.url, params={"secid": symbol}, timeout=10).json()["data"])
+
+    monkeypatch.setitem(sys.modules, "akshare", types.SimpleNamespace(stock_zh_a_hist=stock_zh_a_hist))
+
+    source = AkshareDataSource(metrics=MetricsRegistry())
+    for _ in range(3):
+        source.fetch("stock_zh_a_hist", symbol="600000")
+    assert get_http_pool() is None
+    assert server.connections == 3
+
+    source = AkshareDataSource(http_pool=True, metrics=MetricsRegistry())
+    for _ in range(3):
+        assert len(source.fetch("stock_zh_a_hist", symbol="600000")) == 1
+    assert get_http_pool() is not None
+    assert server.connections == 4
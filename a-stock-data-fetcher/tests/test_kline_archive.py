@@ -0,0 +1,88 @@
+"""
+K线归档文件读写测试
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kline_archive import KlineArchive, KlineArchiveWriter
+
+
+def make_kline(symbol: str, rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = (10 + rng.normal(0, 0.2, rows).cumsum()).round(2)
+    return pd.DataFrame({
+        "日期": pd.bdate_range("2020-01-01", periods=rows).strftime("%Y-%m-%d"),
+        "股票代码": symbol,
+        "开盘": close,
+        "收盘": close,
+        "最高": (close + 0.05).round(2),
+        "最低": (close - 0.05).round(2),
+        "成交量": rng.integers(1000, 100000, rows),
+        "换手率": rng.uniform(0, 5, rows),
+    })
+
+
+def write_archive(path, frames, block_rows=64):
+    with KlineArchiveWriter(str(path), block_rows=block_rows) as writer:
+        for symbol, df in frames.items():
+            writer.write(symbol, df)
+
+
+def test_round_trip(tmp_path):
+    frames = {"600000": make_kline("600000", 300, 1), "000001": make_kline("000001", 150, 2)}
+    path = tmp_path / "kline.stka"
+    write_archive(path, frames)
+
+    with KlineArchive(str(path)) as archive:
+        assert archive.symbols() == ["000001", "600000"]
+        assert archive.date_range("000001") == (20200101, 20200728)
+        for symbol, df in frames.items():
+            pd.testing.assert_frame_equal(archive.read(symbol), df)
+
+
+def test_mixed_dtypes_and_nan(tmp_path):
+    """后写入的股票列类型不同、含NaN时按各自的类型无损还原"""
+    first = make_kline("600000", 100, 1)
+    second = make_kline("000001", 100, 2)
+    second["成交量"] = second["成交量"].astype(np.float64)
+    second.loc[3, "成交量"] = np.nan
+    second.loc[4, "成交量"] = 1234.5
+    second.loc[5, "收盘"] = np.nan
+    second.loc[6, "换手率"] = -0.0
+    second.loc[7, "最高"] = np.inf
+    path = tmp_path / "kline.stka"
+    write_archive(path, {"600000": first, "000001": second})
+
+    with KlineArchive(str(path)) as archive:
+        pd.testing.assert_frame_equal(archive.read("600000"), first)
+        result = archive.read("000001")
+    pd.testing.assert_frame_equal(result, second)
+    assert np.signbit(result.loc[6, "换手率"])
+
+
+def test_range_read_only_touches_overlapping_blocks(tmp_path):
+    df = make_kline("600000", 640, 3)
+    path = tmp_path / "kline.stka"
+    write_archive(path, {"600000": df}, block_rows=64)
+
+    with KlineArchive(str(path)) as archive:
+        result = archive.read("600000", "20200301", "20200331")
+        expected = df[(df["日期"] >= "2020-03-01") & (df["日期"] <= "2020-03-31")].reset_index(drop=True)
+        pd.testing.assert_frame_equal(result, expected)
+        assert archive.bytes_read < path.stat().st_size / 4
+
+        before = archive.bytes_read
+        assert archive.read("600000", "20300101", "20300131").empty
+        assert archive.read("999999").empty
+        assert archive.bytes_read == before
+
+
+def test_schema_mismatch_raises(tmp_path):
+    first = make_kline("600000", 10)
+    second = make_kline("000001", 10).drop(columns=["换手率"]).assign(市盈率=1.0)
+    with KlineArchiveWriter(str(tmp_path / "kline.stka")) as writer:
+        writer.write("600000", first)
+        with pytest.raises(ValueError, match="换手率"):
+            writer.write("000001", second)
@@ -0,0 +1,105 @@
+"""
+K线校验与修复测试
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_source import ReplayDataSource, save_fixture
+from kline_validation import NON_POSITIVE_PRICE, repair_kline, validate_kline
+from metrics import MetricsRegistry
+from trading_calendar import TradingCalendar
+
+
+def make_calendar(tmp_path):
+    save_fixture(str(tmp_path), "tool_trade_date_hist_sina", {},
+                 pd.DataFrame({"trade_date": pd.bdate_range("2023-01-02", "2023-12-29")}))
+    return TradingCalendar(ReplayDataSource(root=str(tmp_path), metrics=MetricsRegistry()))
+
+
+def kline(dates):
+    n = len(dates)
+    return pd.DataFrame({"日期": pd.DatetimeIndex(dates).strftime("%Y-%m-%d"), "开盘": np.full(n, 10.0),
+                         "收盘": np.full(n, 10.2), "最高": np.full(n, 10.5), "最低": np.full(n, 9.8),
+                         "成交量": np.full(n, 1000)})
+
+
+class Refetch:
+    """记录重新请求的区间，按给定的完整K线返回区间内的数据"""
+
+    def __init__(self, full=None):
+        self.full = full
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((int(start), int(end)))
+        if self.full is None:
+            return pd.DataFrame()
+        dates = self.full["日期"].str.replace("-", "").astype(int)
+        return self.full[(dates >= int(start)) & (dates <= int(end))]
+
+
+def test_flags_invalid_rows():
+    df = kline(pd.bdate_range("2023-01-02", periods=5))
+    df.loc[2, "收盘"] = 0
+    result = validate_kline(df)
+    assert result.flags[2] & NON_POSITIVE_PRICE
+    assert result.counts() == {"价格非正": 1, "开盘收盘价超出最高最低价": 1}
+
+
+def test_gap_is_refetched_and_filled(tmp_path):
+    days = pd.bdate_range("2023-03-01", "2023-03-31")
+    full = kline(days)
+    refetch = Refetch(full)
+    result = repair_kline(full.drop(index=[5, 6]), refetch, make_calendar(tmp_path))
+    assert refetch.calls == [(20230308, 20230309)]
+    pd.testing.assert_frame_equal(result.frame, full)
+    assert result.unfilled_gaps == []
+
+
+def test_unfilled_gap_is_reported_and_skipped_next_time(tmp_path):
+    calendar = make_calendar(tmp_path)
+    df = kline(pd.bdate_range("2023-03-01", "2023-03-31")).drop(index=[5, 6]).reset_index(drop=True)
+    refetch = Refetch()
+    first = repair_kline(df, refetch, calendar)
+    assert first.unfilled_gaps == [(20230308, 20230309)]
+    assert len(first.frame) == len(df)
+
+    refetch = Refetch()
+    second = repair_kline(df, refetch, calendar, known_gaps=first.unfilled_gaps)
+    assert refetch.calls == []
+    assert second.report["known_gaps"] == 1
+
+
+def test_failed_refetch_is_not_reported_as_unfilled(tmp_path):
+    df = kline(pd.bdate_range("2023-03-01", "2023-03-31")).drop(index=[5, 6]).reset_index(drop=True)
+
+    def refetch(start, end):
+        raise ConnectionError("reset")
+
+    result = repair_kline(df, refetch, make_calendar(tmp_path))
+    assert result.unfilled_gaps == []
+    assert result.report["failed_ranges"] == 1
+    assert len(result.frame) == len(df)
+
+
+def test_known_bad_dates_are_not_refetched():
+    df = kline(pd.bdate_range("2023-03-01", periods=10))
+    df.loc[3, "最低"] = 20.0
+    refetch = Refetch()
+    result = repair_kline(df, refetch, known_bad_dates=pd.Series(["2023-03-06"]))
+    assert refetch.calls == []
+    assert result.quarantined["日期"].tolist() == ["2023-03-06"]
+    assert len(result.frame) == 9
+
+
+def test_many_ranges_are_not_merged_into_one(tmp_path):
+    days = pd.bdate_range("2023-01-02", "2023-12-29")
+    full = kline(days)
+    missing = [10, 40, 80, 120, 160, 200, 240]
+    refetch = Refetch()
+    result = repair_kline(full.drop(index=missing), refetch, make_calendar(tmp_path), max_ranges=5)
+    assert len(refetch.calls) == 5
+    assert all(start == end for start, end in refetch.calls)
+    assert refetch.calls[-1][0] == int(days[240].strftime("%Y%m%d"))
+    assert result.report["deferred_ranges"] == 2
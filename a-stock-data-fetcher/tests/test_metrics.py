@@ -0,0 +1,19 @@
+"""
+运行指标测试
+"""
+
+from metrics import MetricsRegistry, format_value
+
+
+def test_prometheus_export_keeps_large_counters_exact():
+    metrics = MetricsRegistry()
+    metrics.record_call("stock_zh_a_hist", 0.1, rows=1234567, nbytes=987654321)
+    text = metrics.to_prometheus()
+    assert 'stma_upstream_bytes_total{endpoint="stock_zh_a_hist"} 987654321\n' in text
+    assert 'stma_upstream_rows_total{endpoint="stock_zh_a_hist"} 1234567\n' in text
+
+
+def test_format_value():
+    assert format_value(3.0) == "3"
+    assert format_value(12345678901) == "12345678901"
+    assert format_value(0.1234567891) == "0.1234567891"
@@ -0,0 +1,70 @@
+"""
+查询服务测试
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pandas as pd
+
+from data_source import DataSource, DataSourceError
+from local_store import LocalStore
+from metrics import MetricsRegistry
+from query_service import QueryService
+
+
+class KlineDataSource(DataSource):
+    """记录 stock_zh_a_hist 的请求参数，其他接口一律失败"""
+
+    def __init__(self):
+        super().__init__(retry_delay=0, max_retries=0, metrics=MetricsRegistry())
+        self.requests = []
+
+    def _call(self, func_name, kwargs):
+        if func_name != "stock_zh_a_hist":
+            raise DataSourceError(f"未提供接口: {func_name}")
+        self.requests.append(kwargs)
+        return pd.DataFrame({
+            "日期": ["2023-01-03", "2023-01-04"],
+            "收盘": [10.0, 10.5],
+        })
+
+
+def test_upstream_kline_dates_are_normalized(tmp_path):
+    source = KlineDataSource()
+    service = QueryService(LocalStore(str(tmp_path)), data_source=source, metrics=MetricsRegistry())
+
+    df = asyncio.run(service.kline("600000", "2023-01-01", "2023-01-31"))
+
+    assert len(df) == 2
+    assert [(r["start_date"], r["end_date"]) for r in source.requests] == [("20230101", "20230131")]
+
+
+def test_query_service_does_not_load_refresh():
+    # 查询服务只需要板块类型映射，不应为此加载批量刷新和校验模块
+    src = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+    code = "import sys, query_service; print('refresh' in sys.modules, 'kline_validation' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=src, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_parsing_and_serialization_run_off_the_event_loop(tmp_path):
+    store = LocalStore(str(tmp_path))
+    store.write("kline", "600000", pd.DataFrame({"日期": ["2023-01-03", "2023-01-04"], "收盘": [10.0, 10.5]}))
+    store.write("profile", "600000", pd.DataFrame({"item": ["股票代码"], "value": ["600000"]}))
+    service = QueryService(store, upstream=False, metrics=MetricsRegistry())
+
+    async def run():
+        _, thread = await service._read("profile", "600000", lambda df: threading.current_thread().name)
+        status, body = await service.dispatch("GET", "/kline/600000?start=20230104")
+        return thread, status, json.loads(body)
+
+    thread, status, body = asyncio.run(run())
+    service.close()
+    assert thread.startswith("query-io")
+    assert status == 200
+    assert body == {"rows": 1, "data": [{"日期": "2023-01-04", "收盘": 10.5}]}
@@ -0,0 +1,143 @@
+"""
+批量刷新任务测试
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from data_source import ReplayDataSource, save_fixture
+from local_store import LocalStore
+from metrics import MetricsRegistry
+import refresh
+from refresh import KLINE_GAPS_DATASET, Checkpoint, RefreshJob
+from trading_calendar import TradingCalendar
+
+
+def kline(dates):
+    n = len(dates)
+    return pd.DataFrame({"日期": dates, "开盘": [10.0] * n, "收盘": [10.0] * n, "最高": [10.5] * n,
+                         "最低": [9.5] * n, "成交量": [1000] * n})
+
+
+def make_job(tmp_path, adjust="hfq", error_rate=0.0, **options):
+    source = ReplayDataSource(root=str(tmp_path / "fixtures"), error_rate=error_rate, retry_delay=0,
+                              metrics=MetricsRegistry())
+    store = LocalStore(str(tmp_path / "store"))
+    job = RefreshJob(store, source, ["kline"], "20240101", "20240110", adjust, **options)
+    return job, store, source
+
+
+def save_kline(source, start, end, df, adjust="hfq"):
+    save_fixture(source.root, "stock_zh_a_hist", dict(symbol="600000", period="daily", start_date=start,
+                                                      end_date=end, adjust=adjust), df)
+
+
+def test_incremental_fetch_without_new_bars_is_noop(tmp_path):
+    job, store, source = make_job(tmp_path)
+    existing = kline(["2024-01-02", "2024-01-03"])
+    store.write("kline", "600000", existing)
+    save_kline(source, "20240104", "20240110", kline([]))
+
+    assert job._kline_task("600000") == 0
+    pd.testing.assert_frame_equal(store.read("kline", "600000"), existing)
+
+
+def test_failed_incremental_fetch_is_not_marked_done(tmp_path):
+    job, store, source = make_job(tmp_path, error_rate=1.0)
+    store.write("kline", "600000", kline(["2024-01-02", "2024-01-03"]))
+    save_kline(source, "20240104", "20240110", kline(["2024-01-04"]))
+    checkpoint = Checkpoint(str(tmp_path / "store" / "_checkpoints" / "test.log"))
+
+    summary = job.run(job.build_tasks(["600000"]), checkpoint, workers=1)
+    checkpoint.close()
+
+    assert (summary["done"], summary["failed"]) == (0, 1)
+    assert not checkpoint.is_done("kline:600000")
+
+
+def test_full_fetch_without_bars_fails(tmp_path):
+    job, store, source = make_job(tmp_path)
+    save_kline(source, "20240101", "20240110", kline([]))
+    with pytest.raises(RuntimeError):
+        job._kline_task("600000")
+
+
+def with_calendar(job, source):
+    save_fixture(source.root, "tool_trade_date_hist_sina", {},
+                 pd.DataFrame({"trade_date": pd.bdate_range("2024-01-01", "2024-12-31")}))
+    job.history.calendar = TradingCalendar(source)
+
+
+def refetches(source, status):
+    return source.metrics.counter("upstream_calls_total", endpoint="stock_zh_a_hist", status=status)
+
+
+def test_unfilled_gap_is_remembered_between_runs(tmp_path):
+    job, store, source = make_job(tmp_path, adjust="qfq")
+    with_calendar(job, source)
+    save_kline(source, "20240104", "20240105", kline([]), adjust="qfq")
+    df = kline(["2024-01-02", "2024-01-03", "2024-01-08", "2024-01-09"])
+
+    job._validate_kline("600000", df)
+    assert refetches(source, "ok") == 1
+    assert store.read(KLINE_GAPS_DATASET, "600000").values.tolist() == [[20240104, 20240105]]
+
+    job._validate_kline("600000", df)
+    assert refetches(source, "ok") == 1
+
+
+def test_failed_gap_refetch_is_retried_next_run(tmp_path):
+    job, store, source = make_job(tmp_path, adjust="qfq")
+    with_calendar(job, source)
+    df = kline(["2024-01-02", "2024-01-03", "2024-01-08", "2024-01-09"])
+
+    # 没有录制该区间，重新请求失败
+    job._validate_kline("600000", df)
+    assert refetches(source, "error") == 1
+    assert store.read(KLINE_GAPS_DATASET, "600000") is None
+
+    job._validate_kline("600000", df)
+    assert refetches(source, "error") == 2
+
+
+def test_interrupted_run_resumes_after_midnight(tmp_path, monkeypatch):
+    fixtures, store_dir = str(tmp_path / "fixtures"), str(tmp_path / "store")
+    symbols_file = tmp_path / "symbols.txt"
+    symbols_file.write_text("600000\n600001\n", encoding="utf-8")
+    argv = ["--universe", "file", "--symbols-file", str(symbols_file), "--source", "replay",
+            "--replay-dir", fixtures, "--store", store_dir, "--start-date", "20240101",
+            "--max-retries", "0", "--no-calendar", "--no-validate"]
+
+    def save(symbol):
+        return save_fixture(fixtures, "stock_zh_a_hist", dict(symbol=symbol, period="daily", start_date="20240101",
+                                                              end_date="20240110", adjust="qfq"),
+                            kline(["2024-01-09", "2024-01-10"]))
+
+    # 第一次运行：600001 没有录制数据，任务失败，断点保留
+    monkeypatch.setattr(refresh, "_today", lambda: "20240110")
+    first = save("600000")
+    assert refresh.main(argv) == 1
+    assert len(os.listdir(os.path.join(store_dir, "_checkpoints"))) == 1
+
+    # 过了零点续跑：沿用断点中的结束日期，已完成的 600000 不再请求（其录制数据已删除）
+    monkeypatch.setattr(refresh, "_today", lambda: "20240111")
+    os.remove(first)
+    save("600001")
+    assert refresh.main(argv) == 0
+    assert LocalStore(store_dir).read("kline", "600001") is not None
+    # 全部完成后删除断点
+    assert os.listdir(os.path.join(store_dir, "_checkpoints")) == []
+
+
+def test_skip_and_validation_counters_use_the_injected_registry(tmp_path):
+    job, store, source = make_job(tmp_path, adjust="qfq")
+    with_calendar(job, source)
+    assert not job.history.can_have_data("600000", "20240106", "20240107")
+    assert source.metrics.counter("upstream_skipped_total", endpoint="stock_zh_a_hist",
+                                  reason="区间内没有交易日") == 1
+
+    df = kline(["2024-01-02", "2024-01-03", "2024-01-03"])
+    job._validate_kline("600000", df)
+    assert source.metrics.counter("validation_rows_total", dataset="kline", outcome="duplicates") == 1
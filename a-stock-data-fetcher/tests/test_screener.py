@@ -0,0 +1,115 @@
+"""
+全市场选股测试
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from local_store import LocalStore
+from screener import _latest_indicator, build_panel, evaluate, parse_expression, screen
+
+
+@pytest.mark.parametrize("expression", [
+    "close.real > 0",
+    "close[0] > 0",
+    "__import__('os')",
+    "open('x')",
+    "(lambda: 1)()",
+    "abs(x=close)",
+    "min(*[close, pe])",
+    "'a' < 'b'",
+])
+def test_parse_rejects_unsupported_syntax(expression):
+    with pytest.raises(ValueError):
+        parse_expression(expression)
+
+
+@pytest.mark.parametrize("expression", ["min(close)", "max(close, pe, pb)", "abs()", "abs > 1", "foo > 1"])
+def test_parse_rejects_bad_calls_and_names(expression):
+    with pytest.raises(ValueError):
+        parse_expression(expression)
+
+
+def test_parse_collects_feature_names():
+    _, names = parse_expression("close > ma60 and min(pe, pb) < 30 or not ret20 > 0")
+    assert names == {"close", "ma60", "pe", "pb", "ret20"}
+
+
+def test_evaluate_chained_comparison_with_nan():
+    tree, _ = parse_expression("0 < pe < 30 and not close > 100")
+    features = {
+        "pe": np.array([np.nan, 10.0, 40.0, 20.0, -5.0]),
+        "close": np.array([10.0, 10.0, 10.0, 200.0, 10.0]),
+    }
+    assert evaluate(tree, features).tolist() == [False, True, False, False, False]
+
+
+def test_evaluate_arithmetic_propagates_nan():
+    tree, _ = parse_expression("sqrt(pe) + max(pb, 1) * 2")
+    result = evaluate(tree, {"pe": np.array([4.0, np.nan, -1.0]), "pb": np.array([0.5, 3.0, 2.0])})
+    assert result[0] == 4.0
+    assert np.isnan(result[1]) and np.isnan(result[2])
+
+
+@pytest.fixture
+def panel_dir(tmp_path):
+    store = LocalStore(str(tmp_path / "store"))
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2023-01-02", periods=80).strftime("%Y-%m-%d")
+    symbols = [f"{600000 + i:06d}" for i in range(12)]
+    for i, symbol in enumerate(symbols):
+        # 最后一只股票K线不足，窗口指标为NaN
+        n = 10 if i == len(symbols) - 1 else len(dates)
+        close = 10 * np.exp(np.cumsum(rng.normal(0.001, 0.02, n)))
+        store.write("kline", symbol, pd.DataFrame({
+            "日期": dates[:n], "开盘": close, "收盘": close, "最高": close * 1.01, "最低": close * 0.99,
+            "成交量": rng.integers(1000, 5000, n), "成交额": close * 1000,
+        }))
+    store.write("spot", "latest", pd.DataFrame({
+        "代码": symbols,
+        "市盈率-动态": rng.uniform(-10, 60, len(symbols)),
+        "市净率": rng.uniform(0.5, 5, len(symbols)),
+    }))
+    # 前两只股票有本地财务指标
+    store.write("financial_indicators", symbols[0], pd.DataFrame({
+        "报告期": ["2023-06-30", "2023-09-30", "2023-03-31"], "净资产收益率": [8.0, 12.5, 4.0],
+    }))
+    store.write("financial_indicators", symbols[1], pd.DataFrame({
+        "选项": ["常用指标", "常用指标"], "指标": ["归母净利润", "净资产收益率(ROE)"],
+        "20230930": [1e8, np.nan], "20230630": [9e7, 7.5],
+    }))
+    path = str(tmp_path / "panel")
+    build_panel(store, path)
+    return path
+
+
+def test_screen_is_the_same_with_one_or_many_workers(panel_dir):
+    options = dict(filter_expr="close > ma20 * 0.9 and pe > 0", score_expr="ret20 - vol20",
+                   columns=["close", "ma20", "pe"])
+    single = screen(panel_dir, workers=1, **options)
+    multi = screen(panel_dir, workers=3, partitions_per_worker=2, **options)
+    assert len(single) > 0
+    pd.testing.assert_frame_equal(single, multi)
+
+
+def test_screen_validates_before_dispatch(panel_dir):
+    with pytest.raises(ValueError):
+        screen(panel_dir, filter_expr="min(close) > 0", workers=2)
+    with pytest.raises(ValueError):
+        screen(panel_dir, columns=["close.real"], workers=1)
+
+
+def test_latest_indicator_formats():
+    long = pd.DataFrame({"报告期": ["2023-12-31", "2024-03-31"], "净资产收益率": ["10.5%", "3.2%"]})
+    assert _latest_indicator(long, "净资产收益率") == 3.2
+    assert np.isnan(_latest_indicator(pd.DataFrame({"a": [1]}), "净资产收益率"))
+
+
+def test_roe_comes_from_financial_indicators(panel_dir):
+    result = screen(panel_dir, columns=["roe", "pe", "pb"], workers=1)
+    assert result["roe"].iloc[:2].tolist() == [12.5, 7.5]
+    # 没有财务指标的股票按 PB/PE 估算
+    rest = result.iloc[2:]
+    estimate = np.where(rest["pe"] > 0, rest["pb"] / rest["pe"] * 100, np.nan)
+    np.testing.assert_allclose(rest["roe"].to_numpy(), estimate)
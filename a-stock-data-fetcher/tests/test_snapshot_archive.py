@@ -0,0 +1,88 @@
+"""
+行情快照归档测试
+"""
+
+import numpy as np
+import pandas as pd
+
+import snapshot_archive
+from snapshot_archive import SnapshotArchive
+
+
+def make_spot(codes, price, volume=None):
+    n = len(codes)
+    return pd.DataFrame({
+        "序号": np.arange(1, n + 1),
+        "代码": codes,
+        "名称": [f"股票{c}" for c in codes],
+        "最新价": price,
+        "成交量": volume if volume is not None else np.arange(n, dtype=np.float64) * 100,
+    })
+
+
+def snapshots():
+    """依次包含新增、更新、删除和NaN的一组快照"""
+    first = make_spot(["000001", "000002", "600000"], [10.0, 20.0, 30.0])
+    second = make_spot(["000001", "000002", "600000", "830001"], [10.5, 20.0, 30.0, 5.0])
+    third = make_spot(["000001", "600000", "830001"], [10.5, np.nan, 5.0], [0.0, np.nan, 300.0])
+    fourth = make_spot(["000001", "000003", "600000", "830001"], [11.0, 7.0, 31.0, 5.0])
+    return [first, second, third, fourth]
+
+
+def expected(df):
+    return df.drop(columns=["序号"]).sort_values("代码").reset_index(drop=True)
+
+
+def test_as_of_round_trip(tmp_path):
+    times = pd.date_range("2024-01-02 09:30", periods=4, freq="5min")
+    archive = SnapshotArchive(str(tmp_path), "spot", drop_columns=("序号",))
+    for ts, df in zip(times, snapshots()):
+        assert archive.append(df, ts) is not None
+    assert [e["kind"] for e in archive.entries] == ["base", "delta", "delta", "delta"]
+    assert archive.entries[2]["deletes"] == ["000002"]
+
+    # 新对象从磁盘还原，按乱序时刻查询
+    reopened = SnapshotArchive(str(tmp_path), "spot", drop_columns=("序号",))
+    for i in (3, 0, 2, 1):
+        pd.testing.assert_frame_equal(reopened.as_of(times[i] + pd.Timedelta(seconds=1)),
+                                      expected(snapshots()[i]))
+    assert reopened.as_of(times[0] - pd.Timedelta(seconds=1)).empty
+    replayed = [table for _, table in reopened.replay()]
+    for table, df in zip(replayed, snapshots()):
+        pd.testing.assert_frame_equal(table, expected(df))
+
+
+def test_unchanged_snapshot_is_skipped(tmp_path):
+    archive = SnapshotArchive(str(tmp_path), "spot", drop_columns=("序号",))
+    df = snapshots()[0]
+    archive.append(df, "2024-01-02 09:30")
+    # 只有排名列变化
+    assert archive.append(df.assign(序号=df["序号"][::-1].to_numpy()), "2024-01-02 09:35") is None
+
+
+def test_new_archive_object_does_not_replay_deltas(tmp_path, monkeypatch):
+    """定时任务每次新建归档对象时，从最新状态文件继续，不重新读取基准快照和增量"""
+    times = pd.date_range("2024-01-02 09:30", periods=4, freq="5min")
+    for ts, df in zip(times[:3], snapshots()[:3]):
+        SnapshotArchive(str(tmp_path), "spot", drop_columns=("序号",)).append(df, ts)
+
+    reads = []
+    original = SnapshotArchive._read
+    monkeypatch.setattr(SnapshotArchive, "_read", lambda self, name: reads.append(name) or original(self, name))
+    archive = SnapshotArchive(str(tmp_path), "spot", drop_columns=("序号",))
+    archive.append(snapshots()[3], times[3])
+    assert reads == [snapshot_archive.LATEST_FILE]
+    pd.testing.assert_frame_equal(archive.as_of(times[3]), expected(snapshots()[3]))
+
+
+def test_stale_latest_file_is_ignored(tmp_path):
+    times = pd.date_range("2024-01-02 09:30", periods=3, freq="5min")
+    archive = SnapshotArchive(str(tmp_path), "spot", drop_columns=("序号",))
+    for ts, df in zip(times[:2], snapshots()[:2]):
+        archive.append(df, ts)
+    # 模拟写完最新状态、写归档记录前中断：最新状态文件的序号超前于归档记录
+    archive._write({"seq": 5, "state": None, "hashes": None}, snapshot_archive.LATEST_FILE)
+
+    reopened = SnapshotArchive(str(tmp_path), "spot", drop_columns=("序号",))
+    reopened.append(snapshots()[2], times[2])
+    pd.testing.assert_frame_equal(reopened.as_of(times[2]), expected(snapshots()[2]))
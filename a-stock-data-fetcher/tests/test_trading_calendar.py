@@ -0,0 +1,72 @@
+"""
+交易日历与K线请求跳过逻辑测试
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from data_source import ReplayDataSource, save_fixture
+from metrics import MetricsRegistry
+from stock_history import StockHistoryFetcher
+from trading_calendar import SymbolStatusIndex, TradingCalendar
+
+
+def make_source(root, with_calendar=True):
+    if with_calendar:
+        save_fixture(str(root), "tool_trade_date_hist_sina", {},
+                     pd.DataFrame({"trade_date": pd.bdate_range("2024-01-01", "2024-12-31")}))
+    kwargs = dict(symbol="600000", period="daily", start_date="20240102", end_date="20240105", adjust="qfq")
+    save_fixture(str(root), "stock_zh_a_hist", kwargs, pd.DataFrame({"日期": ["2024-01-02"], "收盘": [1.0]}))
+    return ReplayDataSource(root=str(root), metrics=MetricsRegistry())
+
+
+def test_skips_range_without_trading_days(tmp_path):
+    source = make_source(tmp_path)
+    fetcher = StockHistoryFetcher(source, TradingCalendar(source))
+    assert fetcher.get_daily_kline("600000", "20240106", "20240107").empty
+    assert source.metrics.counter("upstream_calls_total", endpoint="stock_zh_a_hist", status="error") == 0
+    assert len(fetcher.get_daily_kline("600000", "20240102", "20240105")) == 1
+
+
+def test_calendar_failure_fails_open_and_is_remembered(tmp_path):
+    source = make_source(tmp_path, with_calendar=False)
+    calendar = TradingCalendar(source, cache_path=str(tmp_path / "calendar.json"))
+    fetcher = StockHistoryFetcher(source, calendar)
+
+    for _ in range(3):
+        df = fetcher.get_daily_kline("600000", "20240102", "20240105")
+        assert len(df) == 1
+    assert not calendar.available
+    assert source.metrics.counter(
+        "upstream_calls_total", endpoint="tool_trade_date_hist_sina", status="error") == 1
+
+
+def test_suspension_is_only_trusted_while_fresh(tmp_path):
+    path = str(tmp_path / "symbol_status.json")
+    index = SymbolStatusIndex(path)
+    spot = pd.DataFrame({"代码": ["600000", "000001", "000002"], "最新价": [np.nan, 10.0, 11.0]})
+    index.update_from_spot(spot, as_of="20240102")
+    assert index.skip_reason("600000", "20240102", "20240102") == "停牌中"
+    assert index.skip_reason("000001", "20240102", "20240102") is None
+    index.save()
+
+    # 之后没有再用行情表更新（如只刷新板块或文件中的股票），停牌状态不再可信
+    reloaded = SymbolStatusIndex(path)
+    assert reloaded.spot_date == 20240102
+    assert reloaded.skip_reason("600000", "20240103", "20240110") is None
+
+    reloaded.update_from_spot(spot.assign(最新价=[9.0, 10.0, 11.0]), as_of="20240110")
+    assert reloaded.skip_reason("600000", "20240103", "20240110") is None
+    assert reloaded.records["600000"]["suspended_since"] is None
+
+
+def test_status_index_old_format_is_treated_as_unknown(tmp_path):
+    path = tmp_path / "symbol_status.json"
+    path.write_text(json.dumps({"600000": {"listing_date": 20300101, "suspended_since": 20240102,
+                                           "delisted_date": None}}), encoding="utf-8")
+    index = SymbolStatusIndex(str(path))
+    assert index.skip_reason("600000", "20240103", "20240110") == "尚未上市"
+    index.records["600000"]["listing_date"] = None
+    assert index.skip_reason("600000", "20240103", "20240110") is None
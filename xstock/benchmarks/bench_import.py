@@ -0,0 +1,148 @@
+"""
+导入耗时基准测试
+在全新的子进程中测量 `from xstock import StockInfo` 以及只读缓存的搜索路径的耗时，
+并检查整个过程中没有导入 akshare
+
+用法:
+    python bench_import.py
+    python bench_import.py --runs 20 --budget-ms 800 --output import.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# 只导入 StockInfo
+IMPORT_SNIPPET = """
+import sys, time
+t0 = time.perf_counter()
+from xstock import StockInfo
+elapsed = time.perf_counter() - t0
+print(elapsed, "akshare" in sys.modules)
+"""
+
+# 导入后通过本地缓存完成一次搜索
+CACHED_SEARCH_SNIPPET = """
+import sys, time
+t0 = time.perf_counter()
+from xstock import StockInfo
+StockInfo(cache_dir=sys.argv[1], cache_ttl=None).search_stock("银行")
+elapsed = time.perf_counter() - t0
+print(elapsed, "akshare" in sys.modules)
+"""
+
+
+def _run_snippet(snippet: str, args: List[str]) -> Dict:
+    """在新的解释器中运行代码片段，返回耗时和是否导入了akshare"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.check_output(
+        [sys.executable, "-c", snippet] + args,
+        env=env,
+        text=True
+    )
+    elapsed, akshare_loaded = out.split()
+    return {"seconds": float(elapsed), "akshare_loaded": akshare_loaded == "True"}
+
+
+def _slowest_imports(snippet: str, args: List[str], top: int = 10) -> List[Dict]:
+    """使用 -X importtime 找出累计耗时最长的模块"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", snippet] + args,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # 格式: "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative_us, module = line.split("|")
+        rows.append({"module": module.strip(), "cumulative_ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def _seed_cache(cache_dir: str) -> None:
+    """写入一份A股列表缓存，供缓存搜索用例使用"""
+    import pandas as pd
+
+    sys.path.insert(0, SRC_DIR)
+    from xstock.stock_info import StockInfo
+
+    df = pd.DataFrame({
+        "代码": [f"{600000 + i:06d}" for i in range(5000)],
+        "名称": [("银行" if i % 10 == 0 else "科技") + f"{i:04d}" for i in range(5000)],
+    })
+    df.to_pickle(os.path.join(cache_dir, StockInfo.SPOT_CACHE_FILE))
+
+
+def bench(snippet: str, args: List[str], runs: int) -> Dict:
+    """
+    多次运行同一代码片段并汇总
+
+    Args:
+        snippet: 要运行的代码
+        args: 传给代码片段的命令行参数
+        runs: 运行次数
+
+    Returns:
+        包含中位数、最大值和akshare导入情况的字典
+    """
+    samples = [_run_snippet(snippet, args) for _ in range(runs)]
+    seconds = [s["seconds"] for s in samples]
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(seconds) * 1000, 2),
+        "max_ms": round(max(seconds) * 1000, 2),
+        "akshare_loaded": any(s["akshare_loaded"] for s in samples),
+        "slowest_imports": _slowest_imports(snippet, args),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """主函数，超出耗时预算或导入了akshare时返回非零退出码"""
+    parser = argparse.ArgumentParser(description="xstock 导入耗时基准测试")
+    parser.add_argument("--runs", type=int, default=10, help="每个用例的运行次数")
+    parser.add_argument("--budget-ms", type=float, default=None, help="中位数耗时预算（毫秒）")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="xstock_cache_") as cache_dir:
+        _seed_cache(cache_dir)
+        results = {
+            "import": bench(IMPORT_SNIPPET, [], args.runs),
+            "cached_search": bench(CACHED_SEARCH_SNIPPET, [cache_dir], args.runs),
+        }
+
+    failed = False
+    for name, result in results.items():
+        print(f"{name}: 中位数 {result['median_ms']} ms，最大 {result['max_ms']} ms，"
+              f"导入akshare: {result['akshare_loaded']}")
+        if result["akshare_loaded"]:
+            print(f"  失败: {name} 导入了 akshare")
+            failed = True
+        if args.budget_ms is not None and result["median_ms"] > args.budget_ms:
+            print(f"  失败: {name} 超出预算 {args.budget_ms} ms")
+            failed = True
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
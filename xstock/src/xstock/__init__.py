@@ -3,9 +3,27 @@ XStock - 股票信息获取系统
 支持获取A股的详情和交易信息
 """
 
-from .stock_info import StockInfo
-from .realtime_quote import RealtimeQuote
-from .historical_data import HistoricalData
+import importlib
 
 __version__ = "0.1.0"
 __all__ = ["StockInfo", "RealtimeQuote", "HistoricalData"]
+
+# 导出名 -> 所在子模块；子模块在第一次访问时才导入，保证 import xstock 足够快
+_LAZY_IMPORTS = {
+    "StockInfo": ".stock_info",
+    "RealtimeQuote": ".realtime_quote",
+    "HistoricalData": ".historical_data",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -2,9 +2,24 @@
 配置文件
 """
 
-# 数据源配置
+# 数据源配置，可选 "akshare"、"replay"（回放录制的数据）
 DATA_SOURCE = "akshare"
 
+# 回放数据目录
+REPLAY_DIR = "fixtures"
+
+# 回放时模拟的调用延迟（秒）
+REPLAY_LATENCY = 0.0
+
+# 回放时注入错误的概率（0~1）
+REPLAY_ERROR_RATE = 0.0
+
+# 本地缓存目录，None表示不缓存；缓存命中时不会导入akshare
+CACHE_DIR = None
+
+# 缓存有效期（秒），None表示永不过期
+CACHE_TTL = 60
+
 # 超时设置（秒）
 REQUEST_TIMEOUT = 10
 
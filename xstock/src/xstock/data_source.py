@@ -0,0 +1,165 @@
+"""
+数据源后端模块
+由 config.DATA_SOURCE 选择实际使用的后端：'akshare' 访问网络，'replay' 从磁盘读取录制的数据，
+用于离线基准测试。录制文件的格式与 a-stock-data-fetcher 的录制数据源相同，可以直接用它录制
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from .config import DATA_SOURCE, REPLAY_DIR, REPLAY_LATENCY, REPLAY_ERROR_RATE
+from .metrics import MetricsRegistry, get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DataSourceError(Exception):
+    """数据源调用失败（包括回放后端注入的错误）"""
+
+
+def fixture_path(root: str, func_name: str, kwargs: Dict[str, Any]) -> str:
+    """
+    获取一次上游调用对应的录制文件路径，按函数名分目录、文件名为函数名和参数的哈希
+
+    Args:
+        root: 录制数据根目录
+        func_name: 上游函数名，如'stock_zh_a_spot_em'
+        kwargs: 调用参数
+
+    Returns:
+        录制文件路径
+    """
+    payload = json.dumps(
+        {"func": func_name, "kwargs": kwargs},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    key = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    return os.path.join(root, func_name, key + ".pkl")
+
+
+class DataSource:
+    """数据源后端基类，StockInfo 通过 fetch 调用上游接口"""
+
+    name = "base"
+
+    def __init__(self, metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            metrics: 指标注册表，默认使用全局注册表
+        """
+        self.metrics = metrics
+
+    def fetch(self, func_name: str, **kwargs: Any) -> pd.DataFrame:
+        """
+        调用上游接口，并记录耗时、行数、字节数等指标
+
+        Args:
+            func_name: 上游函数名，与akshare中的函数名一致
+            **kwargs: 传给上游函数的参数
+
+        Returns:
+            上游返回的DataFrame
+        """
+        metrics = self.metrics or get_metrics()
+        start = time.perf_counter()
+        try:
+            df = self._call(func_name, kwargs)
+        except Exception as e:
+            metrics.record_call(func_name, time.perf_counter() - start, error=e)
+            raise
+
+        if metrics.enabled:
+            is_frame = isinstance(df, pd.DataFrame)
+            metrics.record_call(
+                func_name,
+                time.perf_counter() - start,
+                rows=len(df) if is_frame else 0,
+                nbytes=int(df.memory_usage(index=True).sum()) if is_frame else 0
+            )
+        return df
+
+    def _call(self, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+        """由子类实现的实际调用逻辑"""
+        raise NotImplementedError
+
+
+class AkshareDataSource(DataSource):
+    """直接调用akshare的在线数据源"""
+
+    name = "akshare"
+
+    def _call(self, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+        # akshare 导入耗时数秒，推迟到第一次真正访问网络时再导入
+        import akshare as ak
+
+        func = getattr(ak, func_name, None)
+        if func is None:
+            raise DataSourceError(f"akshare 中不存在接口 {func_name}")
+        return func(**kwargs)
+
+
+class ReplayDataSource(DataSource):
+    """
+    回放数据源
+    从磁盘读取录制的数据，可配置模拟延迟和错误注入，不访问网络
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        root: str,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        **options: Any
+    ):
+        """
+        Args:
+            root: 录制数据目录
+            latency: 每次调用的延迟（秒）
+            error_rate: 注入错误的概率，取值0~1
+            seed: 随机数种子，便于复现同一组错误
+            **options: 指标相关参数，见 DataSource
+        """
+        super().__init__(**options)
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError("error_rate 必须在 0 到 1 之间")
+        self.root = root
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def _call(self, func_name: str, kwargs: Dict[str, Any]) -> pd.DataFrame:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise DataSourceError(f"回放数据源注入错误: {func_name}")
+
+        path = fixture_path(self.root, func_name, kwargs)
+        if not os.path.exists(path):
+            raise DataSourceError(f"未找到录制数据: {func_name}({kwargs})")
+        return pd.read_pickle(path)
+
+
+def create_default_data_source() -> DataSource:
+    """
+    按 config 中的配置创建数据源
+
+    Returns:
+        config.DATA_SOURCE 指定的数据源实例
+    """
+    if DATA_SOURCE == "replay":
+        return ReplayDataSource(root=REPLAY_DIR, latency=REPLAY_LATENCY, error_rate=REPLAY_ERROR_RATE)
+    if DATA_SOURCE == "akshare":
+        return AkshareDataSource()
+    raise ValueError(f"不支持的数据源: {DATA_SOURCE}")
@@ -0,0 +1,171 @@
+"""
+运行指标模块
+按上游接口统计调用次数、错误次数、返回行数和字节数以及缓存命中率，
+并通过回调函数逐条导出每次调用的记录（含耗时），由调用方汇总为直方图或写入监控系统
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CallRecord(NamedTuple):
+    """一次上游调用的记录，传给回调函数"""
+
+    endpoint: str
+    seconds: float
+    rows: int
+    nbytes: int
+    error: Optional[str]
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表"""
+
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled: 是否记录指标，关闭后所有记录方法直接返回
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], int] = {}
+        self._listeners: List[Callable[[CallRecord], None]] = []
+
+    def _inc(self, name: str, value: int = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def record_call(
+        self,
+        endpoint: str,
+        seconds: float,
+        rows: int = 0,
+        nbytes: int = 0,
+        error: Optional[BaseException] = None
+    ) -> None:
+        """
+        记录一次上游调用
+
+        Args:
+            endpoint: 上游接口名，如'stock_zh_a_spot_em'
+            seconds: 调用耗时（秒）
+            rows: 返回的行数
+            nbytes: 返回数据占用的字节数
+            error: 调用失败时的异常
+        """
+        if not self.enabled:
+            return
+        status = "error" if error is not None else "ok"
+        with self._lock:
+            self._inc("upstream_calls_total", endpoint=endpoint, status=status)
+            self._inc("upstream_rows_total", rows, endpoint=endpoint)
+            self._inc("upstream_bytes_total", nbytes, endpoint=endpoint)
+            listeners = list(self._listeners)
+
+        if listeners:
+            record = CallRecord(
+                endpoint, seconds, rows, nbytes,
+                None if error is None else f"{type(error).__name__}: {error}"
+            )
+            for listener in listeners:
+                try:
+                    listener(record)
+                except Exception:
+                    logger.exception("指标回调函数执行出错")
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        """
+        记录一次缓存查询
+
+        Args:
+            cache: 缓存名称
+            hit: 是否命中
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def add_listener(self, listener: Callable[[CallRecord], None]) -> None:
+        """
+        注册回调函数，每次上游调用结束后以 CallRecord 调用
+
+        Args:
+            listener: 回调函数
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[CallRecord], None]) -> None:
+        """移除回调函数"""
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def reset(self) -> None:
+        """清空所有已记录的指标"""
+        with self._lock:
+            self._counters.clear()
+
+    def counter(self, name: str, **labels: str) -> int:
+        """
+        读取计数器的值
+
+        Args:
+            name: 计数器名，如'upstream_calls_total'
+            **labels: 标签，如 endpoint='stock_zh_a_spot_em'
+
+        Returns:
+            计数值，不存在时为0
+        """
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def cache_hit_rate(self, cache: str) -> Optional[float]:
+        """
+        计算缓存命中率
+
+        Args:
+            cache: 缓存名称
+
+        Returns:
+            命中率，没有查询记录时返回None
+        """
+        hits = self.counter("cache_requests_total", cache=cache, result="hit")
+        misses = self.counter("cache_requests_total", cache=cache, result="miss")
+        total = hits + misses
+        return hits / total if total else None
+
+    def snapshot(self) -> List[Dict]:
+        """
+        获取所有计数器的快照
+
+        Returns:
+            列表，每项为 {"name", "labels", "value"}
+        """
+        with self._lock:
+            return [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+
+
+_default_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """获取全局默认的指标注册表"""
+    return _default_registry
+
+
+def set_metrics(registry: MetricsRegistry) -> None:
+    """
+    替换全局默认的指标注册表
+
+    Args:
+        registry: 新的指标注册表
+    """
+    global _default_registry
+    _default_registry = registry
@@ -2,19 +2,71 @@
 股票基本信息获取模块
 """
 
-import akshare as ak
+import logging
+import os
+import time
+
 import pandas as pd
 from typing import Optional, Dict
-from .config import REQUEST_TIMEOUT, MAX_RETRIES
+from .config import REQUEST_TIMEOUT, MAX_RETRIES, CACHE_DIR, CACHE_TTL
+from .data_source import DataSource, create_default_data_source
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
 
 
 class StockInfo:
     """股票基本信息类"""
 
-    def __init__(self):
-        """初始化"""
+    # A股列表缓存文件名
+    SPOT_CACHE_FILE = "stock_zh_a_spot_em.pkl"
+
+    def __init__(
+        self,
+        data_source: Optional[DataSource] = None,
+        cache_dir: Optional[str] = CACHE_DIR,
+        cache_ttl: Optional[float] = CACHE_TTL
+    ):
+        """
+        初始化
+
+        Args:
+            data_source: 数据源后端，默认按 config.DATA_SOURCE 创建
+            cache_dir: A股列表的本地缓存目录，None表示不缓存
+            cache_ttl: 缓存有效期（秒），None表示永不过期
+        """
         self.timeout = REQUEST_TIMEOUT
         self.max_retries = MAX_RETRIES
+        self.data_source = data_source or create_default_data_source()
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+
+    def _load_spot_cache(self) -> Optional[pd.DataFrame]:
+        """读取未过期的A股列表缓存，不存在或已过期时返回None"""
+        if self.cache_dir is None:
+            return None
+        path = os.path.join(self.cache_dir, self.SPOT_CACHE_FILE)
+        try:
+            if self.cache_ttl is not None and time.time() - os.path.getmtime(path) > self.cache_ttl:
+                get_metrics().record_cache("spot_table", hit=False)
+                return None
+            df = pd.read_pickle(path)
+        except Exception as e:
+            logger.debug("读取A股列表缓存失败: %s", e)
+            get_metrics().record_cache("spot_table", hit=False)
+            return None
+        get_metrics().record_cache("spot_table", hit=True)
+        return df
+
+    def _save_spot_cache(self, df: pd.DataFrame) -> None:
+        """写入A股列表缓存"""
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, self.SPOT_CACHE_FILE)
+        tmp_path = path + ".tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
 
     def get_stock_info(self, symbol: str) -> Optional[Dict]:
         """
@@ -33,7 +85,7 @@ class StockInfo:
         """
         try:
             # 获取股票信息
-            stock_info_df = ak.stock_individual_info_em(symbol=symbol)
+            stock_info_df = self.data_source.fetch("stock_individual_info_em", symbol=symbol)
 
             if stock_info_df is None or stock_info_df.empty:
                 return None
@@ -48,7 +100,7 @@ class StockInfo:
             return info_dict
 
         except Exception as e:
-            print(f"获取股票 {symbol} 信息失败: {str(e)}")
+            logger.error("获取股票 %s 信息失败: %s", symbol, e)
             return None
 
     def get_all_stocks(self, market: str = "A股") -> Optional[pd.DataFrame]:
@@ -59,19 +111,22 @@ class StockInfo:
             market: 市场类型，可选 "A股"、"港股"、"美股"
 
         Returns:
-            包含所有股票信息的DataFrame
+            包含所有股票信息的DataFrame；配置了缓存目录时优先读取未过期的本地缓存
         """
         try:
             if market == "A股":
-                # 获取沪深A股实时行情数据
-                df = ak.stock_zh_a_spot_em()
+                df = self._load_spot_cache()
+                if df is None:
+                    # 获取沪深A股实时行情数据
+                    df = self.data_source.fetch("stock_zh_a_spot_em")
+                    self._save_spot_cache(df)
                 return df
             else:
-                print(f"暂不支持 {market} 市场")
+                logger.warning("暂不支持 %s 市场", market)
                 return None
 
         except Exception as e:
-            print(f"获取股票列表失败: {str(e)}")
+            logger.error("获取股票列表失败: %s", e)
             return None
 
     def search_stock(self, keyword: str) -> Optional[pd.DataFrame]:
@@ -98,5 +153,5 @@ class StockInfo:
             return result
 
         except Exception as e:
-            print(f"搜索股票失败: {str(e)}")
+            logger.error("搜索股票失败: %s", e)
             return None